@@ -0,0 +1,409 @@
+"""
+Server callback benchmarks.
+
+Drives the annotator's server callbacks through Dash's
+``/_dash-update-component`` endpoint on the Flask test client, so each
+measurement includes request parsing and response serialization but no
+network or browser. Scenarios:
+
+- ``text``: `update_text_store` after a keystroke (full text sync).
+- ``keystroke``: `update_visual_text` after a one-character insert, for a
+  session that already shows the document (the per-keystroke path).
+- ``render``: `update_visual_text` for a new session with an empty render
+  cache (page load).
+- ``add`` / ``remove``: `manage_annotations` adding a selected span and
+  removing an annotation, for a session whose server-side annotations match
+  the store's fingerprint.
+- ``list``: `update_annotations_list` rendering every annotation.
+
+Selection tracking (formerly `update_selection_store`) runs in the browser
+and has no server callback to measure.
+
+Each scenario is run over a grid of document sizes, annotation counts and
+overlap densities (the mean number of annotations covering a character).
+Wall time is the median of ``--repeat`` calls; peak memory is measured by
+`tracemalloc` in a separate call; payload bytes are the request and
+response bodies.
+
+Run with ``python benchmarks/callbacks.py``; ``--full`` runs the large grid
+(up to 10 MB and 100k annotations), ``--json results.json`` saves the
+results and ``--baseline results.json`` compares wall times against saved
+results.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import statistics
+import time
+import tracemalloc
+import urllib.parse
+
+import dash
+from dash import html
+
+from dash_annotator import (
+    AnnotateButton,
+    AnnotationDocument,
+    AnnotationList,
+    AnnotationSet,
+    TextAnnotator,
+)
+
+ANNOTATOR = "bench"
+SESSION = "bench-session"
+
+QUICK = {
+    "sizes": [1_000, 100_000, 1_000_000],
+    "counts": [0, 1_000, 10_000],
+    "overlaps": [0.1, 1.0],
+}
+FULL = {
+    "sizes": [1_000, 100_000, 1_000_000, 10_000_000],
+    "counts": [0, 100, 10_000, 100_000],
+    "overlaps": [0.1, 1.0, 4.0],
+}
+SCENARIOS = ["text", "keystroke", "render", "add", "remove", "list"]
+
+
+def make_document(size, count, overlap, seed=0):
+    """Return a `size`-character text and `count` annotations covering each
+    character `overlap` times on average."""
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 9)))
+        for _ in range(256)
+    ]
+    text = " ".join(rng.choice(words) for _ in range(size // 6 + 1))[:size]
+    length = max(1, min(size, round(overlap * size / max(count, 1))))
+    annotations = []
+    for index in range(count):
+        start = rng.randint(0, size - length)
+        annotations.append(
+            {
+                "id": f"a{index}",
+                "start": start,
+                "end": start + length,
+                "text": text[start : start + length],
+                "note": rng.choice(["person", "place", "date"]),
+            }
+        )
+    return text, annotations
+
+
+class CallbackClient:
+    """Call the callbacks of an app by output, as the browser would.
+
+    Requests go to the Flask test client of `app`, or over HTTP to a server
+    running at `url`.
+    """
+
+    def __init__(self, app, annotator_id, url=None):
+        self.annotator_id = annotator_id
+        if url is None:
+            self.client = app.server.test_client()
+            self.connection = None
+        else:
+            url = urllib.parse.urlsplit(url)
+            self.client = None
+            self.connection = http.client.HTTPConnection(url.netloc)
+            self.prefix = url.path.rstrip("/")
+        self.dependencies = json.loads(self._request("GET", "/_dash-dependencies")[1])
+
+    def _request(self, method, path, data=None):
+        """Return the status and body of a request to the app."""
+        if self.connection is None:
+            response = self.client.open(
+                path, method=method, data=data, content_type="application/json"
+            )
+            return response.status_code, response.get_data()
+        self.connection.request(
+            method,
+            self.prefix + path,
+            body=data,
+            headers={"Content-Type": "application/json"},
+        )
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def _id(self, spec, **wildcards):
+        values = {"id": self.annotator_id, **wildcards}
+        return {
+            key: values[key] if value in (["MATCH"], ["ALL"]) else value
+            for key, value in json.loads(spec).items()
+        }
+
+    def _find(self, subcomponent, prop, renderer=None):
+        for dependency in self.dependencies:
+            if dependency.get("clientside_function"):
+                continue
+            output = dependency["output"].strip(".").split("...")[0]
+            output_id, output_prop = output.split("@")[0].rsplit(".", 1)
+            output_id = json.loads(output_id)
+            if (
+                output_id.get("subcomponent") == subcomponent
+                and output_prop == prop
+                and output_id.get("renderer", renderer) == renderer
+            ):
+                return dependency
+        raise KeyError(f"no server callback outputs {subcomponent}.{prop}")
+
+    def request(self, subcomponent, prop, values, trigger=None, renderer=None):
+        """Return the request body of the callback writing
+        ``subcomponent.prop``. `values` maps ``(subcomponent, prop)`` to
+        input and state values; wildcard inputs take a list of
+        ``(wildcards, value)`` pairs."""
+        dependency = self._find(subcomponent, prop, renderer)
+
+        def fill(spec):
+            key = (json.loads(spec["id"])["subcomponent"], spec["property"])
+            if ["ALL"] in json.loads(spec["id"]).values():
+                return [
+                    {
+                        "id": self._id(spec["id"], **wildcards),
+                        "property": spec["property"],
+                        "value": value,
+                    }
+                    for wildcards, value in values.get(key, [])
+                ]
+            return {
+                "id": self._id(spec["id"]),
+                "property": spec["property"],
+                "value": values.get(key),
+            }
+
+        outputs = [
+            dict(zip(("id", "property"), output.split("@")[0].rsplit(".", 1)))
+            for output in dependency["output"].strip(".").split("...")
+        ]
+        outputs = [
+            {"id": self._id(output["id"]), "property": output["property"]}
+            for output in outputs
+        ]
+        multi = dependency["output"].startswith("..")
+        if trigger is not None:
+            trigger_id, trigger_prop = trigger
+            trigger = [
+                json.dumps(
+                    {
+                        "component": "TextAnnotator",
+                        "id": self.annotator_id,
+                        **trigger_id,
+                    },
+                    separators=(",", ":"),
+                    sort_keys=True,
+                )
+                + "."
+                + trigger_prop
+            ]
+        return {
+            "output": dependency["output"],
+            "outputs": outputs if multi else outputs[0],
+            "inputs": [fill(spec) for spec in dependency["inputs"]],
+            "state": [fill(spec) for spec in dependency["state"]],
+            "changedPropIds": trigger or [],
+        }
+
+    def post(self, body):
+        """Send a request body; return the request and response sizes and
+        the decoded response."""
+        data = json.dumps(body)
+        status, content = self._request("POST", "/_dash-update-component", data)
+        if status not in (200, 204):
+            raise RuntimeError(content.decode(errors="replace"))
+        return len(data), len(content), json.loads(content) if content else None
+
+
+def scenarios(client, text, annotations):
+    """Yield ``(name, prepare)`` pairs. `prepare()` resets server state and
+    returns the request body to measure."""
+    offset = len(text) // 2
+    document = AnnotationDocument(text, [dict(ann) for ann in annotations])
+    document.edit(offset, 0, "x")
+    typed, rebased = document.text, document.to_records()
+    store = {
+        ("text-store", "data"): text,
+        ("annotations-store", "data"): annotations,
+        ("annotations-fingerprint", "data"): AnnotationSet(annotations).fingerprint(),
+        ("viewport-store", "data"): None,
+        ("session-store", "data"): SESSION,
+        ("document-store", "data"): None,
+    }
+
+    def text_store():
+        return client.request(
+            "text-store", "data", {("text-input-store", "data"): typed}
+        )
+
+    def keystroke():
+        # Render the document once so the session shows it, then type.
+        body = client.request("visual-text", "children", dict(store), renderer="server")
+        version = client.post(body)[2]["response"]
+        version = next(value["data"] for value in version.values() if "data" in value)
+        return client.request(
+            "visual-text",
+            "children",
+            {
+                **store,
+                ("text-store", "data"): typed,
+                ("annotations-store", "data"): rebased,
+                ("render-store", "data"): version,
+            },
+            renderer="server",
+        )
+
+    def render():
+        TextAnnotator.render_cache.clear()
+        return client.request(
+            "visual-text",
+            "children",
+            {**store, ("session-store", "data"): f"{SESSION}-{time.time_ns()}"},
+            renderer="server",
+        )
+
+    def sync():
+        # Make sure the session's set matches the store again.
+        client.post(
+            client.request("visual-text", "children", dict(store), renderer="server")
+        )
+
+    def add():
+        sync()
+        return client.request(
+            "annotations-store",
+            "data",
+            {
+                **store,
+                ("add-button", "n_clicks"): 1,
+                ("selection-store", "data"): {"start": offset, "end": offset + 1},
+            },
+            trigger=({"subcomponent": "add-button"}, "n_clicks"),
+        )
+
+    def remove():
+        sync()
+        ann_id = annotations[len(annotations) // 2]["id"]
+        return client.request(
+            "annotations-store",
+            "data",
+            {**store, ("remove-annotation", "n_clicks"): [({"ann_id": ann_id}, 1)]},
+            trigger=(
+                {"subcomponent": "remove-annotation", "ann_id": ann_id},
+                "n_clicks",
+            ),
+        )
+
+    def annotations_list():
+        return client.request(
+            "annotations-list",
+            "children",
+            {("annotations-store", "data"): annotations},
+            trigger=({"subcomponent": "annotations-store"}, "data"),
+        )
+
+    yield "text", text_store
+    yield "keystroke", keystroke
+    yield "render", render
+    yield "add", add
+    if annotations:
+        yield "remove", remove
+    yield "list", annotations_list
+
+
+def measure(client, prepare, repeat):
+    """Return the median wall time, peak traced memory and payload sizes of
+    the request built by `prepare`."""
+    times = []
+    for _ in range(repeat):
+        body = prepare()
+        start = time.perf_counter()
+        request_bytes, response_bytes, _ = client.post(body)
+        times.append(time.perf_counter() - start)
+    body = prepare()
+    tracemalloc.start()
+    client.post(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak, request_bytes, response_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--full", action="store_true", help="run the large grid")
+    parser.add_argument("--sizes", type=int, nargs="+", help="document sizes")
+    parser.add_argument("--counts", type=int, nargs="+", help="annotation counts")
+    parser.add_argument("--overlaps", type=float, nargs="+", help="overlap densities")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against saved results")
+    args = parser.parse_args()
+    grid = FULL if args.full else QUICK
+    sizes = args.sizes or grid["sizes"]
+    counts = args.counts or grid["counts"]
+    overlaps = args.overlaps or grid["overlaps"]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {
+                (r["scenario"], r["size"], r["count"], r["overlap"]): r["seconds"]
+                for r in json.load(f)
+            }
+
+    app = dash.Dash(__name__)
+    app.layout = html.Div(TextAnnotator(id=ANNOTATOR))
+    client = CallbackClient(app, ANNOTATOR)
+    header = (
+        f"{'scenario':<10}{'size':>10}{'count':>8}{'overlap':>8}"
+        f"{'ms':>10}{'peak MB':>9}{'req KB':>10}{'resp KB':>10}"
+    )
+    print(header + ("  vs baseline" if baseline else ""))
+    results = []
+    for size in sizes:
+        for count in counts:
+            for overlap in overlaps if count else overlaps[:1]:
+                text, annotations = make_document(size, count, overlap)
+                # Seed the annotator as a layout with this document would.
+                app.layout = html.Div(
+                    [
+                        TextAnnotator(
+                            id=ANNOTATOR, value=text, annotations=annotations
+                        ),
+                        AnnotateButton(for_=ANNOTATOR),
+                        AnnotationList(for_=ANNOTATOR),
+                    ]
+                )
+                for name, prepare in scenarios(client, text, annotations):
+                    if name not in args.scenarios:
+                        continue
+                    seconds, peak, request_bytes, response_bytes = measure(
+                        client, prepare, args.repeat
+                    )
+                    result = {
+                        "scenario": name,
+                        "size": size,
+                        "count": count,
+                        "overlap": overlap,
+                        "seconds": seconds,
+                        "peak_bytes": peak,
+                        "request_bytes": request_bytes,
+                        "response_bytes": response_bytes,
+                    }
+                    results.append(result)
+                    line = (
+                        f"{name:<10}{size:>10,}{count:>8,}{overlap:>8g}"
+                        f"{seconds * 1000:>10.2f}{peak / 2**20:>9.1f}"
+                        f"{request_bytes / 1024:>10.1f}{response_bytes / 1024:>10.1f}"
+                    )
+                    previous = baseline.get((name, size, count, overlap))
+                    if previous:
+                        line += f"  {seconds / previous:>6.2f}x"
+                    print(line, flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Load test: concurrent annotation sessions against the callback endpoint.
+
+Simulated users type, select and add annotations, and remove annotations
+on one shared document. Each user sends the same chain of callback requests
+a browser would: a keystroke posts the text to `update_text_store`, rebases
+the annotations the way the browser does, and then refreshes the overlay
+and the annotation list. Requests go to ``/_dash-update-component`` on the
+Flask test client (in process, the default) or on a server given by
+``--url``.
+
+For every number of concurrent users the run reports throughput and the
+p50/p95/p99 latency of the callback requests, overall and per callback
+output::
+
+    python benchmarks/load.py --users 1 2 4 8 16
+
+To load a real server, start one with the same document parameters and
+point the test at it::
+
+    python benchmarks/load.py serve --port 8050
+    python benchmarks/load.py --url http://127.0.0.1:8050 --users 1 4 16
+
+Sessions can also be recorded from a browser and replayed: ``serve
+--record sessions.jsonl`` logs every callback request the browser sends, and
+``--replay sessions.jsonl`` has each simulated user send them again, in
+order, under its own session token.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import dash
+import flask
+from dash import html
+
+from callbacks import CallbackClient, make_document
+from dash_annotator import (
+    AnnotateButton,
+    AnnotationDocument,
+    AnnotationList,
+    TextAnnotator,
+)
+
+ANNOTATOR = "load"
+
+# Relative frequency of the actions of a synthesized session.
+ACTIONS = {"type": 0.85, "add": 0.1, "remove": 0.05}
+
+
+def make_app(text, annotations, page_size=20, record=None):
+    """Return an app with an annotator, an add button and an annotation
+    list. With `record`, callback request bodies are appended to that
+    file as JSON lines."""
+    app = dash.Dash(__name__)
+    app.layout = html.Div(
+        [
+            TextAnnotator(id=ANNOTATOR, value=text, annotations=annotations),
+            AnnotateButton(for_=ANNOTATOR),
+            AnnotationList(for_=ANNOTATOR, page_size=page_size or None),
+        ]
+    )
+    if record is not None:
+        lock = threading.Lock()
+        endpoint = f"{app.config.routes_pathname_prefix}_dash-update-component"
+
+        @app.server.before_request
+        def _record():
+            if flask.request.path == endpoint:
+                line = json.dumps(flask.request.get_json(silent=True))
+                with lock, open(record, "a") as f:
+                    f.write(line + "\n")
+
+    return app
+
+
+def _label(body):
+    """Name a callback request by its first output, e.g. ``visual-text.children``."""
+    output = body["output"].strip(".").split("...")[0].split("@")[0]
+    output_id, prop = output.rsplit(".", 1)
+    return f"{json.loads(output_id).get('subcomponent', output_id)}.{prop}"
+
+
+def _values(response):
+    """Map ``(subcomponent, prop)`` to the values of a callback response."""
+    values = {}
+    for output_id, props in (response or {}).get("response", {}).items():
+        subcomponent = json.loads(output_id).get("subcomponent")
+        for prop, value in props.items():
+            values[subcomponent, prop] = value
+    return values
+
+
+class SimulatedUser:
+    """
+    One browser session editing the shared document.
+
+    The user keeps its own copy of the stores, updated from the callback
+    responses, and records the latency of every request it sends.
+    """
+
+    def __init__(self, client, text, annotations, session, seed=0, page_size=20):
+        self.client = client
+        self.page_size = page_size
+        self.document = AnnotationDocument(text, [dict(ann) for ann in annotations])
+        self.session = session
+        self.rng = random.Random(seed)
+        self.rendered = None
+        self.cursor = None
+        self.latencies = defaultdict(list)
+
+    def _stores(self):
+        return {
+            ("text-store", "data"): self.document.text,
+            ("annotations-store", "data"): self.document.to_records(),
+            ("viewport-store", "data"): None,
+            ("session-store", "data"): self.session,
+            ("document-store", "data"): None,
+            ("render-store", "data"): self.rendered,
+            ("list-cursor", "data"): self.cursor,
+            ("annotations-store", "modified_timestamp"): time.time_ns() // 10**6,
+        }
+
+    def send(self, body):
+        """Post a request body, timing it; return the response values."""
+        start = time.perf_counter()
+        response = self.client.post(body)[2]
+        self.latencies[_label(body)].append(time.perf_counter() - start)
+        return _values(response)
+
+    def _refresh(self):
+        """Requests following a change of the annotations or text stores."""
+        values = self.send(
+            self.client.request(
+                "visual-text", "children", self._stores(), renderer="server"
+            )
+        )
+        self.rendered = values.get(("render-store", "data"), self.rendered)
+        if self.cursor is None:
+            self.send(
+                self.client.request(
+                    "annotations-list",
+                    "children",
+                    self._stores(),
+                    trigger=({"subcomponent": "annotations-store"}, "data"),
+                )
+            )
+        else:
+            self.send(
+                self.client.request(
+                    "annotations-page",
+                    "children",
+                    self._stores(),
+                    trigger=(
+                        {"subcomponent": "annotations-store"},
+                        "modified_timestamp",
+                    ),
+                )
+            )
+
+    def type(self):
+        """Type or delete one character at a random position."""
+        text = self.document.text
+        offset = self.rng.randint(0, len(text))
+        if text and offset < len(text) and self.rng.random() < 0.15:
+            self.document.edit(offset, 1, "")
+        else:
+            self.document.edit(offset, 0, self.rng.choice("abcdefghij "))
+        self.send(
+            self.client.request(
+                "text-store",
+                "data",
+                {("text-input-store", "data"): self.document.text},
+            )
+        )
+        self._refresh()
+
+    def add(self):
+        """Select a few characters and add an annotation."""
+        text = self.document.text
+        if not text:
+            return
+        start = self.rng.randint(0, len(text) - 1)
+        end = min(len(text), start + self.rng.randint(1, 20))
+        values = self.send(
+            self.client.request(
+                "annotations-store",
+                "data",
+                {
+                    **self._stores(),
+                    ("add-button", "n_clicks"): 1,
+                    ("selection-store", "data"): {"start": start, "end": end},
+                },
+                trigger=({"subcomponent": "add-button"}, "n_clicks"),
+            )
+        )
+        self._apply(values.get(("annotations-store", "data")))
+        self._refresh()
+
+    def remove(self):
+        """Remove a random annotation."""
+        ids = self.document.annotations.ids()
+        if not ids:
+            return
+        ann_id = self.rng.choice(ids)
+        values = self.send(
+            self.client.request(
+                "annotations-store",
+                "data",
+                {
+                    **self._stores(),
+                    ("remove-annotation", "n_clicks"): [({"ann_id": ann_id}, 1)],
+                },
+                trigger=(
+                    {"subcomponent": "remove-annotation", "ann_id": ann_id},
+                    "n_clicks",
+                ),
+            )
+        )
+        self._apply(values.get(("annotations-store", "data")))
+        self._refresh()
+
+    def _apply(self, patch):
+        """Apply an annotations store `Patch` to the local copy."""
+        for operation in (patch or {}).get("operations", []):
+            if operation["operation"] == "Append":
+                self.document.add(operation["params"]["value"])
+            elif operation["operation"] == "Delete":
+                index = operation["location"][0]
+                self.document.remove(self.document.annotations.ids()[index])
+
+    def run(self, actions):
+        """Play a synthesized session of `actions` steps."""
+        # Page load: the overlay and the (first page of the) list.
+        if self.page_size:
+            self.cursor = {"offset": 0, "page_size": self.page_size, "sort_by": None}
+        self._refresh()
+        names, weights = zip(*ACTIONS.items())
+        for name in self.rng.choices(names, weights, k=actions):
+            getattr(self, name)()
+
+    def replay(self, bodies):
+        """Send recorded request bodies under this user's session token."""
+        for body in bodies:
+            body = json.loads(json.dumps(body))
+            for entry in body.get("inputs", []) + body.get("state", []):
+                for item in entry if isinstance(entry, list) else [entry]:
+                    if item["id"].get("subcomponent") == "session-store":
+                        item["value"] = self.session
+            self.send(body)
+
+
+def run(make_client, document, users, actions, page_size=20, replay=None, seed=0):
+    """Run `users` concurrent sessions; return the latencies by callback
+    output and the elapsed wall time."""
+    text, annotations = document
+    simulated = [
+        SimulatedUser(
+            make_client(),
+            text,
+            annotations,
+            f"load-{seed}-{users}-{index}",
+            seed=seed * 1000 + index,
+            page_size=page_size,
+        )
+        for index in range(users)
+    ]
+    errors = []
+
+    def play(user):
+        try:
+            if replay is None:
+                user.run(actions)
+            else:
+                user.replay(replay)
+        except Exception as error:  # reported after the run
+            errors.append(error)
+
+    threads = [threading.Thread(target=play, args=(user,)) for user in simulated]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    latencies = defaultdict(list)
+    for user in simulated:
+        for label, values in user.latencies.items():
+            latencies[label].extend(values)
+    return latencies, elapsed
+
+
+def percentiles(values):
+    """Return the p50, p95 and p99 of `values`."""
+    if len(values) < 2:
+        return (values[0],) * 3 if values else (float("nan"),) * 3
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def report(users, latencies, elapsed, by_callback):
+    everything = [value for values in latencies.values() for value in values]
+    rows = [("all", everything)]
+    if by_callback:
+        rows += sorted(latencies.items())
+    for label, values in rows:
+        p50, p95, p99 = (value * 1000 for value in percentiles(values))
+        print(
+            f"{users:>6}{label:>32}{len(values):>9}{len(values) / elapsed:>10.1f}"
+            f"{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}",
+            flush=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", nargs="?", choices=["run", "serve"], default="run")
+    parser.add_argument("--size", type=int, default=20_000, help="document size")
+    parser.add_argument("--count", type=int, default=200, help="annotations")
+    parser.add_argument("--overlap", type=float, default=0.5)
+    parser.add_argument(
+        "--page-size", type=int, default=20, help="list page size, 0 for no paging"
+    )
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--actions", type=int, default=50, help="steps per user")
+    parser.add_argument("--url", help="load a running server instead")
+    parser.add_argument("--replay", help="replay recorded sessions from this file")
+    parser.add_argument("--record", help="serve: record callback requests here")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--by-callback", action="store_true")
+    args = parser.parse_args()
+    document = make_document(args.size, args.count, args.overlap)
+
+    if args.command == "serve":
+        app = make_app(*document, page_size=args.page_size, record=args.record)
+        app.run(port=args.port, threaded=True)
+        return
+
+    app = None
+    if args.url is None:
+        app = make_app(*document, page_size=args.page_size)
+    replay = None
+    if args.replay:
+        with open(args.replay) as f:
+            replay = [json.loads(line) for line in f if line.strip()]
+    print(
+        f"{'users':>6}{'callback':>32}{'requests':>9}{'req/s':>10}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    for users in args.users:
+        latencies, elapsed = run(
+            lambda: CallbackClient(app, ANNOTATOR, url=args.url),
+            document,
+            users,
+            args.actions,
+            page_size=args.page_size,
+            replay=replay,
+        )
+        report(users, latencies, elapsed, args.by_callback)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Annotations store payload: records vs. the packed format.
+
+Builds a 10k-annotation document and prints the JSON size of its
+annotations store in both formats, raw and gzip-compressed (as served with
+compression enabled).
+
+Run with ``python benchmarks/store_payload.py``.
+"""
+
+import gzip
+import random
+import uuid
+
+from dash._utils import to_json
+
+from dash_annotator import AnnotationColumns
+
+ANNOTATIONS = 10_000
+NOTES = ["person", "place", "organization", "date", "event"]
+
+
+def make_document(n=ANNOTATIONS, seed=0):
+    """Return a text and `n` annotations of short spans on it."""
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(length))
+        for length in (rng.randint(2, 10) for _ in range(n * 3))
+    ]
+    text = " ".join(words)
+    records, start = [], 0
+    for word in words:
+        if len(records) < n and rng.random() < 0.4:
+            records.append(
+                {
+                    "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                    "start": start,
+                    "end": start + len(word),
+                    "text": word,
+                    "note": rng.choice(NOTES),
+                }
+            )
+        start += len(word) + 1
+    return text, records
+
+
+def payload_sizes(data):
+    """Return the raw and gzip-compressed JSON size of `data`, in bytes."""
+    raw = to_json(data).encode()
+    return len(raw), len(gzip.compress(raw))
+
+
+def main():
+    text, records = make_document()
+    packed = AnnotationColumns(records).to_packed()
+    assert AnnotationColumns.from_packed(packed).to_records() == records
+    rows = [("records", *payload_sizes(records)), ("packed", *payload_sizes(packed))]
+    print(f"{len(records)} annotations on a {len(text)}-character document")
+    print(f"{'format':<10}{'json':>12}{'gzip':>12}")
+    for name, raw, compressed in rows:
+        print(f"{name:<10}{raw:>12,}{compressed:>12,}")
+    (_, raw, compressed), (_, packed_raw, packed_compressed) = rows
+    print(
+        f"packed is {1 - packed_raw / raw:.0%} smaller"
+        f" ({1 - packed_compressed / compressed:.0%} gzipped)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,6 @@ import dash
 from dash import html
 from dash_annotator import TextAnnotator, AnnotateButton, AnnotationList
 
-
 # Initialize the Dash app
 app = dash.Dash(
     __name__,
@@ -31,7 +30,7 @@ app.layout = html.Div(
 
 if __name__ == "__main__":
     try:
-        app.run_server(debug=True, port=8050)
+        app.run(debug=True, port=8050)
     except KeyboardInterrupt:
         print("Application stopped by user")
     except Exception as e:
@@ -0,0 +1,76 @@
+"""
+Dropped frames while scrolling a large annotated document.
+
+The overlay is scrolled with the textarea once per animation frame, and the
+frames seen while scrolling are counted in the browser. This example shows
+those counters next to a long document with many annotations: scroll the
+textarea and watch the dropped-frame ratio.
+
+Run this script and navigate to http://localhost:8050 in your browser.
+"""
+
+import random
+
+import dash
+from dash import Input, Output, clientside_callback, dcc, html
+from dash_annotator import Annotation, TextAnnotator
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing"]
+
+
+def make_document(paragraphs=2000, seed=0):
+    """Return a long text and annotations on roughly a third of its words."""
+    rng = random.Random(seed)
+    lines = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+        for _ in range(paragraphs)
+    ]
+    text = "\n".join(lines)
+    annotations, start = [], 0
+    for index, word in enumerate(text.split(" ")):
+        if rng.random() < 0.3:
+            annotations.append(
+                Annotation(str(index), start, start + len(word), word, "")
+            )
+        start += len(word) + 1
+    return text, annotations
+
+
+text, annotations = make_document()
+
+app = dash.Dash(__name__)
+
+app.layout = html.Div(
+    [
+        html.Div(
+            TextAnnotator(
+                id="scroll-annotator",
+                value=text,
+                annotations=annotations,
+                renderer="client",
+                virtualize=True,
+            ),
+            style={"height": "70vh"},
+        ),
+        html.Pre(id="scroll-stats"),
+        dcc.Interval(id="scroll-stats-interval", interval=500),
+    ],
+    className="w-100 p-3",
+)
+
+clientside_callback(
+    """function(n_intervals) {
+    const stats = (window.dashAnnotatorScrollStats || {})["scroll-annotator"];
+    if (!stats || !stats.frames) {
+        return "Scroll the textarea to measure frames.";
+    }
+    const ratio = (100 * stats.dropped / stats.frames).toFixed(1);
+    return `frames: ${stats.frames}  dropped: ${stats.dropped} (${ratio}%)  ` +
+        `overlay syncs: ${stats.syncs}`;
+}""",
+    Output("scroll-stats", "children"),
+    Input("scroll-stats-interval", "n_intervals"),
+)
+
+if __name__ == "__main__":
+    app.run(debug=True, port=8050)
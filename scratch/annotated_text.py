@@ -14,6 +14,7 @@ from dataclasses import dataclass, asdict
 from typing import List, Optional
 import uuid
 from dash_extensions import EventListener
+from dash_annotator import AnnotationDocument
 
 
 @dataclass
@@ -172,55 +173,22 @@ def register_callbacks(app):
         """Update the visual representation of text with annotations."""
         if not text:
             return ""
-        if not annotations_data:
-            annotations_data = []
-
-        # Create a list of all boundary points (start and end positions)
-        boundaries = []
-        for ann in annotations_data:
-            boundaries.append((ann["start"], "start", ann["id"]))
-            boundaries.append((ann["end"], "end", ann["id"]))
-
-        # Sort boundaries by position
-        boundaries.sort(
-            key=lambda x: (x[0], x[1] != "end")
-        )  # Ensure "end" comes after "start" at same position
-
-        # Build text parts with proper handling of overlapping annotations
+        document = AnnotationDocument(text, annotations_data or [])
         parts = []
-        last_pos = 0
-        active_annotations = set()
-
-        for pos, boundary_type, ann_id in boundaries:
-            # Add non-annotated text before this boundary if there is any
-            if pos > last_pos:
-                if not active_annotations:
-                    # No active annotations - render as plain text
-                    parts.append(html.Span(text[last_pos:pos], id=f"text-{last_pos}"))
-                else:
-                    # Text with active annotations
-                    parts.append(
-                        html.Span(
-                            text[last_pos:pos],
-                            className=f"border-b-2 border-blue-400 bg-blue-50",
-                            style={
-                                "opacity": min(0.2 + len(active_annotations) * 0.2, 1)
-                            },
-                            id=f"overlap-{'-'.join(sorted(active_annotations))}",
-                        )
-                    )
-
-            # Update active annotations set
-            if boundary_type == "start":
-                active_annotations.add(ann_id)
+        for start, end, active_annotations, _ in document.segments():
+            if not active_annotations:
+                # No active annotations - render as plain text
+                parts.append(html.Span(text[start:end], id=f"text-{start}"))
             else:
-                active_annotations.discard(ann_id)
-
-            last_pos = pos
-
-        # Add remaining text after last boundary
-        if last_pos < len(text):
-            parts.append(html.Span(text[last_pos:], id=f"text-{last_pos}"))
+                # Text with active annotations
+                parts.append(
+                    html.Span(
+                        text[start:end],
+                        className=f"border-b-2 border-blue-400 bg-blue-50",
+                        style={"opacity": min(0.2 + len(active_annotations) * 0.2, 1)},
+                        id=f"overlap-{'-'.join(sorted(active_annotations))}",
+                    )
+                )
 
         return parts
 
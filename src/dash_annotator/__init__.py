@@ -1,14 +1,88 @@
 from dash_annotator.components import (
+    Annotation,
+    AnnotationColumns,
+    AnnotationSet,
     TextAnnotator,
     AnnotationList,
     AnnotateButton,
+    AnnotatedTextView,
+    CorpusNavigator,
+    ExportButton,
+    FindAndAnnotate,
+    PreAnnotateButton,
+    background_manager,
+)
+from dash_annotator.corpus import (
+    AnnotationCorpus,
+    DirectorySource,
+    DocumentSource,
+    JSONLSource,
+    SQLiteSource,
+)
+from dash_annotator.document import AnnotationDocument
+from dash_annotator.formats import (
+    read_bio,
+    read_brat,
+    read_brat_corpus,
+    read_jsonl,
+    write_bio,
+    write_brat,
+    write_brat_corpus,
+    write_jsonl,
+)
+from dash_annotator.preannotation import PreAnnotator
+from dash_annotator.search import TextIndex, find_all
+from dash_annotator.metrics import CallbackMetrics, instrument
+from dash_annotator.repository import (
+    AnnotationRepository,
+    InMemoryAnnotationRepository,
+    SQLiteAnnotationRepository,
 )
 
 __version__ = "0.0.1"
 
+# Browser bundle of the React components (`AnnotatedTextView`).
+_js_dist = [
+    {
+        "relative_package_path": "dash_annotator.js",
+        "namespace": "dash_annotator",
+    }
+]
+
 __all__ = [
     "register_callbacks",
+    "Annotation",
+    "AnnotationColumns",
+    "AnnotationSet",
     "TextAnnotator",
     "AnnotationList",
     "AnnotateButton",
+    "AnnotatedTextView",
+    "CorpusNavigator",
+    "FindAndAnnotate",
+    "PreAnnotateButton",
+    "ExportButton",
+    "background_manager",
+    "AnnotationDocument",
+    "AnnotationRepository",
+    "InMemoryAnnotationRepository",
+    "SQLiteAnnotationRepository",
+    "AnnotationCorpus",
+    "DocumentSource",
+    "DirectorySource",
+    "JSONLSource",
+    "SQLiteSource",
+    "read_jsonl",
+    "write_jsonl",
+    "read_brat",
+    "write_brat",
+    "read_brat_corpus",
+    "write_brat_corpus",
+    "read_bio",
+    "write_bio",
+    "PreAnnotator",
+    "TextIndex",
+    "find_all",
+    "CallbackMetrics",
+    "instrument",
 ]
@@ -0,0 +1,565 @@
+"""
+Annotation records and the interval-indexed `AnnotationSet`.
+
+Annotations travel between the browser and the server as store records:
+dicts with ``id``, ``start``, ``end``, ``text`` and ``note``.
+`AnnotationColumns` keeps many of them compactly, and `AnnotationSet`
+indexes them by span for rendering, queries and text edits.
+"""
+
+from array import array
+from dataclasses import dataclass
+import heapq
+from itertools import islice
+from operator import add, itemgetter
+import sys
+import zlib
+
+from dash_annotator.treap import (
+    _build,
+    _delete,
+    _merge,
+    _Node,
+    _overlapping,
+    _shift,
+    _split,
+    _walk,
+)
+
+__all__ = [
+    "Annotation",
+    "AnnotationColumns",
+    "AnnotationSet",
+]
+
+
+@dataclass
+class Annotation:
+    """
+    Data class for annotation objects.
+
+    Parameters
+    ----------
+    id : str
+        Unique identifier for the annotation.
+    start : int
+        Start index of the annotation.
+    end : int
+        End index of the annotation.
+    text : str
+        Text of the annotation.
+    note : str
+        Note for the annotation.
+    """
+
+    __slots__ = ("id", "start", "end", "text", "note")
+
+    id: str
+    start: int
+    end: int
+    text: str
+    note: str
+
+
+class AnnotationColumns:
+    """
+    Compact, column-oriented storage for many annotations.
+
+    Starts and ends are kept in integer arrays and ids and notes are
+    interned, so a large preloaded set costs a few bytes per annotation
+    instead of a dict each. Given the document `text`, the covered text of
+    an annotation is not stored at all but sliced from the document when
+    records are produced.
+
+    Parameters
+    ----------
+    annotations : iterable of Annotation or dict, optional
+        Initial annotations, in store order.
+    text : str, optional
+        Text of the annotated document.
+    """
+
+    __slots__ = ("ids", "starts", "ends", "notes", "texts", "text")
+
+    def __init__(self, annotations=(), text=None):
+        self.ids = []
+        self.starts = array("q")
+        self.ends = array("q")
+        self.notes = []
+        self.texts = None if text is not None else []
+        self.text = text
+        self.extend(annotations)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return Annotation(
+            self.ids[index],
+            self.starts[index],
+            self.ends[index],
+            self._text(index),
+            self.notes[index],
+        )
+
+    def __iter__(self):
+        """Iterate over the annotations as `Annotation` objects."""
+        return map(self.__getitem__, range(len(self.ids)))
+
+    def _text(self, index):
+        if self.texts is not None:
+            return self.texts[index]
+        return self.text[self.starts[index] : self.ends[index]]
+
+    def append(self, annotation):
+        """Add an `Annotation` or store record."""
+        self.extend((annotation,))
+
+    def extend(self, annotations):
+        """Add `Annotation` objects or store records."""
+        for annotation in annotations:
+            if isinstance(annotation, Annotation):
+                ann_id, start, end = annotation.id, annotation.start, annotation.end
+                text, note = annotation.text, annotation.note
+            else:
+                ann_id, start, end = (
+                    annotation["id"],
+                    annotation["start"],
+                    annotation["end"],
+                )
+                text, note = annotation["text"], annotation["note"]
+            self.ids.append(sys.intern(ann_id))
+            self.starts.append(start)
+            self.ends.append(end)
+            self.notes.append(sys.intern(note))
+            if self.texts is not None:
+                self.texts.append(text)
+
+    def records(self):
+        """Iterate over the annotations in the annotations store format.
+
+        Records are built on the fly and share the stored strings.
+        """
+        for index, ann_id in enumerate(self.ids):
+            yield {
+                "id": ann_id,
+                "start": self.starts[index],
+                "end": self.ends[index],
+                "text": self._text(index),
+                "note": self.notes[index],
+            }
+
+    def to_records(self):
+        """Return the annotations as a store-ready list of dicts."""
+        return list(self.records())
+
+    @classmethod
+    def from_records(cls, records, text=None):
+        """Build columns from annotations store records."""
+        return cls(records, text)
+
+    def to_packed(self):
+        """Return the annotations in the packed store format.
+
+        The packed format holds parallel arrays instead of one dict per
+        annotation: ``ids``, ``starts``, ``lengths`` and ``texts``, plus
+        ``notes``, whose entries index the distinct notes in
+        ``note_table``. Notes appended later (by a store `Patch`) may be
+        stored inline as strings instead of table indices.
+        """
+        table = {}
+        return {
+            "packed": 1,
+            "ids": list(self.ids),
+            "starts": self.starts.tolist(),
+            "lengths": [end - start for start, end in zip(self.starts, self.ends)],
+            "texts": [self._text(index) for index in range(len(self.ids))],
+            "notes": [table.setdefault(note, len(table)) for note in self.notes],
+            "note_table": list(table),
+        }
+
+    @classmethod
+    def from_packed(cls, data):
+        """Build columns from the packed store format (see `to_packed`)."""
+        columns = cls()
+        table = data["note_table"]
+        columns.ids = list(map(sys.intern, data["ids"]))
+        columns.starts = array("q", data["starts"])
+        columns.ends = array("q", map(add, data["starts"], data["lengths"]))
+        columns.texts = list(data["texts"])
+        columns.notes = [
+            sys.intern(note if isinstance(note, str) else table[note])
+            for note in data["notes"]
+        ]
+        return columns
+
+
+class _AnnotationIndex:
+    """
+    Maps annotation ids to their current position in an annotations store.
+
+    The store list only ever grows by appending and shrinks by deleting, so
+    every annotation gets a slot in append order and its list index is the
+    number of live slots before it. Live slots are counted with a Fenwick
+    tree, making `append`, `index` and `pop` O(log n).
+    """
+
+    def __init__(self, annotation_ids=()):
+        self._slots = {ann_id: slot for slot, ann_id in enumerate(annotation_ids, 1)}
+        # Every slot starts live, so each node holds the size of its range.
+        self._tree = [slot & -slot for slot in range(len(self._slots) + 1)]
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, ann_id):
+        return ann_id in self._slots
+
+    def _prefix(self, slot):
+        total = 0
+        while slot > 0:
+            total += self._tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def _add(self, slot, delta):
+        while slot < len(self._tree):
+            self._tree[slot] += delta
+            slot += slot & -slot
+
+    def append(self, ann_id):
+        """Register `ann_id` at the end of the list and return its index."""
+        slot = len(self._tree)
+        # A Fenwick node covers (slot - lowbit, slot]; sum the covered
+        # prefix that already exists and add the new live slot.
+        self._tree.append(
+            1 + self._prefix(slot - 1) - self._prefix(slot - (slot & -slot))
+        )
+        self._slots[ann_id] = slot
+        return self._prefix(slot) - 1
+
+    def index(self, ann_id):
+        """Return the list index of `ann_id`, or None if unknown."""
+        slot = self._slots.get(ann_id)
+        if slot is None:
+            return None
+        return self._prefix(slot) - 1
+
+    def pop(self, ann_id):
+        """Forget `ann_id` and return the list index it occupied."""
+        index = self.index(ann_id)
+        if index is not None:
+            self._add(self._slots.pop(ann_id), -1)
+        return index
+
+
+def _rebase(start, end, offset, deleted, inserted):
+    """Map the span ``[start, end)`` through an edit.
+
+    The edit replaces `deleted` characters at `offset` with `inserted`
+    characters. Text inserted inside a span extends it; text inserted at
+    either edge does not. Deleted text is cut out of a span, and a span left
+    empty is invalidated (None is returned). An empty span moves like its
+    start and stays empty.
+    """
+    edit_end = offset + deleted
+    delta = inserted - deleted
+    if start < offset:
+        new_start = start
+    elif start >= edit_end:
+        new_start = start + delta
+    else:
+        new_start = offset + inserted
+    if start >= end:
+        return new_start, new_start
+    if end <= offset:
+        new_end = end
+    elif end > edit_end:
+        new_end = end + delta
+    else:
+        new_end = offset
+    if new_start >= new_end:
+        return None
+    return new_start, new_end
+
+
+def _as_record(annotation):
+    if isinstance(annotation, Annotation):
+        # Cheaper than `asdict`, which deep-copies every field.
+        return {
+            "id": annotation.id,
+            "start": annotation.start,
+            "end": annotation.end,
+            "text": annotation.text,
+            "note": annotation.note,
+        }
+    return annotation
+
+
+def _checksum(record):
+    """Return the CRC-32 of a record's span, as ``fingerprint`` in
+    dash_annotator.js computes it: over the UTF-16 code units of its id,
+    start and end joined by tabs."""
+    span = f"{record['id']}\t{record['start']}\t{record['end']}"
+    return zlib.crc32(span.encode("utf-16-le", "surrogatepass"))
+
+
+def _is_packed(annotations_data):
+    return isinstance(annotations_data, dict) and "packed" in annotations_data
+
+
+def _store_records(annotations_data):
+    """Return the records held by an inline annotations store, unpacking
+    the packed format."""
+    if _is_packed(annotations_data):
+        return AnnotationColumns.from_packed(annotations_data).to_records()
+    return annotations_data
+
+
+def _records(annotations):
+    """Return store records for `Annotation` objects, store records, or
+    `AnnotationColumns`, without copying records that already are dicts."""
+    if isinstance(annotations, AnnotationColumns):
+        return annotations.to_records()
+    return [_as_record(annotation) for annotation in annotations]
+
+
+class AnnotationSet:
+    """
+    Interval-indexed collection of annotations.
+
+    Annotations are kept in an interval tree (a treap ordered by start and
+    augmented with the maximum end of each subtree), so boundary sweeps need
+    no sorting and point or range queries cost O(log n + k). The order in
+    which annotations were inserted is tracked too: `index` returns the
+    position an annotation holds in the annotations store list.
+
+    Text edits are applied with `apply_edit`, which shifts every later span
+    lazily and only touches the spans overlapping the edit.
+
+    Parameters
+    ----------
+    annotations : iterable of Annotation or dict, optional
+        Initial annotations, in store order.
+    """
+
+    def __init__(self, annotations=()):
+        self._records = {}
+        for annotation in annotations:
+            record = _as_record(annotation)
+            if record["id"] in self._records:
+                raise KeyError(f"duplicate annotation id {record['id']!r}")
+            self._records[record["id"]] = record
+        self._order = _AnnotationIndex(self._records)
+        self._root = _build(sorted(map(self._key, self._records.values())))
+        # Set when lazily shifted spans have not been copied to the records.
+        self._stale = False
+        # Sum of the record checksums, computed on demand (see `fingerprint`).
+        self._checksum = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, ann_id):
+        return ann_id in self._records
+
+    def __iter__(self):
+        """Iterate over annotations in store order."""
+        self._sync()
+        return iter(self._records.values())
+
+    @staticmethod
+    def _key(record):
+        return (record["start"], record["end"], record["id"])
+
+    def _record(self, key):
+        """Return the record for a tree key, refreshing a shifted span."""
+        record = self._records[key[2]]
+        if record["start"] != key[0] or record["end"] != key[1]:
+            record = dict(record, start=key[0], end=key[1])
+            self._records[key[2]] = record
+        return record
+
+    def _sync(self):
+        """Copy lazily shifted spans from the tree to the records."""
+        if self._stale:
+            for key in _walk(self._root):
+                self._record(key)
+            self._stale = False
+
+    def get(self, ann_id, default=None):
+        """Return the annotation with `ann_id`."""
+        self._sync()
+        return self._records.get(ann_id, default)
+
+    def ids(self):
+        """Return the annotation ids in store order."""
+        return list(self._records)
+
+    def fingerprint(self):
+        """Return ``[count, checksum]`` of the annotation spans.
+
+        The checksum is the sum modulo 2**32 of a CRC-32 per span (id,
+        start and end), so `insert` and `remove` update it in O(1). The
+        browser computes the same fingerprint for an annotations store,
+        which lets callbacks check that the set matches the store without
+        sending the store.
+        """
+        if self._checksum is None:
+            self._sync()
+            self._checksum = sum(map(_checksum, self._records.values())) % 2**32
+        return [len(self._records), self._checksum]
+
+    def copy(self):
+        """Return a copy of the set that later writes to it do not affect."""
+        return AnnotationSet(self)
+
+    def index(self, ann_id):
+        """Return the store list index of `ann_id`, or None if unknown."""
+        return self._order.index(ann_id)
+
+    def insert(self, annotation):
+        """Add an annotation at the end of the store order.
+
+        Returns the store list index of the new annotation.
+        """
+        record = _as_record(annotation)
+        if record["id"] in self._records:
+            raise KeyError(f"duplicate annotation id {record['id']!r}")
+        key = self._key(record)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key)), right)
+        self._records[record["id"]] = record
+        if self._checksum is not None:
+            self._checksum = (self._checksum + _checksum(record)) % 2**32
+        return self._order.append(record["id"])
+
+    def remove(self, ann_id):
+        """Remove the annotation with `ann_id` and return it."""
+        self._sync()
+        record = self._records.pop(ann_id)
+        self._root = _delete(self._root, self._key(record))
+        self._order.pop(ann_id)
+        if self._checksum is not None:
+            self._checksum = (self._checksum - _checksum(record)) % 2**32
+        return record
+
+    def overlapping(self, start, end):
+        """Return annotations intersecting ``[start, end)``, by start."""
+        return [self._record(key) for key in _overlapping(self._root, start, end)]
+
+    def at(self, pos):
+        """Return annotations covering the character at `pos`."""
+        return self.overlapping(pos, pos + 1)
+
+    def by_position(self):
+        """Iterate over annotations ordered by ``(start, end, id)``."""
+        for key in _walk(self._root):
+            yield self._record(key)
+
+    def page(self, offset, limit, sort_by=None):
+        """Return `limit` annotations from `offset`.
+
+        Store order and position order (``sort_by="start"``) are read
+        straight off the set; any other field sorts the whole set.
+        """
+        if sort_by is None:
+            ordered = iter(self)
+        elif sort_by == "start":
+            ordered = self.by_position()
+        else:
+            ordered = iter(sorted(self, key=itemgetter(sort_by)))
+        return list(islice(ordered, offset, offset + limit))
+
+    def boundaries(self):
+        """Yield ``(pos, is_start, id)`` for every annotation boundary.
+
+        Boundaries come out sorted by position, with ends before starts at
+        the same position. Starts come from the tree walk; pending ends are
+        kept in a heap of the spans still open.
+        """
+        ends = []
+        for start, end, ann_id in _walk(self._root):
+            while ends and ends[0][0] <= start:
+                pos, end_id = heapq.heappop(ends)
+                yield pos, False, end_id
+            yield start, True, ann_id
+            heapq.heappush(ends, (end, ann_id))
+        while ends:
+            pos, end_id = heapq.heappop(ends)
+            yield pos, False, end_id
+
+    def apply_edit(self, offset, deleted, inserted, text=None):
+        """Rebase annotations after a text edit.
+
+        The edit replaced `deleted` characters at `offset` with `inserted`
+        characters. Spans after the edit are shifted in O(log n); spans
+        overlapping it are shrunk or extended (see `_rebase`), and spans
+        left empty are removed. If the edited `text` is given, the ``text``
+        of every changed span is refreshed from it.
+
+        Returns the ids of the changed and of the removed annotations.
+        """
+        edit_end = offset + deleted
+        left, right = _split(self._root, (offset,))
+        middle, right = _split(right, (edit_end,))
+        # Spans starting inside the deleted range, and spans starting before
+        # the edit that reach into it.
+        touched = list(_walk(middle))
+        for key in list(_overlapping(left, offset, offset + 1)):
+            if key[1] > offset:
+                touched.append(key)
+                left = _delete(left, key)
+        _shift(right, inserted - deleted)
+        self._root = _merge(left, right)
+        self._checksum = None
+        if right is not None and inserted != deleted:
+            self._stale = True
+        changed, removed = [], []
+        for start, end, ann_id in touched:
+            span = _rebase(start, end, offset, deleted, inserted)
+            if span is None:
+                del self._records[ann_id]
+                self._order.pop(ann_id)
+                removed.append(ann_id)
+                continue
+            record = dict(self._records[ann_id], start=span[0], end=span[1])
+            if text is not None:
+                record["text"] = text[span[0] : span[1]]
+            self._records[ann_id] = record
+            key = self._key(record)
+            left, right = _split(self._root, key)
+            self._root = _merge(_merge(left, _Node(key)), right)
+            changed.append(ann_id)
+        return changed, removed
+
+    def to_records(self):
+        """Return the annotations as a store-ready list of dicts."""
+        self._sync()
+        return list(self._records.values())
+
+
+def _diff(old, new):
+    """Return ``(offset, deleted, inserted)`` for the single edit turning
+    `old` into `new`: everything between their common prefix and suffix.
+
+    Both affixes are found by binary search over slice comparisons, which
+    run in C, instead of comparing character by character.
+    """
+
+    def common(length, same):
+        low, high = 0, length
+        while low < high:
+            mid = (low + high + 1) // 2
+            if same(mid):
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    limit = min(len(old), len(new))
+    prefix = common(limit, lambda n: old[:n] == new[:n])
+    suffix = common(
+        limit - prefix, lambda n: old[len(old) - n :] == new[len(new) - n :]
+    )
+    return prefix, len(old) - prefix - suffix, new[prefix : len(new) - suffix]
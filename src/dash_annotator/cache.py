@@ -0,0 +1,99 @@
+"""
+Caches and per-process state shared by the components and repositories.
+"""
+
+from collections import OrderedDict, namedtuple
+import hashlib
+import json
+import os
+import threading
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class _LRUCache:
+    """
+    Thread-safe LRU cache with hit and miss counts.
+
+    The least recently used values are evicted past `maxsize`; a `maxsize`
+    of 0 disables the cache. It holds the server renderings shared by all
+    annotators (see `TextAnnotator.render_cache`) and the search indexes.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value cached under `key`, or None."""
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Cache `value` under `key`, evicting the oldest values."""
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def resize(self, maxsize):
+        """Change the number of values kept."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drop every value and reset the counters."""
+        with self._lock:
+            self._values.clear()
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        """Return the hit and miss counts and the cache size, like
+        `functools.lru_cache`."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._values))
+
+
+def _digest(data):
+    """Return a digest of a string, or of the JSON of other store data."""
+    if not isinstance(data, str):
+        data = json.dumps(data, separators=(",", ":"))
+    return hashlib.blake2b(
+        data.encode("utf-8", "surrogatepass"), digest_size=16
+    ).digest()
+
+
+class _ForkLocal:
+    """
+    Per-process state, built by `factory` on first use in every process.
+
+    Background callbacks run in forked processes, where connections and file
+    handles shared with the parent are unsafe, and locks held by another
+    thread at fork time are never released.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._pid = None
+        self._value = None
+
+    def get(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._value = self._factory()
+            self._pid = pid
+        return self._value
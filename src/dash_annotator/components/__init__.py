@@ -1,10 +1,27 @@
+from dash_annotator.annotation_set import Annotation, AnnotationColumns, AnnotationSet
 from dash_annotator.components.annotator import TextAnnotator
 from dash_annotator.components.annotations import AnnotationList
 from dash_annotator.components.button import AnnotateButton
+from dash_annotator.components.find import FindAndAnnotate
+from dash_annotator.components.jobs import (
+    ExportButton,
+    PreAnnotateButton,
+    background_manager,
+)
+from dash_annotator.components.navigator import CorpusNavigator
+from dash_annotator.components.text_view import AnnotatedTextView
 
 __all__ = [
     "Annotation",
+    "AnnotationColumns",
+    "AnnotationSet",
     "TextAnnotator",
     "AnnotationList",
     "AnnotateButton",
+    "FindAndAnnotate",
+    "PreAnnotateButton",
+    "ExportButton",
+    "background_manager",
+    "CorpusNavigator",
+    "AnnotatedTextView",
 ]
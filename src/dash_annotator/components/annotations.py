@@ -1,8 +1,14 @@
 """AnnotationsList component for displaying and managing annotations."""
 
-from dash import html, callback, Output, Input, MATCH
+from dash import html, dcc, callback, Output, Input, State, MATCH
 import dash
+from dash_annotator.annotation_set import _store_records
 from dash_annotator.components.base import BaseAnnotation
+from dash_annotator.components.state import (
+    _registry,
+    _repositories,
+    _session_annotations,
+)
 
 __all__ = [
     "AnnotationList",
@@ -11,18 +17,74 @@ __all__ = [
 ids = BaseAnnotation.ids
 
 
+def _annotation_row(annotator_id, ann):
+    """Render one annotation with its Remove button."""
+    return html.Div(
+        [
+            html.Div(
+                [
+                    html.Div(f'"{ann["text"]}"', className="font-medium"),
+                    html.Div(ann["note"], className="text-sm text-gray-600"),
+                ],
+                className="flex-1",
+            ),
+            html.Button(
+                "Remove",
+                id=ids.remove_annotation(annotator_id, ann["id"]),
+            ),
+        ],
+    )
+
+
+def _clamp(offset, page_size, total):
+    """Snap `offset` to a page boundary within ``[0, total)``."""
+    last = max(0, (total - 1) // page_size * page_size)
+    return max(0, min(offset - offset % page_size, last))
+
+
 class AnnotationList(html.Div, BaseAnnotation):
-    """Component for displaying and managing the list of annotations."""
+    """Component for displaying and managing the list of annotations.
+
+    Parameters
+    ----------
+    for_ : str
+        Id of the `TextAnnotator` whose annotations are listed.
+    page_size : int, optional
+        Show annotations one page at a time. Only the rows on the current
+        page (and their Remove buttons) are rendered and wired, and rows are
+        read from the server-side annotations (the session's copy, or the
+        repository) instead of the annotations store, so updates cost the
+        same for any list length.
+    sort_by : str, optional
+        Annotation field to order a paginated list by. Defaults to the order
+        annotations were added in.
+    """
 
     ids = BaseAnnotation.ids
 
-    def __init__(self, for_: str, *args, **kwargs):
+    def __init__(
+        self, for_: str, *args, page_size: int = None, sort_by: str = None, **kwargs
+    ):
         """Initialize the component."""
         if "className" not in kwargs:
             kwargs["className"] = ""
         kwargs["className"] += "space-y-2 mt-4"
         self.for_id = for_
-        super().__init__(id=self.ids.annotations_list(for_), *args, **kwargs)
+        if page_size is None:
+            super().__init__(id=self.ids.annotations_list(for_), *args, **kwargs)
+            return
+        if page_size < 1:
+            raise ValueError(f"page_size must be positive, got {page_size!r}")
+        super().__init__(
+            [
+                dcc.Store(
+                    id=self.ids.list_cursor(for_),
+                    data={"offset": 0, "page_size": page_size, "sort_by": sort_by},
+                ),
+                html.Div(id=self.ids.annotations_page(for_)),
+            ],
+            **kwargs,
+        )
 
     @callback(
         Output(ids.annotations_list(MATCH), "children"),
@@ -34,21 +96,115 @@ class AnnotationList(html.Div, BaseAnnotation):
             return []
         # get input id
         annotator_id = dash.callback_context.triggered_id["id"]
+        annotations_data = _store_records(annotations_data)
+        if isinstance(annotations_data, dict):
+            repository = _repositories[annotator_id]
+            annotations_data = repository.annotations(annotations_data["document"])
+        return [_annotation_row(annotator_id, ann) for ann in annotations_data]
+
+    @callback(
+        Output(ids.annotations_page(MATCH), "children"),
+        Input(ids.annotations_fingerprint(MATCH), "data"),
+        Input(ids.annotations_synced(MATCH), "data"),
+        Input(ids.list_cursor(MATCH), "data"),
+        Input(ids.session_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+    )
+    def update_annotations_page(fingerprint, synced, cursor, session, document=None):
+        """Render the current page of a paginated annotations list.
+
+        Triggered by the store's fingerprint rather than its data, so the
+        annotation list never travels to the server. The page is cut from
+        the session's copy, checked against the fingerprint (see
+        `_session_annotations`), or read from the repository.
+        """
+        if session is None and document is None:
+            return []
+        ctx = dash.callback_context
+        annotator_id = ctx.outputs_list["id"]["id"]
+        resynced = (
+            ctx.triggered_id is not None
+            and ctx.triggered_id["subcomponent"] == "annotations-synced"
+        )
+        if resynced and synced["callback"] != "update_annotations_page":
+            return dash.no_update
+        page_size, sort_by = cursor["page_size"], cursor["sort_by"]
+        if document is not None:
+            repository = _repositories[annotator_id]
+            offset = cursor["offset"]
+            total, rows = repository.page(document, offset, page_size, sort_by)
+            if _clamp(offset, page_size, total) != offset:
+                # The list shrank past the cursor.
+                offset = _clamp(offset, page_size, total)
+                total, rows = repository.page(document, offset, page_size, sort_by)
+        else:
+            with _registry.lock:
+                annotations = _session_annotations(
+                    annotator_id,
+                    session,
+                    fingerprint,
+                    {"callback": "update_annotations_page"},
+                    resynced,
+                )
+                if annotations is None:
+                    return dash.no_update
+                total = len(annotations)
+                offset = _clamp(cursor["offset"], page_size, total)
+                rows = annotations.page(offset, page_size, sort_by)
+        if not rows:
+            return []
         return [
+            *(_annotation_row(annotator_id, ann) for ann in rows),
             html.Div(
                 [
-                    html.Div(
-                        [
-                            html.Div(f'"{ann["text"]}"', className="font-medium"),
-                            html.Div(ann["note"], className="text-sm text-gray-600"),
-                        ],
-                        className="flex-1",
+                    html.Button(
+                        "Previous",
+                        id=ids.list_prev(annotator_id),
+                        disabled=offset == 0,
+                    ),
+                    html.Span(
+                        f"{offset + 1}-{offset + len(rows)} of {total}",
+                        className="text-sm text-gray-600",
                     ),
                     html.Button(
-                        "Remove",
-                        id=ids.remove_annotation(annotator_id, ann["id"]),
+                        "Next",
+                        id=ids.list_next(annotator_id),
+                        disabled=offset + page_size >= total,
                     ),
                 ],
-            )
-            for ann in annotations_data
+                className="flex items-center gap-2",
+            ),
         ]
+
+    @callback(
+        Output(ids.list_cursor(MATCH), "data"),
+        Input(ids.list_prev(MATCH), "n_clicks"),
+        Input(ids.list_next(MATCH), "n_clicks"),
+        State(ids.list_cursor(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        State(ids.annotations_fingerprint(MATCH), "data"),
+        prevent_initial_call=True,
+    )
+    def move_cursor(prev_clicks, next_clicks, cursor, document=None, fingerprint=None):
+        """Move a paginated list one page back or forward.
+
+        The list length is the count in the store's fingerprint, or read
+        from the repository.
+        """
+        ctx = dash.callback_context
+        if not ctx.triggered or not ctx.triggered[0]["value"]:
+            return dash.no_update
+        if document is not None:
+            repository = _repositories[ctx.triggered_id["id"]]
+            total = repository.page(document, 0, 0)[0]
+        elif fingerprint:
+            total = fingerprint[0]
+        else:
+            return dash.no_update
+        step = cursor["page_size"]
+        if ctx.triggered_id["subcomponent"] == "list-prev":
+            step = -step
+        offset = _clamp(cursor["offset"] + step, cursor["page_size"], total)
+        if offset == cursor["offset"]:
+            return dash.no_update
+        return dict(cursor, offset=offset)
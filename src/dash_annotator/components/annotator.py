@@ -1,13 +1,77 @@
 """DashAnnotator component for text annotation in Dash applications."""
 
-from dash import html, dcc, Input, Output, clientside_callback, callback, MATCH, ALL
-from dataclasses import asdict
-from typing import List, Optional
+from dash import (
+    html,
+    dcc,
+    Input,
+    Output,
+    State,
+    Patch,
+    clientside_callback,
+    callback,
+    MATCH,
+    ALL,
+)
+from dash.exceptions import MissingCallbackContextException
+import dash
+from typing import List, Optional, Union
 
 from dash_extensions import EventListener
-from dash_annotator.components.base import BaseAnnotation, Annotation
+from dash_annotator.annotation_set import (
+    Annotation,
+    AnnotationColumns,
+    AnnotationSet,
+    _diff,
+    _is_packed,
+    _records,
+    _store_records,
+)
+from dash_annotator.cache import _digest
+from dash_annotator.components.base import BaseAnnotation
+from dash_annotator.components.state import (
+    _registry,
+    _render_cache,
+    _rendered,
+    _repositories,
+    _store_formats,
+    _text_sync,
+    _themes,
+)
+from dash_annotator.components.styles import (
+    CONTAINER_CLASS,
+    CONTAINER_STYLE,
+    OVERLAY_CLASS,
+    OVERLAY_STYLE,
+    SCROLLER_CLASS,
+    SCROLLER_STYLE,
+    TEXTAREA_CLASS,
+    TEXTAREA_STYLE,
+    _highlight_style,
+    _Theme,
+)
+from dash_annotator.components.text_view import AnnotatedTextView
+from dash_annotator.corpus import AnnotationCorpus
+from dash_annotator.document import AnnotationDocument, _window
+from dash_annotator.repository import AnnotationRepository
+
+RENDERERS = ("server", "client", "native", "background")
+
+TEXT_SYNCS = ("full", "delta")
 
-DEFAULT_FONT = "-apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen-Sans, Ubuntu, Cantarell, 'Helvetica Neue', sans-serif"
+STORE_FORMATS = ("records", "packed")
+
+# Characters rendered by a virtualized annotator before the first scroll
+# event reports the textarea's metrics.
+INITIAL_WINDOW = 10_000
+
+STYLINGS = ("inline", "classes")
+
+
+def _refs(repository, document, rebased):
+    """Return the text store ref, and the annotations store ref if an edit
+    changed or removed annotations."""
+    ref = repository.ref(document)
+    return ref, dict(ref) if rebased else dash.no_update
 
 
 clientside_callback(
@@ -31,38 +95,848 @@ clientside_callback(
     prevent_initial_call=False,
 )
 
+# Forward textarea edits to `update_text_store`. The shadow store holds the
+# last text sent. With full sync that is followed by the whole value, and the
+# annotations of an inline annotator are rebased onto the edit right here, in
+# the browser that owns them (repository annotators are rebased by the
+# server). With delta sync only the changed middle section is sent, with
+# offsets in code points to match Python string indexing. If the server
+# missed a delta or reported that its copy diverged, the whole text is resent
+# at once, once per text store version, and again with the next edit. The
+# text store is written by `update_text_store`, which this feeds, so it is
+# watched through its timestamp and read as State: its data is not an input.
 clientside_callback(
-    """function(n_events, event) {
-    event.forEach(e => {
-        if ("srcElement.scrollTop" in e) {   
-            return e["srcElement.scrollTop"];
+    """function(value, timestamp, textRef, shadow, annotations) {
+    const noUpdate = window.dash_clientside.no_update;
+    if (value === undefined || value === null) {
+        return [noUpdate, noUpdate, noUpdate];
+    }
+    const resync = shadow.seq !== undefined && textRef && textRef.resync;
+    if (
+        value === shadow.text &&
+        !(resync && shadow.resynced !== textRef.version)
+    ) {
+        return [noUpdate, noUpdate, noUpdate];
+    }
+    const pairs = s => (s.match(/[\\ud800-\\udbff][\\udc00-\\udfff]/g) || []).length;
+    const old = shadow.text;
+    const seq = shadow.seq + 1;
+    if (resync) {
+        const length = value.length - pairs(value);
+        const delta = {seq, offset: 0, delete: null, insert: value, length};
+        return [
+            delta,
+            {text: value, seq, length, resynced: textRef.version},
+            noUpdate,
+        ];
+    }
+    const limit = Math.min(old.length, value.length);
+    let start = 0;
+    while (start < limit && old[start] === value[start]) {
+        start++;
+    }
+    let end = 0;
+    while (
+        end < limit - start &&
+        old[old.length - 1 - end] === value[value.length - 1 - end]
+    ) {
+        end++;
+    }
+    // Never split a surrogate pair.
+    if (start > 0 && /[\\ud800-\\udbff]/.test(old[start - 1])) {
+        start--;
+    }
+    if (end > 0 && /[\\udc00-\\udfff]/.test(old[old.length - end])) {
+        end--;
+    }
+    const removed = old.slice(start, old.length - end);
+    const insert = value.slice(start, value.length - end);
+    if (shadow.seq === undefined) {
+        // Packed stores are rebased as records, keeping note table indices.
+        const packed = annotations && annotations.packed ? annotations : null;
+        if (packed) {
+            annotations = packed.ids.map((id, i) => ({
+                id,
+                start: packed.starts[i],
+                end: packed.starts[i] + packed.lengths[i],
+                text: packed.texts[i],
+                note: packed.notes[i],
+            }));
+        }
+        if (!Array.isArray(annotations)) {
+            return [value, {text: value}, noUpdate];
+        }
+        // Same rules as `_rebase`: text inserted inside a span extends it,
+        // deleted text is cut out, spans left empty are dropped and empty
+        // spans move with their start. The store is a list of absolute
+        // offsets, so every span is visited.
+        // Store offsets are code points: the edit is converted from UTF-16.
+        const editStart = start - pairs(old.slice(0, start));
+        const removedLength = removed.length - pairs(removed);
+        const insertLength = insert.length - pairs(insert);
+        const editEnd = editStart + removedLength;
+        const shift = insertLength - removedLength;
+        const unit = window.dash_annotator.unitOffsets(value);
+        let changed = false;
+        const rebased = [];
+        for (const ann of annotations) {
+            const from = ann.start < editStart ? ann.start
+                : ann.start >= editEnd ? ann.start + shift
+                : editStart + insertLength;
+            const to = ann.start >= ann.end ? from
+                : ann.end <= editStart ? ann.end
+                : ann.end > editEnd ? ann.end + shift
+                : editStart;
+            const touched = ann.start < editEnd && ann.end > editStart;
+            if (!touched && from === ann.start && to === ann.end) {
+                rebased.push(ann);
+                continue;
+            }
+            changed = true;
+            if (from < to || ann.start >= ann.end) {
+                rebased.push({
+                    ...ann,
+                    start: from,
+                    end: to,
+                    text: value.slice(unit(from), unit(to)),
+                });
+            }
+        }
+        if (changed && packed) {
+            return [value, {text: value}, Object.assign({}, packed, {
+                ids: rebased.map(ann => ann.id),
+                starts: rebased.map(ann => ann.start),
+                lengths: rebased.map(ann => ann.end - ann.start),
+                texts: rebased.map(ann => ann.text),
+                notes: rebased.map(ann => ann.note),
+            })];
+        }
+        return [value, {text: value}, changed ? rebased : noUpdate];
+    }
+    const deleted = removed.length - pairs(removed);
+    const length = shadow.length - deleted + insert.length - pairs(insert);
+    const delta = {
+        seq,
+        offset: start - pairs(old.slice(0, start)),
+        delete: deleted,
+        insert,
+        length,
+    };
+    return [delta, {text: value, seq, length}, noUpdate];
+}""",
+    Output(BaseAnnotation.ids.text_input_store(MATCH), "data"),
+    Output(BaseAnnotation.ids.text_shadow_store(MATCH), "data"),
+    Output(BaseAnnotation.ids.annotations_store(MATCH), "data", allow_duplicate=True),
+    Input(BaseAnnotation.ids.textarea(MATCH), "value"),
+    Input(BaseAnnotation.ids.text_store(MATCH), "modified_timestamp"),
+    State(BaseAnnotation.ids.text_store(MATCH), "data"),
+    State(BaseAnnotation.ids.text_shadow_store(MATCH), "data"),
+    State(BaseAnnotation.ids.annotations_store(MATCH), "data"),
+    prevent_initial_call=True,
+)
+
+# Fingerprint the annotations store in the browser. Server callbacks that
+# work on a session's copy of the annotations compare it with this instead
+# of receiving the store (see `_session_annotations`).
+clientside_callback(
+    """function(annotations) {
+    return window.dash_annotator.fingerprint(annotations);
+}""",
+    Output(BaseAnnotation.ids.annotations_fingerprint(MATCH), "data"),
+    Input(BaseAnnotation.ids.annotations_store(MATCH), "data"),
+)
+
+# Track the textarea selection in the browser. Listener events are coalesced
+# per textarea: the first event of a burst schedules a flush on the next
+# animation frame (or after the configured throttle), later events only
+# replace the pending one, and the store is written only when the selected
+# range changed.
+clientside_callback(
+    """function(n_events, event, config) {
+    const noUpdate = window.dash_clientside.no_update;
+    if (!event || !("srcElement.selectionStart" in event)) {
+        return noUpdate;
+    }
+    const states = window.dashAnnotatorSelections || (window.dashAnnotatorSelections = {});
+    const key = event["srcElement.id"];
+    const state = states[key] || (states[key] = {selection: null});
+    state.event = event;
+    if (state.pending) {
+        return noUpdate;
+    }
+    state.pending = true;
+    return new Promise(resolve => {
+        const flush = () => {
+            state.pending = false;
+            // Selection offsets are UTF-16 units; the store holds code points.
+            const textarea = document.getElementById(key);
+            const value = textarea ? textarea.value : "";
+            const toCodePoints = unit => window.dash_annotator.codePointOffset(value, unit);
+            const start = toCodePoints(state.event["srcElement.selectionStart"]);
+            const end = toCodePoints(state.event["srcElement.selectionEnd"]);
+            const selection = start !== end ? {start, end} : null;
+            const last = state.selection;
+            if (
+                selection === last ||
+                (selection && last && selection.start === last.start && selection.end === last.end)
+            ) {
+                resolve(noUpdate);
+                return;
+            }
+            state.selection = selection;
+            resolve(selection);
+        };
+        if (config && config.throttle) {
+            setTimeout(flush, config.throttle);
+        } else {
+            window.requestAnimationFrame(flush);
         }
     });
 }""",
-    Output(BaseAnnotation.ids.visual_text(MATCH), "scrollTop"),
+    Output(BaseAnnotation.ids.selection_store(MATCH), "data"),
     Input(BaseAnnotation.ids.textarea_listener(MATCH), "n_events"),
     Input(BaseAnnotation.ids.textarea_listener(MATCH), "event"),
+    State(BaseAnnotation.ids.selection_config(MATCH), "data"),
+)
+
+# Give every page load its own token so server-side state keyed by annotator
+# id (see `_AnnotationRegistry`) is not shared between tabs or across reloads.
+clientside_callback(
+    """function(id) {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}""",
+    Output(BaseAnnotation.ids.session_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.session_store(MATCH), "id"),
+)
+
+# Keep the overlay scrolled with the textarea. A passive scroll listener is
+# attached to the textarea directly, outside Dash's callback dispatcher, and
+# copies the scroll offset at most once per animation frame. While scrolling,
+# frame gaps are counted in `window.dashAnnotatorScrollStats[id]`.
+for _renderer in RENDERERS:
+    clientside_callback(
+        """function(textareaId) {
+    const domId = id => "{" + Object.keys(id).sort().map(
+        k => JSON.stringify(k) + ":" + JSON.stringify(id[k])
+    ).join(",") + "}";
+    const sourceId = domId(textareaId);
+    const targetId = domId(window.dash_clientside.callback_context.outputs_list.id);
+    const allStats = window.dashAnnotatorScrollStats || (window.dashAnnotatorScrollStats = {});
+    const frameTime = 1000 / 60;
+    const attach = () => {
+        const source = document.getElementById(sourceId);
+        const target = document.getElementById(targetId);
+        if (!source || !target) {
+            window.requestAnimationFrame(attach);
+            return;
+        }
+        if (source.dataset.scrollSync) {
+            return;
+        }
+        source.dataset.scrollSync = "frame";
+        const stats = allStats[textareaId.id] = {frames: 0, dropped: 0, syncs: 0};
+        let lastScroll = 0;
+        let previous = null;
+        let running = false;
+        const frame = now => {
+            if (previous !== null) {
+                const elapsed = Math.max(1, Math.round((now - previous) / frameTime));
+                stats.frames += elapsed;
+                stats.dropped += elapsed - 1;
+            }
+            previous = now;
+            if (target.scrollTop !== source.scrollTop || target.scrollLeft !== source.scrollLeft) {
+                target.scrollTop = source.scrollTop;
+                target.scrollLeft = source.scrollLeft;
+                stats.syncs += 1;
+            }
+            // Keep sampling frames until scrolling has been idle for a while.
+            if (now - lastScroll < 100) {
+                window.requestAnimationFrame(frame);
+            } else {
+                running = false;
+                previous = null;
+            }
+        };
+        source.addEventListener("scroll", () => {
+            lastScroll = performance.now();
+            if (!running) {
+                running = true;
+                window.requestAnimationFrame(frame);
+            }
+        }, {passive: true});
+    };
+    attach();
+    return window.dash_clientside.no_update;
+}""",
+        Output(BaseAnnotation.ids.visual_text(MATCH, _renderer), "scrollTop"),
+        Input(BaseAnnotation.ids.textarea(MATCH), "id"),
+    )
+
+# Add the generated stylesheet of an annotator in class styling mode to the
+# page. Annotators sharing label colors share one <style> element.
+clientside_callback(
+    """function(stylesheet) {
+    if (stylesheet && !document.getElementById(stylesheet.name)) {
+        const element = document.createElement("style");
+        element.id = stylesheet.name;
+        element.textContent = stylesheet.css;
+        document.head.appendChild(element);
+    }
+    return window.dash_clientside.no_update;
+}""",
+    Output(BaseAnnotation.ids.stylesheet(MATCH), "clear_data"),
+    Input(BaseAnnotation.ids.stylesheet(MATCH), "data"),
+)
+
+# Browser-side port of `_segments` + `_render_segment`. Keep the two in sync:
+# both renderers must produce the same segmentation for the same stores.
+# Offsets are code points, as in Python, and only converted to UTF-16 units
+# to slice the text.
+clientside_callback(
+    """function(text, annotations, viewport, stylesheet) {
+    if (!text) {
+        return "";
+    }
+    const length = window.dash_annotator.codePointLength(text);
+    const unit = window.dash_annotator.unitOffsets(text);
+    if (annotations && annotations.packed) {
+        const {ids, starts, lengths, notes, note_table} = annotations;
+        annotations = ids.map((id, i) => ({
+            id,
+            start: starts[i],
+            end: starts[i] + lengths[i],
+            note: typeof notes[i] === "number" ? note_table[notes[i]] : notes[i],
+        }));
+    }
+    annotations = annotations || [];
+    // Class names of a highlighted segment, as in `_Theme.segment_class`.
+    let classes = null;
+    if (stylesheet) {
+        const priority = new Map(stylesheet.labels.map((label, i) => [label, i]));
+        const labels = new Map();
+        annotations.forEach(ann => {
+            if (priority.has(ann.note)) {
+                labels.set(ann.id, priority.get(ann.note));
+            }
+        });
+        classes = active => {
+            let names = `da-hl da-d${Math.min(active.size, 4)}`;
+            const ranks = Array.from(active, id => labels.get(id))
+                .filter(rank => rank !== undefined);
+            if (ranks.length) {
+                names += ` da-l${Math.min(...ranks)}`;
+            }
+            return names;
+        };
+    }
+    // Window to render, as in `_window`; annotations are clipped to it.
+    let start = 0;
+    let end = length;
+    if (viewport) {
+        if (!viewport.scrollHeight) {
+            end = Math.min(length, viewport.initial);
+        } else {
+            const charsPerPx = length / viewport.scrollHeight;
+            const margin = viewport.overscan * viewport.height;
+            start = Math.floor(Math.max(0, viewport.top - margin) * charsPerPx);
+            end = Math.min(
+                length,
+                Math.ceil((viewport.top + viewport.height + margin) * charsPerPx)
+            );
+        }
+    }
+    if (start > 0 || end < length) {
+        annotations = annotations
+            .filter(ann => ann.start < end && ann.end > start)
+            .map(ann => Object.assign({}, ann, {
+                start: Math.max(ann.start, start),
+                end: Math.min(ann.end, end),
+            }));
+    }
+    // Boundaries are ordered as in `AnnotationSet.boundaries`, so segment
+    // keys match the server's: by position, the ends of non-empty spans
+    // before the starts, starts by (end, id), and the end of an empty span
+    // right after its start. Entries are [position, order..., id, is start].
+    const boundaries = [];
+    annotations.forEach(ann => {
+        boundaries.push([ann.start, 1, ann.end, ann.id, 0, true]);
+        boundaries.push(ann.start < ann.end
+            ? [ann.end, 0, 0, ann.id, 0, false]
+            : [ann.end, 1, ann.end, ann.id, 1, false]);
+    });
+    boundaries.sort((a, b) => {
+        for (let i = 0; i < a.length; i++) {
+            if (a[i] !== b[i]) {
+                return a[i] < b[i] ? -1 : 1;
+            }
+        }
+        return 0;
+    });
+    // Segment ids are keyed on annotation boundaries, as in `_segments`.
+    const prefix = `${dash_clientside.callback_context.outputs_list.id.id}-`;
+    const span = (from, to, active, key) => {
+        const children = text.slice(unit(from), unit(to));
+        if (active.size === 0) {
+            return {
+                namespace: "dash_html_components",
+                type: "Span",
+                props: {children, id: prefix + key},
+            };
+        }
+        if (classes) {
+            return {
+                namespace: "dash_html_components",
+                type: "Span",
+                props: {children, className: classes(active), id: prefix + key},
+            };
+        }
+        return {
+            namespace: "dash_html_components",
+            type: "Span",
+            props: {
+                children,
+                style: {
+                    opacity: Math.min(0.2 + active.size * 0.2, 1),
+                    borderBottomWidth: "2px",
+                    borderColor: "blue",
+                    backgroundColor: "blue",
+                },
+                id: prefix + key,
+            },
+        };
+    };
+    const parts = [];
+    if (start > 0) {
+        parts.push(span(0, start, new Set(), "before"));
+    }
+    const active = new Set();
+    let lastPos = start;
+    let lastKey = "start";
+    boundaries.forEach(([pos, , , annId, , isStart]) => {
+        if (pos > lastPos) {
+            parts.push(span(lastPos, pos, active, lastKey));
+        }
+        if (isStart) {
+            active.add(annId);
+            lastKey = `s-${annId}`;
+        } else {
+            active.delete(annId);
+            lastKey = `e-${annId}`;
+        }
+        lastPos = pos;
+    });
+    if (lastPos < end) {
+        parts.push(span(lastPos, end, new Set(), lastKey));
+    }
+    if (end < length) {
+        parts.push(span(end, length, new Set(), "after"));
+    }
+    return parts;
+}""",
+    Output(BaseAnnotation.ids.visual_text(MATCH, "client"), "children"),
+    Input(BaseAnnotation.ids.text_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.annotations_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.viewport_store(MATCH), "data"),
+    State(BaseAnnotation.ids.stylesheet(MATCH), "data"),
+)
+
+# Feed the native `AnnotatedTextView` renderer: the stores are flattened into
+# offsets and labels, and the component splits the text itself.
+clientside_callback(
+    """function(text, annotations, viewport) {
+    const offsets = [];
+    let labels = [];
+    if (annotations && annotations.packed) {
+        labels = annotations.ids;
+        annotations.starts.forEach((start, i) => {
+            offsets.push(start, start + annotations.lengths[i]);
+        });
+    } else {
+        (annotations || []).forEach(ann => {
+            offsets.push(ann.start, ann.end);
+            labels.push(ann.id);
+        });
+    }
+    return [text || "", offsets, labels, viewport];
+}""",
+    Output(BaseAnnotation.ids.visual_text(MATCH, "native"), "text"),
+    Output(BaseAnnotation.ids.visual_text(MATCH, "native"), "offsets"),
+    Output(BaseAnnotation.ids.visual_text(MATCH, "native"), "labels"),
+    Output(BaseAnnotation.ids.visual_text(MATCH, "native"), "viewport"),
+    Input(BaseAnnotation.ids.text_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.annotations_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.viewport_store(MATCH), "data"),
+)
+
+# Record the textarea scroll metrics for virtualized annotators. The store
+# only changes once the visible range drifts half an overscan margin away
+# from the one last rendered, so scrolling within the window costs nothing.
+clientside_callback(
+    """function(event, viewport) {
+    if (!viewport || !event || !("srcElement.scrollHeight" in event)) {
+        return window.dash_clientside.no_update;
+    }
+    const top = event["srcElement.scrollTop"];
+    const height = event["srcElement.clientHeight"];
+    const scrollHeight = event["srcElement.scrollHeight"];
+    if (
+        viewport.scrollHeight === scrollHeight &&
+        viewport.height === height &&
+        Math.abs(viewport.top - top) < (viewport.overscan * height) / 2
+    ) {
+        return window.dash_clientside.no_update;
+    }
+    return Object.assign({}, viewport, {top, height, scrollHeight});
+}""",
+    Output(BaseAnnotation.ids.viewport_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.textarea_listener(MATCH), "event"),
+    State(BaseAnnotation.ids.viewport_store(MATCH), "data"),
 )
 
 
+def _render_segment(
+    text, start, end, active_annotations, key, prefix="", class_name=None
+):
+    """Render a single segment produced by `_segments` as a span.
+
+    The span id is the segment key, prefixed with `prefix` (the annotator
+    id), so React keeps the same DOM node for a segment across renders.
+    Highlighted segments are styled inline, or with `class_name` in class
+    styling mode (see `_Theme.segment_class`).
+    """
+    if not active_annotations:
+        return html.Span(text[start:end], id=prefix + key)
+    if class_name is not None:
+        return html.Span(text[start:end], className=class_name, id=prefix + key)
+    return html.Span(
+        text[start:end],
+        style=_highlight_style(len(active_annotations)),
+        id=prefix + key,
+    )
+
+
+def _signature(text, start, end, active_annotations, key, class_name=None):
+    """Identify what a rendered segment shows, without keeping its text."""
+    return key, hash(text[start:end]), len(active_annotations), class_name
+
+
+def _diff_segments(previous, current, render):
+    """Return a `Patch` turning the segments rendered with signatures
+    `previous` into those with signatures `current`, or None if replacing
+    the whole list is cheaper.
+
+    Only the run between the common prefix and suffix is patched, so an
+    edit inside one segment sends one segment. `render(i)` renders the
+    ``i``-th current segment.
+    """
+    limit = min(len(previous), len(current))
+    head = 0
+    while head < limit and previous[head] == current[head]:
+        head += 1
+    tail = 0
+    while (
+        tail < limit - head
+        and previous[len(previous) - 1 - tail] == current[len(current) - 1 - tail]
+    ):
+        tail += 1
+    removed = len(previous) - head - tail
+    added = len(current) - head - tail
+    if removed + added >= len(current):
+        return None
+    patch = Patch()
+    for index in range(head, head + min(removed, added)):
+        patch[index] = render(index)
+    for _ in range(removed - added):
+        del patch[head + added]
+    for index in range(head + removed, head + added):
+        patch.insert(index, render(index))
+    return patch
+
+
+class _Rendering:
+    """
+    Segmentation of a text by its annotations, with spans rendered on
+    demand.
+
+    Renderings are shared between sessions through the render cache and are
+    only modified to memoize rendered spans.
+    """
+
+    def __init__(self, document, viewport, prefix="", theme=None):
+        self.text = document.text
+        self.prefix = prefix
+        self.segments = list(document.window_segments(viewport))
+        self.class_names = [
+            (
+                None
+                if theme is None
+                else theme.segment_class(document.annotations, segment[2])
+            )
+            for segment in self.segments
+        ]
+        self.signatures = [
+            _signature(self.text, *segment, class_name)
+            for segment, class_name in zip(self.segments, self.class_names)
+        ]
+        self._spans = [None] * len(self.segments)
+
+    def span(self, index):
+        """Return the span of the ``index``-th segment."""
+        span = self._spans[index]
+        if span is None:
+            span = self._spans[index] = _render_segment(
+                self.text,
+                *self.segments[index],
+                prefix=self.prefix,
+                class_name=self.class_names[index],
+            )
+        return span
+
+    def spans(self):
+        """Return the spans of all segments."""
+        return [self.span(index) for index in range(len(self.segments))]
+
+
+def _output_annotator_id():
+    """Return the annotator id of the running callback's first output, or
+    None when called outside a callback."""
+    try:
+        outputs = dash.callback_context.outputs_list
+    except MissingCallbackContextException:
+        return None
+    return (outputs[0] if isinstance(outputs, list) else outputs)["id"]["id"]
+
+
+def _rendering_for(
+    annotator_id, text, annotations_data, viewport, session=None, cache=_render_cache
+):
+    """Return the `_Rendering` of an annotator's stores, or None for an
+    empty text.
+
+    Renderings are looked up in and added to `cache`, if any. With a
+    `session`, the session's interval index, which the annotation callbacks
+    work on, is kept in step with an inline annotations store and reused.
+    """
+    document_id = None
+    if isinstance(annotations_data, dict) and not _is_packed(annotations_data):
+        # Repository-backed annotator: both stores hold references. The
+        # cache is keyed by text and version, which are cheap to read; the
+        # annotations are only copied out on a miss.
+        document_id = annotations_data["document"]
+        repository = _repositories[annotator_id]
+        text = repository.text(document_id)
+        annotations_version = repository.version(document_id)
+    if not text:
+        return None
+    theme = _themes.get(annotator_id)
+
+    def cache_key():
+        return (
+            annotator_id,
+            None if theme is None else theme.name,
+            _digest(text),
+            document_id,
+            (
+                annotations_version
+                if document_id is not None
+                else _digest(annotations_data or [])
+            ),
+            _window(viewport, len(text)),
+        )
+
+    rendering = key = None
+    if cache is not None:
+        key = cache_key()
+        rendering = cache.get(key)
+    if rendering is None and document_id is not None:
+        # Text, version and annotations of the same version, read at once.
+        text, annotations_version, repository_annotations = repository.snapshot(
+            document_id
+        )
+        if not text:
+            return None
+        if cache is not None:
+            key = cache_key()
+    annotations = None
+    if document_id is None and session is not None:
+        annotations = _registry.sync(
+            annotator_id, session, _store_records(annotations_data) or []
+        )
+    if rendering is None:
+        if document_id is not None:
+            document = AnnotationDocument(text, repository_annotations)
+        elif annotations is None:
+            document = AnnotationDocument.from_store(text, annotations_data)
+        else:
+            document = AnnotationDocument(text, annotations)
+        rendering = _Rendering(
+            document,
+            viewport,
+            prefix="" if annotator_id is None else f"{annotator_id}-",
+            theme=theme,
+        )
+        if cache is not None:
+            cache.put(key, rendering)
+    return rendering
+
+
 class TextAnnotator(html.Div, BaseAnnotation):
     """
     An All-in-One component for text annotation in Dash applications.
+
+    Parameters
+    ----------
+    id : str
+        Unique identifier for the annotator.
+    value : str
+        Initial text content.
+    annotations : list of Annotation or AnnotationColumns, optional
+        Initial annotations.
+    textarea_props : dict, optional
+        Extra properties passed to the underlying textarea.
+    renderer : {"server", "client", "native", "background"}
+        Where the highlighted text layer is rendered. ``"server"`` runs
+        `update_visual_text` in Python; ``"client"`` runs the same boundary
+        sweep in the browser, so edits do not round-trip to the server to
+        redraw highlights. ``"native"`` also renders in the browser, with
+        the `AnnotatedTextView` React component, which takes flat offsets
+        instead of a tree of spans and only re-renders changed segments.
+        ``"background"`` runs the server renderer as a Dash background
+        callback, so rendering a very large document does not hold a
+        request worker; the app needs a `background_callback_manager` (see
+        `background_manager`). Every rendering is sent whole, and a new
+        one cancels the rendering still running.
+    virtualize : bool
+        Only split the text around annotations that intersect the visible
+        scroll window (plus `overscan`), rendering the rest as plain text, so
+        the overlay's node count is bounded by the viewport rather than the
+        document.
+    overscan : float
+        Extra viewport heights rendered above and below the visible window
+        when `virtualize` is set.
+    repository : AnnotationRepository, optional
+        Keep the text and annotations on the server. The stores then only
+        hold ``{"document", "version"}`` references, and edits persist
+        across page reloads. Requires the server or background renderer.
+    document_id : str, optional
+        Repository document to edit; defaults to `id`, or to the first
+        document of an `AnnotationCorpus`. A missing document is created
+        from `value` and `annotations`.
+    text_sync : {"full", "delta"}
+        How textarea edits reach the server. ``"full"`` sends the whole text
+        on every change; ``"delta"`` sends only the edited range, applied to
+        the repository's copy, so upstream bytes follow the size of the
+        edit. Delta sync requires a `repository`.
+    store_format : {"records", "packed"}
+        Encoding of the annotations store. ``"records"`` holds one dict per
+        annotation; ``"packed"`` holds parallel arrays with a table of
+        distinct notes (see `AnnotationColumns.to_packed`), which is much
+        smaller on the wire for large sets. Ignored with a `repository`,
+        whose store only holds a reference.
+    selection_throttle : int, optional
+        Milliseconds to coalesce textarea events over before updating the
+        selection store. By default events are coalesced per animation
+        frame. Either way the selection is tracked in the browser and the
+        store is only written when the selected range changes.
+    styling : {"inline", "classes"}
+        How the layout and highlights are styled. ``"inline"`` puts a style
+        dict on every element and highlighted span; ``"classes"`` injects a
+        generated stylesheet once per page and only sends class names,
+        which keeps render payloads small. Not supported by the native
+        renderer.
+    label_colors : dict, optional
+        CSS color of the highlights of each annotation note, in class
+        styling mode. A segment covered by several labelled annotations
+        takes the color of the label listed first.
     """
 
     ids = BaseAnnotation.ids
 
+    # LRU cache of server renderings shared by all annotators. Resize it with
+    # ``render_cache.resize(maxsize)``; ``render_cache.cache_info()`` reports
+    # hits and misses.
+    render_cache = _render_cache
+
     def __init__(
         self,
         id: str,
         value: str = "",
-        annotations: Optional[List[Annotation]] = None,
+        annotations: Optional[Union[List[Annotation], AnnotationColumns]] = None,
         textarea_props: dict = None,
+        renderer: str = "server",
+        virtualize: bool = False,
+        overscan: float = 1.0,
+        repository: Optional[AnnotationRepository] = None,
+        document_id: Optional[str] = None,
+        text_sync: str = "full",
+        store_format: str = "records",
+        selection_throttle: Optional[int] = None,
+        styling: str = "inline",
+        label_colors: Optional[dict] = None,
     ):
+        if renderer not in RENDERERS:
+            raise ValueError(f"renderer must be one of {RENDERERS}, got {renderer!r}")
+        if text_sync not in TEXT_SYNCS:
+            raise ValueError(
+                f"text_sync must be one of {TEXT_SYNCS}, got {text_sync!r}"
+            )
+        if text_sync == "delta" and repository is None:
+            raise ValueError("delta text sync requires a repository")
+        if store_format not in STORE_FORMATS:
+            raise ValueError(
+                f"store_format must be one of {STORE_FORMATS}, got {store_format!r}"
+            )
+        if styling not in STYLINGS:
+            raise ValueError(f"styling must be one of {STYLINGS}, got {styling!r}")
+        if styling == "classes" and renderer == "native":
+            raise ValueError("the native renderer does not support class styling")
         if annotations is None:
             annotations = []
         if textarea_props is None:
             textarea_props = {}
+        if repository is None:
+            document_id = None
+            text_data = value
+            annotations_data = _records(annotations)
+            _registry.seed(id, annotations_data)
+            if store_format == "packed":
+                annotations_data = AnnotationColumns(annotations_data).to_packed()
+            _store_formats[id] = store_format
+        else:
+            if renderer not in ("server", "background"):
+                raise ValueError(f"the {renderer} renderer cannot read a repository")
+            if document_id is None:
+                if isinstance(repository, AnnotationCorpus) and len(repository):
+                    document_id = repository.document_id(0)
+                else:
+                    document_id = id
+            if not repository.exists(document_id):
+                repository.create(document_id, value, annotations)
+            value = repository.text(document_id)
+            text_data = annotations_data = repository.ref(document_id)
+            _repositories[id] = repository
+        if styling == "classes":
+            theme = _Theme(label_colors)
+            _themes[id] = theme
+            layout = {
+                "container": {"className": f"{CONTAINER_CLASS} {theme.name}"},
+                "scroller": {"className": SCROLLER_CLASS},
+                "textarea": {"className": TEXTAREA_CLASS},
+                "overlay": {"className": OVERLAY_CLASS},
+            }
+        else:
+            theme = None
+            _themes.pop(id, None)
+            layout = {
+                "container": {"style": CONTAINER_STYLE},
+                "scroller": {"style": SCROLLER_STYLE},
+                "textarea": {"style": TEXTAREA_STYLE},
+                "overlay": {"style": OVERLAY_STYLE},
+            }
         # Event listener configuration
         event_props = [
             "srcElement.selectionStart",
@@ -91,16 +965,75 @@ class TextAnnotator(html.Div, BaseAnnotation):
         stores = [
             dcc.Store(
                 id=self.ids.text_store(id),
-                data=value,
+                data=text_data,
             ),
             dcc.Store(
                 id=self.ids.annotations_store(id),
-                data=[asdict(ann) for ann in annotations],
+                data=annotations_data,
+            ),
+            dcc.Store(
+                id=self.ids.annotations_fingerprint(id),
+                data=None,
+            ),
+            dcc.Store(
+                id=self.ids.annotations_resync(id),
+                data=None,
+            ),
+            dcc.Store(
+                id=self.ids.annotations_synced(id),
+                data=None,
+            ),
+            dcc.Store(
+                id=self.ids.text_input_store(id),
+                data=None,
+            ),
+            dcc.Store(
+                id=self.ids.text_shadow_store(id),
+                data=(
+                    {"text": value, "seq": 0, "length": len(value)}
+                    if text_sync == "delta"
+                    else {"text": value}
+                ),
             ),
             dcc.Store(
                 id=self.ids.selection_store(id),
                 data=None,
             ),
+            dcc.Store(
+                id=self.ids.viewport_store(id),
+                data=(
+                    {
+                        "top": 0,
+                        "height": None,
+                        "scrollHeight": None,
+                        "overscan": overscan,
+                        "initial": INITIAL_WINDOW,
+                    }
+                    if virtualize
+                    else None
+                ),
+            ),
+            dcc.Store(
+                id=self.ids.document_store(id),
+                data=document_id,
+            ),
+            *(
+                [dcc.Store(id=self.ids.render_store(id), data=None)]
+                if renderer == "server"
+                else []
+            ),
+            dcc.Store(
+                id=self.ids.stylesheet(id),
+                data=None if theme is None else theme.to_store(),
+            ),
+            dcc.Store(
+                id=self.ids.selection_config(id),
+                data={"throttle": selection_throttle},
+            ),
+            dcc.Store(
+                id=self.ids.session_store(id),
+                data=None,
+            ),
         ]
         super().__init__(
             [
@@ -112,160 +1045,160 @@ class TextAnnotator(html.Div, BaseAnnotation):
                                 id=self.ids.textarea(id),
                                 value=value,
                                 placeholder="Type or paste text here to annotate...",
-                                style={
-                                    "position": "absolute",
-                                    "top": "0",
-                                    "left": "0",
-                                    "width": "100%",
-                                    "height": "100%",
-                                    "padding": "0.5rem",
-                                    "fontFamily": DEFAULT_FONT,
-                                    "fontSize": "1rem",
-                                    "lineHeight": "1rem",
-                                    "border": "none",
-                                    "resize": "none",
-                                    "color": "transparent",
-                                    "caretColor": "black",
-                                    "background": "transparent",
-                                    "whiteSpace": "pre-wrap",
-                                    "overflowWrap": "break-word",
-                                    "overflowY": "auto",
-                                    "zIndex": "2",
-                                    "boxSizing": "border-box",
-                                },
                                 persistence=True,
                                 spellCheck=False,
+                                **layout["textarea"],
                                 **textarea_props,
                             ),
                             events=events,
                             id=self.ids.textarea_listener(id),
                         ),
                         # Visual text representation
-                        html.Div(
-                            id=self.ids.visual_text(id),
-                            style={
-                                "position": "absolute",
-                                "top": "0",
-                                "left": "0",
-                                # "right": "0",
-                                # "bottom": "0",
-                                "width": "100%",
-                                "height": "100%",
-                                "padding": "0.5rem",
-                                "fontSize": "1rem",
-                                "lineHeight": "1rem",
-                                "whiteSpace": "pre-wrap",
-                                "pointerEvents": "none",
-                                "fontFamily": DEFAULT_FONT,
-                            },
+                        (AnnotatedTextView if renderer == "native" else html.Div)(
+                            id=self.ids.visual_text(id, renderer),
+                            **layout["overlay"],
                         ),
                     ],
-                    style={
-                        "position": "absolute",
-                        "top": "0",
-                        "left": "0",
-                        "right": "0",
-                        "bottom": "0",
-                        "padding": "0.5rem",
-                        "fontFamily": DEFAULT_FONT,
-                        "fontSize": "1rem",
-                        "lineHeight": "1rem",
-                        "whiteSpace": "pre-wrap",
-                        "overflowWrap": "break-word",
-                        "wordWrap": "break-word",
-                        "overflowY": "auto",
-                        "zIndex": "1",
-                        "boxSizing": "border-box",
-                    },
+                    **layout["scroller"],
                 ),
             ],
-            style={
-                "position": "relative",
-                "borderRadius": "0.5rem",
-                "borderWidth": "1px",
-                "boxShadow": "0 1px 2px 0 rgba(0, 0, 0, 0.05)",
-                "minHeight": "3rem",
-                # "width": "500px",
-                # "height": "300px",
-            },
+            **layout["container"],
             id=self.ids.main_container(id),
         )
 
     @callback(
         Output(ids.text_store(MATCH), "data"),
-        Input(ids.textarea(MATCH), "value"),
+        Output(ids.annotations_store(MATCH), "data", allow_duplicate=True),
+        Input(ids.text_input_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        State(ids.session_store(MATCH), "data"),
+        prevent_initial_call=True,
     )
-    def update_text_store(value):
-        """Update the text store when textarea changes."""
-        return value
+    def update_text_store(value, document=None, session=None):
+        """Update the text store when textarea changes.
+
+        `value` is either the full text or, with delta sync, an edit delta
+        that is applied to the repository's copy of the text. Repository
+        annotations are rebased onto every edit, and the annotations store
+        is refreshed when an edit changed or removed any of them.
+        """
+        if value is None:
+            return dash.no_update, dash.no_update
+        if document is None:
+            return value, dash.no_update
+        annotator_id = dash.callback_context.outputs_list[0]["id"]["id"]
+        repository = _repositories[annotator_id]
+        if not isinstance(value, dict):
+            edit = _diff(repository.text(document), value)
+            rebased = repository.edit(document, *edit)[1]
+            return _refs(repository, document, rebased)
+        if session is None:
+            # Deltas of tabs without a session cannot be ordered: drop them
+            # and ask for the whole text once the session is known.
+            text_ref = repository.ref(document)
+            text_ref.update(resync=True)
+            return text_ref, dash.no_update
+        rebased = []
+        with _text_sync.lock:
+            deltas, gap = _text_sync.push(annotator_id, session, value)
+            for delta in deltas:
+                if delta["delete"] is None:
+                    edit = _diff(repository.text(document), delta["insert"])
+                else:
+                    edit = delta["offset"], delta["delete"], delta["insert"]
+                try:
+                    rebased += repository.edit(document, *edit)[1]
+                except ValueError:
+                    # The delta does not fit the server's copy.
+                    gap = True
+                    break
+            length = len(repository.text(document))
+        if not deltas and not gap:
+            return dash.no_update, dash.no_update
+        text_ref, annotations_ref = _refs(repository, document, rebased)
+        if gap or length != deltas[-1]["length"]:
+            # A delta is missing or the copies diverged; ask the client for
+            # the whole text.
+            text_ref.update(resync=True)
+        return text_ref, annotations_ref
 
     @callback(
-        Output(ids.selection_store(MATCH), "data"),
-        Input(ids.textarea_listener(MATCH), "n_events"),
-        Input(ids.textarea_listener(MATCH), "event"),
+        Output(ids.annotations_synced(MATCH), "data"),
+        Input(ids.annotations_resync(MATCH), "data"),
+        State(ids.annotations_store(MATCH), "data"),
+        State(ids.session_store(MATCH), "data"),
+        prevent_initial_call=True,
     )
-    def update_selection_store(n_events, event):
-        """Update the selection store when selection changes."""
-        if event:
-            start = event["srcElement.selectionStart"]
-            end = event["srcElement.selectionEnd"]
-            if start != end:
-                return {"start": start, "end": end}
-        return None
+    def sync_annotations(action, annotations_data, session=None):
+        """Rebuild the session's annotations from the store, which is only
+        sent here, when a callback found its copy out of date, then hand
+        that callback's `action` back to it (see `_session_annotations`)."""
+        if action is None or session is None:
+            return dash.no_update
+        annotator_id = dash.callback_context.triggered_id["id"]
+        _registry.put(
+            annotator_id,
+            session,
+            AnnotationSet(_store_records(annotations_data) or []),
+        )
+        return action
 
     @callback(
-        Output(ids.visual_text(MATCH), "children"),
+        Output(ids.visual_text(MATCH, "server"), "children"),
+        Output(ids.render_store(MATCH), "data"),
         Input(ids.text_store(MATCH), "data"),
         Input(ids.annotations_store(MATCH), "data"),
+        Input(ids.viewport_store(MATCH), "data"),
+        State(ids.session_store(MATCH), "data"),
+        State(ids.render_store(MATCH), "data"),
     )
-    def update_visual_text(text, annotations_data):
-        """Update the visual representation of text with annotations."""
-        if not text:
-            return ""
-        if not annotations_data:
-            annotations_data = []
-
-        # Create a list of all boundary points
-        boundaries = []
-        for ann in annotations_data:
-            boundaries.append((ann["start"], "start", ann["id"]))
-            boundaries.append((ann["end"], "end", ann["id"]))
-
-        # Sort boundaries by position
-        boundaries.sort(key=lambda x: (x[0], x[1] != "end"))
-
-        # Build text parts with proper handling of overlapping annotations
-        parts = []
-        last_pos = 0
-        active_annotations = set()
-
-        for pos, boundary_type, ann_id in boundaries:
-            if pos > last_pos:
-                if not active_annotations:
-                    parts.append(html.Span(text[last_pos:pos], id=f"text-{last_pos}"))
-                else:
-                    parts.append(
-                        html.Span(
-                            text[last_pos:pos],
-                            # className=f"border-b-2 border-blue-400 bg-blue-50",
-                            style={
-                                "opacity": min(0.2 + len(active_annotations) * 0.2, 1),
-                                "borderBottomWidth": "2px",
-                                "borderColor": "blue",
-                                "backgroundColor": "blue",
-                            },
-                            id=f"overlap-{'-'.join(sorted(active_annotations))}",
-                        )
-                    )
-
-            if boundary_type == "start":
-                active_annotations.add(ann_id)
-            else:
-                active_annotations.discard(ann_id)
+    def update_visual_text(
+        text, annotations_data, viewport=None, session=None, rendered=None
+    ):
+        """Update the visual representation of text with annotations.
 
-            last_pos = pos
+        Returns the segments and the version of the rendering. When the
+        browser still shows the version last rendered for its session, only
+        the segments that changed are sent, as a `Patch`. Renderings are
+        shared between sessions through `render_cache`.
+        """
+        annotator_id = _output_annotator_id()
+        rendering = _rendering_for(
+            annotator_id, text, annotations_data, viewport, session
+        )
+        if rendering is None:
+            return "", None
+        if session is None or annotator_id is None:
+            return rendering.spans(), None
+        signatures = rendering.signatures
+        with _rendered.lock:
+            cached = _rendered.get(annotator_id, session)
+            if cached is not None and cached[0] == rendered:
+                if cached[1] == signatures:
+                    return dash.no_update, dash.no_update
+                children = _diff_segments(cached[1], signatures, rendering.span)
+            else:
+                children = None
+            version = _rendered.put(annotator_id, session, signatures)
+        if children is None:
+            children = rendering.spans()
+        return children, version
 
-        if last_pos < len(text):
-            parts.append(html.Span(text[last_pos:], id=f"text-{last_pos}"))
+    @callback(
+        Output(ids.visual_text(MATCH, "background"), "children"),
+        Input(ids.text_store(MATCH), "data"),
+        Input(ids.annotations_store(MATCH), "data"),
+        Input(ids.viewport_store(MATCH), "data"),
+        background=True,
+    )
+    def update_visual_text_background(text, annotations_data, viewport=None):
+        """`update_visual_text` for the background renderer.
 
-        return parts
+        The job runs in a worker process of the background callback
+        manager, whose render cache and sessions are not the server's, so
+        the rendering is built from the stores and sent whole.
+        """
+        rendering = _rendering_for(
+            _output_annotator_id(), text, annotations_data, viewport, cache=None
+        )
+        return "" if rendering is None else rendering.spans()
@@ -2,7 +2,13 @@
 DashAnnotator component for text annotation in Dash applications.
 """
 
-from dataclasses import dataclass
+# The annotation classes live in `dash_annotator.annotation_set`; they are
+# still importable from here.
+from dash_annotator.annotation_set import (  # noqa: F401
+    Annotation,
+    AnnotationColumns,
+    AnnotationSet,
+)
 
 ID = "id"
 
@@ -16,6 +22,22 @@ class _ids:
             ID: id,
         }
 
+    @staticmethod
+    def text_input_store(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "text-input-store",
+            ID: id,
+        }
+
+    @staticmethod
+    def text_shadow_store(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "text-shadow-store",
+            ID: id,
+        }
+
     @staticmethod
     def annotations_store(id):
         return {
@@ -24,6 +46,30 @@ class _ids:
             ID: id,
         }
 
+    @staticmethod
+    def annotations_fingerprint(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "annotations-fingerprint",
+            ID: id,
+        }
+
+    @staticmethod
+    def annotations_resync(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "annotations-resync",
+            ID: id,
+        }
+
+    @staticmethod
+    def annotations_synced(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "annotations-synced",
+            ID: id,
+        }
+
     @staticmethod
     def selection_store(id):
         return {
@@ -49,10 +95,11 @@ class _ids:
         }
 
     @staticmethod
-    def visual_text(id):
+    def visual_text(id, renderer="server"):
         return {
             "component": "TextAnnotator",
             "subcomponent": "visual-text",
+            "renderer": renderer,
             ID: id,
         }
 
@@ -82,38 +129,193 @@ class _ids:
         }
 
     @staticmethod
-    def main_container(id):
+    def viewport_store(id):
         return {
             "component": "TextAnnotator",
-            "subcomponent": "main-container",
+            "subcomponent": "viewport-store",
+            ID: id,
+        }
+
+    @staticmethod
+    def document_store(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "document-store",
+            ID: id,
+        }
+
+    @staticmethod
+    def render_store(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "render-store",
+            ID: id,
+        }
+
+    @staticmethod
+    def stylesheet(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "stylesheet",
+            ID: id,
+        }
+
+    @staticmethod
+    def selection_config(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "selection-config",
+            ID: id,
+        }
+
+    @staticmethod
+    def session_store(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "session-store",
+            ID: id,
+        }
+
+    @staticmethod
+    def annotations_page(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "annotations-page",
+            ID: id,
+        }
+
+    @staticmethod
+    def list_cursor(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "list-cursor",
+            ID: id,
+        }
+
+    @staticmethod
+    def list_prev(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "list-prev",
+            ID: id,
+        }
+
+    @staticmethod
+    def list_next(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "list-next",
+            ID: id,
+        }
+
+    @staticmethod
+    def corpus_prev(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "corpus-prev",
+            ID: id,
+        }
+
+    @staticmethod
+    def corpus_next(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "corpus-next",
+            ID: id,
+        }
+
+    @staticmethod
+    def corpus_position(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "corpus-position",
+            ID: id,
+        }
+
+    @staticmethod
+    def find_query(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "find-query",
+            ID: id,
+        }
+
+    @staticmethod
+    def find_options(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "find-options",
+            ID: id,
+        }
+
+    @staticmethod
+    def find_button(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "find-button",
+            ID: id,
+        }
+
+    @staticmethod
+    def find_status(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "find-status",
             ID: id,
         }
 
+    @staticmethod
+    def job_button(id, job):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "job-button",
+            "job": job,
+            ID: id,
+        }
 
-@dataclass
-class Annotation:
-    """
-    Data class for annotation objects.
-
-    Parameters
-    ----------
-    id : str
-        Unique identifier for the annotation.
-    start : int
-        Start index of the annotation.
-    end : int
-        End index of the annotation.
-    text : str
-        Text of the annotation.
-    note : str
-        Note for the annotation.
-    """
-
-    id: str
-    start: int
-    end: int
-    text: str
-    note: str
+    @staticmethod
+    def job_cancel(id, job):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "job-cancel",
+            "job": job,
+            ID: id,
+        }
+
+    @staticmethod
+    def job_progress(id, job):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "job-progress",
+            "job": job,
+            ID: id,
+        }
+
+    @staticmethod
+    def job_options(id, job):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "job-options",
+            "job": job,
+            ID: id,
+        }
+
+    @staticmethod
+    def job_result(id, job):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "job-result",
+            "job": job,
+            ID: id,
+        }
+
+    @staticmethod
+    def main_container(id):
+        return {
+            "component": "TextAnnotator",
+            "subcomponent": "main-container",
+            ID: id,
+        }
 
 
 class BaseAnnotation:
@@ -1,16 +1,111 @@
 """AnnotateButton component for adding annotations."""
 
-from dash import html, Input, Output, State, callback, MATCH, ALL
+from dash import (
+    html,
+    Input,
+    Output,
+    State,
+    Patch,
+    callback,
+    clientside_callback,
+    MATCH,
+    ALL,
+)
 import dash
 import uuid
 
 from dash_annotator.components.base import BaseAnnotation
+from dash_annotator.components.state import (
+    _registry,
+    _repositories,
+    _session_annotations,
+    _store_formats,
+    _text_for,
+)
 
 __all__ = [
     "AnnotateButton",
 ]
 
 
+def _new_annotation(text, selection_data):
+    """Build the annotation record for the selected text."""
+    return {
+        "id": str(uuid.uuid4()),
+        "start": selection_data["start"],
+        "end": selection_data["end"],
+        "text": text[selection_data["start"] : selection_data["end"]],
+        "note": "Sample annotation note",
+    }
+
+
+def _patch_append(patch, annotator_id, annotation):
+    """Append `annotation` to the annotations store through `patch`."""
+    if _store_formats.get(annotator_id) != "packed":
+        patch.append(annotation)
+        return
+    patch["ids"].append(annotation["id"])
+    patch["starts"].append(annotation["start"])
+    patch["lengths"].append(annotation["end"] - annotation["start"])
+    patch["texts"].append(annotation["text"])
+    # The note table is not known here; the note is stored inline.
+    patch["notes"].append(annotation["note"])
+
+
+def _patch_extend(patch, annotator_id, annotations):
+    """Append `annotations` to the annotations store through `patch`, as
+    one operation per store column."""
+    if _store_formats.get(annotator_id) != "packed":
+        patch.extend(annotations)
+        return
+    patch["ids"].extend([ann["id"] for ann in annotations])
+    patch["starts"].extend([ann["start"] for ann in annotations])
+    patch["lengths"].extend([ann["end"] - ann["start"] for ann in annotations])
+    patch["texts"].extend([ann["text"] for ann in annotations])
+    patch["notes"].extend([ann["note"] for ann in annotations])
+
+
+def _patch_delete(patch, annotator_id, index):
+    """Delete the annotation at `index` of the annotations store."""
+    if _store_formats.get(annotator_id) != "packed":
+        del patch[index]
+        return
+    for column in ("ids", "starts", "lengths", "texts", "notes"):
+        del patch[column][index]
+
+
+def _manage_document(annotator_id, action, text, document):
+    """`manage_annotations` for a repository-backed annotator."""
+    repository = _repositories[annotator_id]
+    if "add" in action:
+        version = repository.add(document, _new_annotation(text, action["add"]))
+        return {"document": document, "version": version}
+    if not repository.contains(document, action["remove"]):
+        return dash.no_update
+    version = repository.remove(document, action["remove"])
+    return {"document": document, "version": version}
+
+
+# Enable the button while the textarea has a selection, in the browser.
+clientside_callback(
+    """function(selection_data, n_blur) {
+    const triggered = window.dash_clientside.callback_context.triggered;
+    if (!triggered.length || triggered[0].prop_id === ".") {
+        return null;
+    }
+    const hasLostFocus = triggered[0].prop_id.endsWith(".n_blur");
+    return "px-4 py-2 rounded " + (
+        selection_data && !hasLostFocus
+            ? "bg-blue-500 text-white hover:bg-blue-600"
+            : "bg-gray-200 text-gray-500 cursor-not-allowed"
+    );
+}""",
+    Output(BaseAnnotation.ids.add_button(MATCH), "className"),
+    Input(BaseAnnotation.ids.selection_store(MATCH), "data"),
+    Input(BaseAnnotation.ids.textarea(MATCH), "n_blur"),
+)
+
+
 class AnnotateButton(html.Button, BaseAnnotation):
     """AnnotateButton component for adding annotations."""
 
@@ -26,53 +121,81 @@ class AnnotateButton(html.Button, BaseAnnotation):
             **kwargs,
         )
 
-    @callback(
-        Output(ids.add_button(MATCH), "className"),
-        Input(ids.selection_store(MATCH), "data"),
-        Input(ids.textarea(MATCH), "n_blur"),
-    )
-    def update_button_state(selection_data, n_blur):
-        """Update the Add Annotation button state based on text selection."""
-        if not dash.callback_context.triggered:
-            return None
-        n_blur_prop = dash.callback_context.triggered[0]["prop_id"]
-        has_lost_focus = n_blur_prop.endswith(".n_blur")
-        base_class = "px-4 py-2 rounded "
-        return base_class + (
-            "bg-blue-500 text-white hover:bg-blue-600"
-            if selection_data and not has_lost_focus
-            else "bg-gray-200 text-gray-500 cursor-not-allowed"
-        )
-
     @callback(
         Output(ids.annotations_store(MATCH), "data"),
         Input(ids.add_button(MATCH), "n_clicks"),
         Input(ids.remove_annotation(MATCH, ALL), "n_clicks"),
+        Input(ids.annotations_synced(MATCH), "data"),
         State(ids.text_store(MATCH), "data"),
         State(ids.selection_store(MATCH), "data"),
-        State(ids.annotations_store(MATCH), "data"),
+        State(ids.session_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        State(ids.annotations_fingerprint(MATCH), "data"),
         prevent_initial_call=True,
     )
     def manage_annotations(
-        add_clicks, remove_clicks, text, selection_data, annotations_data
+        add_clicks,
+        remove_clicks,
+        synced,
+        text,
+        selection_data,
+        session,
+        document=None,
+        fingerprint=None,
     ):
-        """Handle adding and removing annotations."""
+        """Handle adding and removing annotations.
+
+        The store is updated with a `Patch` (append or delete-by-index), so
+        the response does not carry the annotation list, and neither does
+        the request: list positions come from the server-side `AnnotationSet`
+        of the calling session, checked against the store's fingerprint.
+        If they differ, the action is replayed once the browser has uploaded
+        its store (see `_session_annotations`). Repository-backed annotators
+        write to the repository instead and get back a new document
+        reference.
+        """
         ctx = dash.callback_context
-        if not ctx.triggered:
+        if not ctx.triggered or (session is None and document is None):
             return dash.no_update
-        trigger = ctx.triggered[0]["prop_id"]
-        if not annotations_data:
-            annotations_data = []
-        if "add-button" in trigger and selection_data:
-            new_annotation = {
-                "id": str(uuid.uuid4()),
-                "start": selection_data["start"],
-                "end": selection_data["end"],
-                "text": text[selection_data["start"] : selection_data["end"]],
-                "note": "Sample annotation note",
+        annotator_id = ctx.triggered_id["id"]
+        trigger = ctx.triggered_id["subcomponent"]
+        if trigger == "annotations-synced":
+            if synced["callback"] != "manage_annotations":
+                return dash.no_update
+            action = synced
+        elif trigger == "add-button":
+            if not selection_data:
+                return dash.no_update
+            action = {"callback": "manage_annotations", "add": selection_data}
+        elif ctx.triggered[0]["value"]:
+            action = {
+                "callback": "manage_annotations",
+                "remove": ctx.triggered_id["ann_id"],
             }
-            return annotations_data + [new_annotation]
-        if "remove-annotation" in trigger:
-            annotation_id = ctx.triggered_id["ann_id"]
-            return [ann for ann in annotations_data if ann["id"] != annotation_id]
-        return dash.no_update
+        else:
+            return dash.no_update
+        text = _text_for(annotator_id, text)
+        if document is not None:
+            return _manage_document(annotator_id, action, text, document)
+        patch = Patch()
+        with _registry.lock:
+            annotations = _session_annotations(
+                annotator_id,
+                session,
+                fingerprint,
+                action,
+                resynced=trigger == "annotations-synced",
+            )
+            if annotations is None:
+                return dash.no_update
+            if "add" in action:
+                new_annotation = _new_annotation(text, action["add"])
+                annotations.insert(new_annotation)
+                _patch_append(patch, annotator_id, new_annotation)
+                return patch
+            index = annotations.index(action["remove"])
+            if index is None:
+                return dash.no_update
+            annotations.remove(action["remove"])
+        _patch_delete(patch, annotator_id, index)
+        return patch
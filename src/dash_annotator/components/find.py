@@ -0,0 +1,171 @@
+"""FindAndAnnotate component for annotating every occurrence of a string."""
+
+import re
+
+from dash import dcc, html, callback, Output, Input, State, Patch, MATCH
+import dash
+
+from dash_annotator.components.base import BaseAnnotation
+from dash_annotator.components.state import (
+    _registry,
+    _repositories,
+    _session_annotations,
+    _text_for,
+)
+from dash_annotator.components.button import _new_annotation, _patch_extend
+from dash_annotator.search import _unannotated, find_all
+
+__all__ = [
+    "FindAndAnnotate",
+]
+
+FIND_OPTIONS = [
+    {"label": "Regex", "value": "regex"},
+    {"label": "Ignore case", "value": "ignore_case"},
+    {"label": "Whole words", "value": "whole_words"},
+]
+
+ids = BaseAnnotation.ids
+
+
+class FindAndAnnotate(html.Div, BaseAnnotation):
+    """
+    Search box annotating every occurrence of a string or regular
+    expression in a `TextAnnotator` at once.
+
+    All matches are added in one callback, as one batched update of the
+    annotations store (or one repository write). Matches with the same span
+    as an existing annotation are skipped, so searching again only adds
+    new occurrences.
+
+    Parameters
+    ----------
+    for_ : str
+        Id of the `TextAnnotator` to annotate.
+    options : list of str, optional
+        Search options checked initially: ``"regex"``, ``"ignore_case"``
+        and ``"whole_words"`` (see `dash_annotator.search.find_all`).
+    """
+
+    ids = BaseAnnotation.ids
+
+    def __init__(self, for_: str, options=None, *args, **kwargs):
+        """Initialize the component."""
+        if "className" not in kwargs:
+            kwargs["className"] = ""
+        kwargs["className"] += "flex items-center gap-2"
+        super().__init__(
+            [
+                dcc.Input(
+                    id=self.ids.find_query(for_),
+                    type="text",
+                    placeholder="Find...",
+                    debounce=True,
+                ),
+                dcc.Checklist(
+                    id=self.ids.find_options(for_),
+                    options=FIND_OPTIONS,
+                    value=list(options or []),
+                    inline=True,
+                ),
+                html.Button("Annotate all", id=self.ids.find_button(for_)),
+                html.Span(
+                    id=self.ids.find_status(for_),
+                    className="text-sm text-gray-600",
+                ),
+            ],
+            *args,
+            **kwargs,
+        )
+
+    @callback(
+        Output(ids.annotations_store(MATCH), "data", allow_duplicate=True),
+        Output(ids.find_status(MATCH), "children"),
+        Input(ids.find_button(MATCH), "n_clicks"),
+        Input(ids.find_query(MATCH), "n_submit"),
+        Input(ids.annotations_synced(MATCH), "data"),
+        State(ids.find_query(MATCH), "value"),
+        State(ids.find_options(MATCH), "value"),
+        State(ids.text_store(MATCH), "data"),
+        State(ids.session_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        State(ids.annotations_fingerprint(MATCH), "data"),
+        prevent_initial_call=True,
+    )
+    def annotate_all(
+        n_clicks,
+        n_submit,
+        synced,
+        query,
+        options,
+        text,
+        session,
+        document=None,
+        fingerprint=None,
+    ):
+        """Annotate every match of the query that is not annotated yet.
+
+        The store is updated with a single `Patch` appending every new
+        annotation; repository-backed annotators add them in one write and
+        get back a new document reference. Existing spans are read from the
+        session's server-side annotations, checked against the store's
+        fingerprint (see `_session_annotations`).
+        """
+        ctx = dash.callback_context
+        resynced = ctx.triggered_id["subcomponent"] == "annotations-synced"
+        if resynced:
+            if synced["callback"] != "annotate_all":
+                return dash.no_update, dash.no_update
+            query, options = synced["query"], synced["options"]
+        if not query or (session is None and document is None):
+            return dash.no_update, dash.no_update
+        annotator_id = ctx.triggered_id["id"]
+        text = _text_for(annotator_id, text)
+        flags = set(options or ())
+        try:
+            spans = find_all(
+                text,
+                query,
+                regex="regex" in flags,
+                ignore_case="ignore_case" in flags,
+                whole_words="whole_words" in flags,
+            )
+        except re.error as error:
+            return dash.no_update, f"Invalid pattern: {error}"
+        if document is not None:
+            repository = _repositories[annotator_id]
+            spans = _unannotated(repository.annotations(document), spans)
+            if not spans:
+                return dash.no_update, _status(0)
+            version = repository.add_many(
+                document,
+                [_new_annotation(text, {"start": s, "end": e}) for s, e in spans],
+            )
+            return {"document": document, "version": version}, _status(len(spans))
+        with _registry.lock:
+            annotations = _session_annotations(
+                annotator_id,
+                session,
+                fingerprint,
+                {"callback": "annotate_all", "query": query, "options": options},
+                resynced,
+            )
+            if annotations is None:
+                return dash.no_update, dash.no_update
+            added = [
+                _new_annotation(text, {"start": start, "end": end})
+                for start, end in _unannotated(annotations, spans)
+            ]
+            for annotation in added:
+                annotations.insert(annotation)
+        if not added:
+            return dash.no_update, _status(0)
+        patch = Patch()
+        _patch_extend(patch, annotator_id, added)
+        return patch, _status(len(added))
+
+
+def _status(count):
+    if not count:
+        return "No new matches"
+    return f"{count} annotation{'s' if count > 1 else ''} added"
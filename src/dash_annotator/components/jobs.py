@@ -0,0 +1,485 @@
+"""Components running slow annotator jobs as Dash background callbacks.
+
+Pre-annotating a document and exporting a corpus can take seconds. Run as
+background callbacks, they execute in worker processes of the app's
+background callback manager instead of holding the request workers that
+serve typing and selection, report their progress, and can be cancelled::
+
+    app = Dash(__name__, background_callback_manager=background_manager())
+    app.layout = html.Div([
+        TextAnnotator(id="doc", value=text),
+        PreAnnotateButton("doc", PreAnnotator(terms)),
+        ExportButton("doc", "bio"),
+    ])
+
+Jobs read the repositories and pre-annotators registered by the components
+(``_repositories`` and ``_pre_annotators``) from the worker's own memory.
+`dash.DiskcacheManager` starts a process per job, forked on Linux, which
+sees them as they are when the job starts. Where workers are spawned
+(macOS, Windows) or long-lived (Celery), they only hold what importing the
+app registers: build the layout at import time, and keep documents edited
+while the app runs in a `SQLiteAnnotationRepository` or `AnnotationCorpus`,
+whose files every worker reads, rather than an
+`InMemoryAnnotationRepository`. A job whose annotator is not registered in
+its worker fails with a `LookupError`.
+
+Exports are written by the worker to a temporary directory and streamed to
+the browser from a route of the app's server, which must share that
+directory: run the workers on the same host as the app.
+"""
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+
+from dash import (
+    dcc,
+    html,
+    callback,
+    clientside_callback,
+    Output,
+    Input,
+    State,
+    Patch,
+    MATCH,
+)
+import dash
+import flask
+from werkzeug.security import safe_join
+
+from dash_annotator.annotation_set import _records, _store_records
+from dash_annotator.cache import _digest
+from dash_annotator.components.base import BaseAnnotation
+from dash_annotator.components.state import (
+    _pre_annotators,
+    _registry,
+    _repositories,
+    _session_annotations,
+    _text_for,
+)
+from dash_annotator.components.button import _patch_extend
+from dash_annotator.corpus import AnnotationCorpus
+from dash_annotator.formats import _document_path, write_bio, write_brat, write_jsonl
+
+__all__ = [
+    "background_manager",
+    "PreAnnotateButton",
+    "ExportButton",
+]
+
+EXPORT_FORMATS = ("jsonl", "bio", "brat")
+
+_EXTENSIONS = {"jsonl": "jsonl", "bio": "bio", "brat": "zip"}
+
+# Directory of finished exports, one subdirectory per export, named by a
+# random token. Exports are deleted once downloaded, or after
+# `_EXPORT_TTL` seconds if they never are.
+_EXPORT_DIR = os.path.join(tempfile.gettempdir(), "dash-annotator-exports")
+_EXPORT_TTL = 3600
+_EXPORT_ROUTE = "_dash-annotator-export"
+
+ids = BaseAnnotation.ids
+
+
+def background_manager(directory=None):
+    """Return a `dash.DiskcacheManager` for the background callbacks of the
+    annotator, caching job results in `directory` (a temporary directory by
+    default).
+
+    Pass it as the `background_callback_manager` of the app. Requires the
+    ``diskcache`` and ``multiprocess`` packages (``pip install
+    "dash[diskcache]"``).
+    """
+    try:
+        import diskcache
+    except ImportError as error:
+        raise ImportError(
+            'background callbacks require diskcache: pip install "dash[diskcache]"'
+        ) from error
+    return dash.DiskcacheManager(diskcache.Cache(directory))
+
+
+def _registered(registry, annotator_id):
+    """Return the entry of `annotator_id` in a component registry as the
+    job's worker sees it (see the module docstring)."""
+    try:
+        return registry[annotator_id]
+    except KeyError:
+        raise LookupError(
+            f"annotator {annotator_id!r} is not registered in this worker: "
+            "create its components when the app module is imported"
+        ) from None
+
+
+def _job_controls(for_, job, label):
+    """Return the start button, cancel button and progress bar of a job."""
+    return [
+        html.Button(label, id=ids.job_button(for_, job)),
+        html.Button("Cancel", id=ids.job_cancel(for_, job), disabled=True),
+        html.Progress(id=ids.job_progress(for_, job), value=0, max=1),
+    ]
+
+
+def _running(job):
+    """Return the `running` outputs of a job: the start button is disabled
+    and the cancel button enabled while it runs."""
+    return [
+        (Output(ids.job_button(MATCH, job), "disabled"), True, False),
+        (Output(ids.job_cancel(MATCH, job), "disabled"), False, True),
+    ]
+
+
+def _reporter(annotator_id, job):
+    """Return a ``progress(done, total)`` callback updating the progress bar
+    of a job from its background callback."""
+    progress_id = ids.job_progress(annotator_id, job)
+
+    def report(done, total):
+        dash.set_props(progress_id, {"value": done, "max": total or 1})
+
+    report(0, 1)
+    return report
+
+
+def _cancelled():
+    """Return whether the running job was triggered by its cancel button.
+
+    Background callbacks do not accept pattern-matching `cancel` inputs, so
+    the cancel button is an input of the job itself: Dash terminates the
+    running job when the callback is triggered again, and the new job stops
+    at once.
+    """
+    return dash.callback_context.triggered_id["subcomponent"] == "job-cancel"
+
+
+class PreAnnotateButton(html.Div, BaseAnnotation):
+    """
+    Button adding the suggestions of a `PreAnnotator` to a `TextAnnotator`,
+    computed in a background callback.
+
+    Suggestions whose id is already annotated are skipped, so the button
+    can be pressed again after editing. Suggestions for a text that was
+    edited while the job ran are dropped.
+
+    Parameters
+    ----------
+    for_ : str
+        Id of the `TextAnnotator` to pre-annotate.
+    annotator : PreAnnotator
+        Source of the suggestions.
+    label : str
+        Text of the button.
+    """
+
+    ids = BaseAnnotation.ids
+
+    def __init__(
+        self, for_: str, annotator, label: str = "Pre-annotate", *args, **kwargs
+    ):
+        """Initialize the component."""
+        if "className" not in kwargs:
+            kwargs["className"] = ""
+        kwargs["className"] += "flex items-center gap-2"
+        _pre_annotators[for_] = annotator
+        super().__init__(
+            [
+                *_job_controls(for_, "pre-annotate", label),
+                dcc.Store(id=self.ids.job_result(for_, "pre-annotate"), data=None),
+            ],
+            *args,
+            **kwargs,
+        )
+
+    @callback(
+        Output(ids.job_result(MATCH, "pre-annotate"), "data"),
+        Input(ids.job_button(MATCH, "pre-annotate"), "n_clicks"),
+        Input(ids.job_cancel(MATCH, "pre-annotate"), "n_clicks"),
+        State(ids.job_button(MATCH, "pre-annotate"), "id"),
+        State(ids.text_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        background=True,
+        running=_running("pre-annotate"),
+        prevent_initial_call=True,
+    )
+    def pre_annotate(n_clicks, cancel_clicks, button_id, text, document=None):
+        """Compute the suggestions for the text, reporting the characters
+        scanned as progress."""
+        if _cancelled():
+            return dash.no_update
+        annotator_id = button_id["id"]
+        if isinstance(text, dict):
+            text = _registered(_repositories, annotator_id).text(text["document"])
+        annotations = _registered(_pre_annotators, annotator_id).annotate(
+            text, progress=_reporter(annotator_id, "pre-annotate")
+        )
+        return {
+            "document": document,
+            "digest": _digest(text).hex(),
+            "annotations": _records(annotations),
+        }
+
+    @callback(
+        Output(ids.annotations_store(MATCH), "data", allow_duplicate=True),
+        Input(ids.job_result(MATCH, "pre-annotate"), "data"),
+        Input(ids.annotations_synced(MATCH), "data"),
+        State(ids.text_store(MATCH), "data"),
+        State(ids.session_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        State(ids.annotations_fingerprint(MATCH), "data"),
+        prevent_initial_call=True,
+    )
+    def apply_pre_annotations(
+        result, synced, text, session, document=None, fingerprint=None
+    ):
+        """Add the suggestions of a finished job to the annotations store,
+        with a `Patch`, or to the repository. Existing annotations are read
+        from the session's copy, checked against the store's fingerprint
+        (see `_session_annotations`)."""
+        resynced = dash.callback_context.triggered_id["subcomponent"] == (
+            "annotations-synced"
+        )
+        if resynced and synced["callback"] != "apply_pre_annotations":
+            return dash.no_update
+        if not result or (session is None and document is None):
+            return dash.no_update
+        annotator_id = dash.callback_context.triggered_id["id"]
+        text = _text_for(annotator_id, text)
+        if result["document"] != document or result["digest"] != _digest(text).hex():
+            return dash.no_update
+        if document is not None:
+            repository = _repositories[annotator_id]
+            added = [
+                ann
+                for ann in result["annotations"]
+                if not repository.contains(document, ann["id"])
+            ]
+            if not added:
+                return dash.no_update
+            version = repository.add_many(document, added)
+            return {"document": document, "version": version}
+        with _registry.lock:
+            annotations = _session_annotations(
+                annotator_id,
+                session,
+                fingerprint,
+                {"callback": "apply_pre_annotations"},
+                resynced,
+            )
+            if annotations is None:
+                return dash.no_update
+            added = [
+                ann
+                for ann in result["annotations"]
+                if annotations.index(ann["id"]) is None
+            ]
+            for annotation in added:
+                annotations.insert(annotation)
+        if not added:
+            return dash.no_update
+        patch = Patch()
+        _patch_extend(patch, annotator_id, added)
+        return patch
+
+
+def _documents(annotator_id, text, annotations_data, document):
+    """Return the documents an export covers, and how many there are: the
+    whole corpus of a corpus-backed annotator, or its current document."""
+    if document is None:
+        return [(annotator_id, text, _store_records(annotations_data) or [])], 1
+    repository = _registered(_repositories, annotator_id)
+    if isinstance(repository, AnnotationCorpus):
+        document_ids = [repository.document_id(i) for i in range(len(repository))]
+    else:
+        document_ids = [document]
+
+    def read(document_id):
+        text, _, annotations = repository.snapshot(document_id)
+        return document_id, text, annotations
+
+    documents = map(read, document_ids)
+    return documents, len(document_ids)
+
+
+def _sweep_exports(now=None):
+    """Delete the exports older than `_EXPORT_TTL`."""
+    now = time.time() if now is None else now
+    try:
+        entries = list(os.scandir(_EXPORT_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            expired = now - entry.stat().st_mtime > _EXPORT_TTL
+        except FileNotFoundError:
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _export(annotator_id, format, documents, report=None):
+    """Write `documents` in `format` to a new export and return its job
+    result: the token and file name it is served under."""
+    _sweep_exports()
+    token = uuid.uuid4().hex
+    directory = os.path.join(_EXPORT_DIR, token)
+    os.makedirs(directory)
+    filename = f"{annotator_id}.{_EXTENSIONS[format]}"
+    path = os.path.join(directory, filename)
+
+    def reported(documents):
+        for done, document in enumerate(documents, 1):
+            yield document
+            if report is not None:
+                report(done)
+
+    try:
+        if format == "brat":
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                for document_id, text, annotations in reported(documents):
+                    member = _document_path(document_id)
+                    ann = io.StringIO()
+                    write_brat(annotations, ann, text)
+                    archive.writestr(f"{member}.txt", text)
+                    archive.writestr(f"{member}.ann", ann.getvalue())
+        else:
+            write = write_jsonl if format == "jsonl" else write_bio
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                write(reported(documents), file)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return {"token": token, "filename": filename}
+
+
+@dash.hooks.route(f"{_EXPORT_ROUTE}/<token>/<filename>")
+def _serve_export(token, filename):
+    """Stream a finished export as an attachment. The export is deleted
+    as it is opened, so it can be downloaded once."""
+    if not re.fullmatch("[0-9a-f]{32}", token):
+        flask.abort(404)
+    directory = os.path.join(_EXPORT_DIR, token)
+    path = safe_join(directory, filename)
+    if path is None:
+        flask.abort(404)
+    try:
+        file = open(path, "rb")
+    except (FileNotFoundError, IsADirectoryError):
+        flask.abort(404)
+    # The open file stays readable once deleted on POSIX systems. Where it
+    # cannot be deleted while open, the sweep deletes it later.
+    shutil.rmtree(directory, ignore_errors=True)
+    return flask.send_file(file, as_attachment=True, download_name=filename)
+
+
+class ExportButton(html.Div, BaseAnnotation):
+    """
+    Button downloading the annotations of a `TextAnnotator`, exported in a
+    background callback.
+
+    A `TextAnnotator` backed by an `AnnotationCorpus` exports every
+    document of the corpus, with edits, reporting progress per document;
+    any other annotator exports its current document. One export button can
+    be placed per annotator.
+
+    Parameters
+    ----------
+    for_ : str
+        Id of the `TextAnnotator` to export.
+    format : {"jsonl", "bio", "brat"}
+        JSON Lines, CoNLL BIO, or a zip of BRAT ``.txt`` and ``.ann`` files
+        (see `dash_annotator.formats`).
+    label : str
+        Text of the button.
+    """
+
+    ids = BaseAnnotation.ids
+
+    def __init__(
+        self, for_: str, format: str = "jsonl", label: str = "Export", *args, **kwargs
+    ):
+        """Initialize the component."""
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {EXPORT_FORMATS}, got {format!r}")
+        if "className" not in kwargs:
+            kwargs["className"] = ""
+        kwargs["className"] += "flex items-center gap-2"
+        super().__init__(
+            [
+                *_job_controls(for_, "export", label),
+                dcc.Store(
+                    id=self.ids.job_options(for_, "export"), data={"format": format}
+                ),
+                dcc.Store(id=self.ids.job_result(for_, "export"), data=None),
+            ],
+            *args,
+            **kwargs,
+        )
+
+    @callback(
+        Output(ids.job_result(MATCH, "export"), "data"),
+        Input(ids.job_button(MATCH, "export"), "n_clicks"),
+        Input(ids.job_cancel(MATCH, "export"), "n_clicks"),
+        State(ids.job_button(MATCH, "export"), "id"),
+        State(ids.job_options(MATCH, "export"), "data"),
+        State(ids.text_store(MATCH), "data"),
+        State(ids.annotations_store(MATCH), "data"),
+        State(ids.document_store(MATCH), "data"),
+        background=True,
+        running=_running("export"),
+        prevent_initial_call=True,
+    )
+    def export_annotations(
+        n_clicks,
+        cancel_clicks,
+        button_id,
+        options,
+        text,
+        annotations_data,
+        document=None,
+    ):
+        """Write the documents in the format of the job options, reporting
+        the documents written as progress.
+
+        The export is written to a file that the browser then downloads
+        from the app's server, so it is never held in memory nor passed
+        through the job result.
+        """
+        if _cancelled():
+            return dash.no_update
+        annotator_id = button_id["id"]
+        documents, total = _documents(annotator_id, text, annotations_data, document)
+        report = _reporter(annotator_id, "export")
+        return _export(
+            annotator_id,
+            options["format"],
+            documents,
+            lambda done: report(done, total),
+        )
+
+
+# Download a finished export: follow a link to the route serving it, under
+# the app's request prefix.
+clientside_callback(
+    f"""function(result) {{
+    if (result) {{
+        const config = JSON.parse(
+            document.getElementById("_dash-config").textContent
+        );
+        const link = document.createElement("a");
+        link.href = config.requests_pathname_prefix + "{_EXPORT_ROUTE}/"
+            + result.token + "/" + encodeURIComponent(result.filename);
+        link.download = result.filename;
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+    }}
+    return window.dash_clientside.no_update;
+}}""",
+    Output(ids.job_result(MATCH, "export"), "clear_data"),
+    Input(ids.job_result(MATCH, "export"), "data"),
+)
@@ -0,0 +1,112 @@
+"""CorpusNavigator component for moving through the documents of a corpus."""
+
+from dash import html, callback, Output, Input, State, MATCH
+import dash
+from dash_annotator.components.base import BaseAnnotation
+from dash_annotator.components.state import _repositories
+from dash_annotator.corpus import AnnotationCorpus
+
+__all__ = [
+    "CorpusNavigator",
+]
+
+ids = BaseAnnotation.ids
+
+
+class CorpusNavigator(html.Div, BaseAnnotation):
+    """Previous and Next buttons moving a `TextAnnotator` backed by an
+    `AnnotationCorpus` through the corpus, with the current position.
+
+    Parameters
+    ----------
+    for_ : str
+        Id of the `TextAnnotator` whose corpus is navigated. The annotator
+        must be created first, with an `AnnotationCorpus` as its repository.
+
+    Raises
+    ------
+    ValueError
+        If `for_` is not an annotator backed by an `AnnotationCorpus`.
+    """
+
+    ids = BaseAnnotation.ids
+
+    def __init__(self, for_: str, *args, **kwargs):
+        """Initialize the component."""
+        if not isinstance(_repositories.get(for_), AnnotationCorpus):
+            raise ValueError(
+                f"CorpusNavigator needs a TextAnnotator backed by an"
+                f" AnnotationCorpus, created before it; {for_!r} is not one"
+            )
+        if "className" not in kwargs:
+            kwargs["className"] = ""
+        kwargs["className"] += "flex items-center gap-2"
+        self.for_id = for_
+        super().__init__(
+            [
+                html.Button("Previous", id=self.ids.corpus_prev(for_)),
+                html.Span(
+                    id=self.ids.corpus_position(for_),
+                    className="text-sm text-gray-600",
+                ),
+                html.Button("Next", id=self.ids.corpus_next(for_)),
+            ],
+            *args,
+            **kwargs,
+        )
+
+    @callback(
+        Output(ids.corpus_position(MATCH), "children"),
+        Input(ids.document_store(MATCH), "data"),
+    )
+    def update_corpus_position(document):
+        """Show the position of the current document, and prefetch the
+        documents after it."""
+        annotator_id = dash.callback_context.outputs_list["id"]["id"]
+        corpus = _repositories[annotator_id]
+        corpus.prefetch(document)
+        try:
+            return f"{corpus.position(document) + 1} of {len(corpus)}"
+        except KeyError:
+            # A document created outside the source is not in the queue.
+            return document
+
+    @callback(
+        Output(ids.document_store(MATCH), "data"),
+        Output(ids.text_store(MATCH), "data", allow_duplicate=True),
+        Output(ids.annotations_store(MATCH), "data", allow_duplicate=True),
+        Output(ids.text_shadow_store(MATCH), "data", allow_duplicate=True),
+        Output(ids.selection_store(MATCH), "data", allow_duplicate=True),
+        Output(ids.textarea(MATCH), "value"),
+        Input(ids.corpus_prev(MATCH), "n_clicks"),
+        Input(ids.corpus_next(MATCH), "n_clicks"),
+        State(ids.document_store(MATCH), "data"),
+        State(ids.text_shadow_store(MATCH), "data"),
+        prevent_initial_call=True,
+    )
+    def move_document(prev_clicks, next_clicks, document, shadow):
+        """Switch the annotator to the previous or next document.
+
+        The stores get references to the new document and the textarea its
+        text; the text shadow is reset to it too, so loading the text is not
+        mistaken for an edit.
+        """
+        ctx = dash.callback_context
+        if not ctx.triggered or not ctx.triggered[0]["value"]:
+            return (dash.no_update,) * 6
+        corpus = _repositories[ctx.triggered_id["id"]]
+        step = -1 if ctx.triggered_id["subcomponent"] == "corpus-prev" else 1
+        try:
+            target = corpus.next_document(document, step)
+        except KeyError:
+            return (dash.no_update,) * 6
+        if target == document:
+            return (dash.no_update,) * 6
+        text = corpus.text(target)
+        ref = corpus.ref(target)
+        if "seq" in shadow:
+            # Delta sync: keep numbering the deltas of this page load.
+            shadow = {"text": text, "seq": shadow["seq"], "length": len(text)}
+        else:
+            shadow = {"text": text}
+        return target, ref, dict(ref), shadow, None, text
@@ -0,0 +1,235 @@
+"""
+Server-side state of the annotator components.
+
+Components register their repositories, store formats, themes and
+pre-annotators here by annotator id when they are created, and callbacks
+look them up by the id of the component that triggered them. Per-session
+state (annotation sets, rendered segments, text delta order) is kept in
+bounded LRU registries.
+"""
+
+from collections import OrderedDict
+import itertools
+import threading
+import uuid
+
+import dash
+
+from dash_annotator.annotation_set import AnnotationColumns, AnnotationSet
+from dash_annotator.cache import _LRUCache
+from dash_annotator.components.base import BaseAnnotation
+
+
+class _AnnotationRegistry:
+    """
+    Server-side `AnnotationSet` per (annotator id, browser session).
+
+    Each page load keeps its own copy of the annotations store, so sets are
+    keyed by the session token written to the session store. New sessions
+    start from the annotations the annotator was created with. The least
+    recently used sessions are dropped past `maxsize`.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._seeds = {}
+        self._sets = OrderedDict()
+        self.lock = threading.RLock()
+
+    def seed(self, annotator_id, annotations):
+        """Record the initial annotations of an annotator."""
+        if not isinstance(annotations, AnnotationColumns):
+            annotations = AnnotationColumns(annotations)
+        with self.lock:
+            self._seeds[annotator_id] = annotations
+
+    def get(self, annotator_id, session):
+        """Return the annotations of `annotator_id` for `session`."""
+        key = (annotator_id, session)
+        with self.lock:
+            annotations = self._sets.get(key)
+            if annotations is None:
+                seed = self._seeds.get(annotator_id)
+                annotations = AnnotationSet(seed.records() if seed else ())
+                self.put(annotator_id, session, annotations)
+            else:
+                self._sets.move_to_end(key)
+            return annotations
+
+    def sync(self, annotator_id, session, annotations_data):
+        """Return the session's annotations, rebuilt if `annotations_data`
+        (the store contents) lists different annotations."""
+        with self.lock:
+            annotations = self.get(annotator_id, session)
+            # Spans are compared too: the browser rebases them on text edits.
+            if [_span(ann) for ann in annotations] != list(
+                map(_span, annotations_data)
+            ):
+                annotations = AnnotationSet(annotations_data)
+                self.put(annotator_id, session, annotations)
+            return annotations
+
+    def put(self, annotator_id, session, annotations):
+        """Replace the annotations of `annotator_id` for `session`."""
+        with self.lock:
+            self._sets[(annotator_id, session)] = annotations
+            self._sets.move_to_end((annotator_id, session))
+            while len(self._sets) > self.maxsize:
+                self._sets.popitem(last=False)
+
+
+def _span(annotation):
+    return annotation["id"], annotation["start"], annotation["end"]
+
+
+_registry = _AnnotationRegistry()
+
+
+class _RenderedSegments:
+    """
+    Signatures of the segments last rendered by the server renderer, per
+    (annotator id, browser session).
+
+    Each rendering gets a version that is unique within the process and
+    travels with it to the browser, so a render is only diffed against the
+    cached one when the browser is known to show it.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._renders = OrderedDict()
+        self._versions = itertools.count(1)
+        self.lock = threading.RLock()
+
+    def get(self, annotator_id, session):
+        """Return ``(version, signatures)`` last rendered, or None."""
+        key = (annotator_id, session)
+        with self.lock:
+            cached = self._renders.get(key)
+            if cached is not None:
+                self._renders.move_to_end(key)
+            return cached
+
+    def put(self, annotator_id, session, signatures):
+        """Record a rendering and return its version."""
+        key = (annotator_id, session)
+        with self.lock:
+            version = next(self._versions)
+            self._renders[key] = (version, signatures)
+            self._renders.move_to_end(key)
+            while len(self._renders) > self.maxsize:
+                self._renders.popitem(last=False)
+            return version
+
+
+_rendered = _RenderedSegments()
+
+
+# Server renderings, keyed by a digest of the text and of the annotations (or
+# by the repository document version) they show, so sessions viewing the same
+# document share one segmentation.
+_render_cache = _LRUCache()
+
+
+class _TextSync:
+    """
+    Orders text deltas per (annotator id, browser session).
+
+    Deltas carry a sequence number starting at 1 for every page load. They
+    can reach the server out of order, so early arrivals are held until the
+    gap before them is filled. A full-text delta (``delete`` is None)
+    replaces the text whatever came before it, so it is ready at once and
+    closes any gap: this is how a client answers a resync request.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+        self.lock = threading.RLock()
+
+    def push(self, annotator_id, session, delta):
+        """Queue `delta` and return the deltas now ready to apply, in order,
+        and whether later deltas are still held for a gap before them.
+
+        Raises
+        ------
+        ValueError
+            If `session` is None: deltas of different browser tabs could
+            not be told apart.
+        """
+        if session is None:
+            raise ValueError("text deltas can only be ordered per session")
+        key = (annotator_id, session)
+        with self.lock:
+            state = self._sessions.get(key)
+            if state is None:
+                state = self._sessions[key] = {"seq": 0, "pending": {}}
+                while len(self._sessions) > self.maxsize:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(key)
+            seq = delta["seq"]
+            if seq > state["seq"]:
+                if delta["delete"] is None:
+                    state["seq"] = seq - 1
+                    state["pending"] = {
+                        later: pending
+                        for later, pending in state["pending"].items()
+                        if later > seq
+                    }
+                state["pending"][seq] = delta
+            ready = []
+            while state["seq"] + 1 in state["pending"]:
+                state["seq"] += 1
+                ready.append(state["pending"].pop(state["seq"]))
+            return ready, bool(state["pending"])
+
+
+_text_sync = _TextSync()
+
+
+# `AnnotationRepository` backing each repository-mode annotator, by id.
+_repositories = {}
+
+
+# Annotations store format ("records" or "packed") of each inline annotator.
+_store_formats = {}
+
+
+# `_Theme` of each annotator in class styling mode, by id.
+_themes = {}
+
+
+# `PreAnnotator` of each annotator with a `PreAnnotateButton`, by id.
+_pre_annotators = {}
+
+
+def _session_annotations(annotator_id, session, fingerprint, action, resynced=False):
+    """Return the session's copy of an inline annotator's annotations if it
+    matches `fingerprint`, the fingerprint of the annotations store as the
+    browser holds it (see `AnnotationSet.fingerprint`), else None.
+
+    The copy may have been evicted, re-seeded by another worker or left
+    behind by a clientside edit, and store list indices are only valid
+    against the browser's list. On a mismatch the browser is asked to upload
+    its store once: `TextAnnotator.sync_annotations` rebuilds the copy from
+    it and writes `action` to the annotations-synced store, which triggers
+    the calling callback again. That call passes `resynced` and is not
+    checked.
+    """
+    with _registry.lock:
+        annotations = _registry.get(annotator_id, session)
+        if resynced or annotations.fingerprint() == fingerprint:
+            return annotations
+    dash.set_props(
+        BaseAnnotation.ids.annotations_resync(annotator_id),
+        {"data": dict(action, request=uuid.uuid4().hex)},
+    )
+    return None
+
+
+def _text_for(annotator_id, text_data):
+    """Return the text held by a text store, resolving repository refs."""
+    if isinstance(text_data, dict):
+        return _repositories[annotator_id].text(text_data["document"])
+    return text_data
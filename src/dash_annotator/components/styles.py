@@ -0,0 +1,176 @@
+"""Styles of the TextAnnotator layout and its highlighted segments.
+
+The same style dicts are used inline (``styling="inline"``) and compiled into
+a stylesheet of CSS classes (``styling="classes"``), so both modes look alike.
+"""
+
+import hashlib
+import json
+import re
+
+DEFAULT_FONT = "-apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen-Sans, Ubuntu, Cantarell, 'Helvetica Neue', sans-serif"
+
+CONTAINER_STYLE = {
+    "position": "relative",
+    "borderRadius": "0.5rem",
+    "borderWidth": "1px",
+    "boxShadow": "0 1px 2px 0 rgba(0, 0, 0, 0.05)",
+    "minHeight": "3rem",
+}
+
+SCROLLER_STYLE = {
+    "position": "absolute",
+    "top": "0",
+    "left": "0",
+    "right": "0",
+    "bottom": "0",
+    "padding": "0.5rem",
+    "fontFamily": DEFAULT_FONT,
+    "fontSize": "1rem",
+    "lineHeight": "1rem",
+    "whiteSpace": "pre-wrap",
+    "overflowWrap": "break-word",
+    "wordWrap": "break-word",
+    "overflowY": "auto",
+    "zIndex": "1",
+    "boxSizing": "border-box",
+}
+
+TEXTAREA_STYLE = {
+    "position": "absolute",
+    "top": "0",
+    "left": "0",
+    "width": "100%",
+    "height": "100%",
+    "padding": "0.5rem",
+    "fontFamily": DEFAULT_FONT,
+    "fontSize": "1rem",
+    "lineHeight": "1rem",
+    "border": "none",
+    "resize": "none",
+    "color": "transparent",
+    "caretColor": "black",
+    "background": "transparent",
+    "whiteSpace": "pre-wrap",
+    "overflowWrap": "break-word",
+    "overflowY": "auto",
+    "zIndex": "2",
+    "boxSizing": "border-box",
+}
+
+OVERLAY_STYLE = {
+    "position": "absolute",
+    "top": "0",
+    "left": "0",
+    "width": "100%",
+    "height": "100%",
+    "padding": "0.5rem",
+    "fontSize": "1rem",
+    "lineHeight": "1rem",
+    "whiteSpace": "pre-wrap",
+    "pointerEvents": "none",
+    "fontFamily": DEFAULT_FONT,
+}
+
+HIGHLIGHT_STYLE = {
+    "borderBottomWidth": "2px",
+    "borderColor": "blue",
+    "backgroundColor": "blue",
+}
+
+# Overlap depth at which highlights become opaque; deeper segments share the
+# last depth class.
+MAX_DEPTH = 4
+
+# Class names of the layout elements in class styling mode.
+CONTAINER_CLASS = "da-annotator"
+SCROLLER_CLASS = "da-scroller"
+TEXTAREA_CLASS = "da-textarea"
+OVERLAY_CLASS = "da-overlay"
+HIGHLIGHT_CLASS = "da-hl"
+
+
+def _opacity(depth):
+    """Opacity of a segment covered by `depth` annotations."""
+    return min(0.2 + depth * 0.2, 1)
+
+
+def _highlight_style(depth):
+    """Inline style of a segment covered by `depth` annotations."""
+    return {"opacity": _opacity(depth), **HIGHLIGHT_STYLE}
+
+
+def _rule(selector, style):
+    """Compile a style dict into a CSS rule."""
+    declarations = ";".join(
+        f"{re.sub('([A-Z])', lambda m: '-' + m.group(1).lower(), name)}:{value}"
+        for name, value in style.items()
+    )
+    return f"{selector}{{{declarations}}}"
+
+
+class _Theme:
+    """
+    Stylesheet of an annotator in class styling mode.
+
+    Layout elements and segments reference the classes of a stylesheet that
+    is generated once per distinct `label_colors` and shared by every
+    annotator using them. Segments get a depth class and, when one of their
+    annotations has a note listed in `label_colors`, the class of the first
+    such label, in `label_colors` order.
+
+    Parameters
+    ----------
+    label_colors : dict, optional
+        CSS color of the highlights of each annotation note.
+    """
+
+    def __init__(self, label_colors=None):
+        self.labels = list(label_colors or {})
+        digest = hashlib.sha1(
+            json.dumps(list((label_colors or {}).items())).encode()
+        ).hexdigest()
+        self.name = f"da-theme-{digest[:8]}"
+        self._priority = {label: index for index, label in enumerate(self.labels)}
+        rules = [
+            _rule(f".{CONTAINER_CLASS}", CONTAINER_STYLE),
+            _rule(f".{SCROLLER_CLASS}", SCROLLER_STYLE),
+            _rule(f".{TEXTAREA_CLASS}", TEXTAREA_STYLE),
+            _rule(f".{OVERLAY_CLASS}", OVERLAY_STYLE),
+            _rule(f".{HIGHLIGHT_CLASS}", HIGHLIGHT_STYLE),
+            *(
+                _rule(f".da-d{depth}", {"opacity": round(_opacity(depth), 2)})
+                for depth in range(1, MAX_DEPTH + 1)
+            ),
+            *(
+                _rule(
+                    f".{self.name} .da-l{index}",
+                    {"borderColor": color, "backgroundColor": color},
+                )
+                for index, color in enumerate((label_colors or {}).values())
+            ),
+        ]
+        self.css = "\n".join(rules)
+
+    def segment_class(self, annotations, active_annotations):
+        """Class names of a segment covered by `active_annotations`.
+
+        `annotations` is the `AnnotationSet` the ids refer to.
+        """
+        if not active_annotations:
+            return None
+        names = f"{HIGHLIGHT_CLASS} da-d{min(len(active_annotations), MAX_DEPTH)}"
+        labels = [
+            self._priority[note]
+            for note in (
+                annotations.get(ann_id)["note"] for ann_id in active_annotations
+            )
+            if note in self._priority
+        ]
+        if labels:
+            names += f" da-l{min(labels)}"
+        return names
+
+    def to_store(self):
+        """Stylesheet store contents: the theme class, its CSS and labels."""
+        return {"name": self.name, "css": self.css, "labels": self.labels}
@@ -0,0 +1,71 @@
+"""AnnotatedTextView component rendering highlighted text in the browser."""
+
+from dash.development.base_component import Component, _explicitize_args
+
+__all__ = [
+    "AnnotatedTextView",
+]
+
+
+class AnnotatedTextView(Component):
+    """
+    Text with highlighted annotations, rendered by a React component.
+
+    Instead of a tree of spans, the component receives the text and the
+    annotation offsets as flat arrays and splits the text into segments
+    itself. Segments are keyed and memoized, so an update only re-renders
+    the segments it changed.
+
+    Parameters
+    ----------
+    id : str or dict, optional
+        Component id.
+    text : str, optional
+        Text to render.
+    offsets : list of int, optional
+        Flat ``[start0, end0, start1, end1, ...]`` annotation offsets.
+    labels : list of str, optional
+        Annotation ids, one per offsets pair.
+    viewport : dict, optional
+        Viewport store contents of a virtualized annotator. Only the render
+        window is split into segments (see `_window`).
+    className : str, optional
+        CSS classes of the container.
+    style : dict, optional
+        Inline style of the container.
+    """
+
+    _children_props = []
+    _base_nodes = ["children"]
+    _namespace = "dash_annotator"
+    _type = "AnnotatedTextView"
+
+    @_explicitize_args
+    def __init__(
+        self,
+        id=Component.UNDEFINED,
+        text=Component.UNDEFINED,
+        offsets=Component.UNDEFINED,
+        labels=Component.UNDEFINED,
+        viewport=Component.UNDEFINED,
+        className=Component.UNDEFINED,
+        style=Component.UNDEFINED,
+        **kwargs,
+    ):
+        self._prop_names = [
+            "id",
+            "className",
+            "labels",
+            "offsets",
+            "style",
+            "text",
+            "viewport",
+        ]
+        self._valid_wildcard_attributes = []
+        self.available_properties = list(self._prop_names)
+        self.available_wildcard_properties = []
+        _explicit_args = kwargs.pop("_explicit_args")
+        _locals = locals()
+        _locals.update(kwargs)
+        args = {k: _locals[k] for k in _explicit_args}
+        super().__init__(**args)
@@ -0,0 +1,499 @@
+"""
+Corpora of documents loaded on demand.
+
+A `DocumentSource` lists the documents of a corpus in queue order and loads
+one at a time: `DirectorySource` reads text files, `JSONLSource` lines of a
+JSON Lines file and `SQLiteSource` rows of a table. An `AnnotationCorpus`
+serves a source as an `AnnotationRepository`, so a `TextAnnotator` can edit
+any of its documents::
+
+    corpus = AnnotationCorpus(JSONLSource("corpus.jsonl"))
+    TextAnnotator(id="doc", repository=corpus)
+    CorpusNavigator(for_="doc")
+
+Loaded documents are kept in an LRU cache, and the documents following the
+one being annotated are loaded ahead of time in a background thread, so
+moving to the next document does not wait for the source while memory stays
+bounded by the cache size, however large the corpus.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+from pathlib import Path
+import sqlite3
+import threading
+
+from dash_annotator.annotation_set import _records
+from dash_annotator.cache import CacheInfo, _ForkLocal
+from dash_annotator.document import AnnotationDocument
+from dash_annotator.repository import (
+    AnnotationRepository,
+    InMemoryAnnotationRepository,
+    _page,
+)
+
+__all__ = [
+    "DocumentSource",
+    "DirectorySource",
+    "JSONLSource",
+    "SQLiteSource",
+    "AnnotationCorpus",
+]
+
+
+def _source_records(text, annotations):
+    """Return store records for annotations read from a source, which may
+    leave out the covered text and the note."""
+    return [
+        {
+            "text": text[record["start"] : record["end"]],
+            "note": "",
+            **record,
+        }
+        for record in _records(annotations or ())
+    ]
+
+
+class DocumentSource(ABC):
+    """
+    Base class for read-only, ordered collections of documents.
+
+    Implementations list their document ids once, in queue order, and load
+    documents by id. `load` is called from a background thread when
+    documents are prefetched, and must be thread-safe.
+    """
+
+    _positions = None
+
+    @abstractmethod
+    def ids(self):
+        """Return the ids of the documents, in queue order, as a sequence."""
+
+    @abstractmethod
+    def load(self, document_id):
+        """Return the text and the annotations of `document_id`.
+
+        Annotations are dicts or `Annotation` objects; ``text`` and ``note``
+        may be left out. Raises `KeyError` for unknown documents.
+        """
+
+    def __len__(self):
+        return len(self.ids())
+
+    def __contains__(self, document_id):
+        try:
+            self.index(document_id)
+        except KeyError:
+            return False
+        return True
+
+    def document_id(self, index):
+        """Return the id of the document at queue position `index`."""
+        return self.ids()[index]
+
+    def index(self, document_id):
+        """Return the queue position of `document_id`."""
+        if self._positions is None:
+            self._positions = {
+                document_id: index for index, document_id in enumerate(self.ids())
+            }
+        try:
+            return self._positions[document_id]
+        except KeyError:
+            raise KeyError(f"unknown document {document_id!r}") from None
+
+
+class DirectorySource(DocumentSource):
+    """
+    Documents stored as text files in a directory tree.
+
+    Document ids are the file paths relative to `path`, without suffix. The
+    annotations of ``<id>.txt`` are read from ``<id>.json``, a JSON list of
+    annotations, when it exists.
+
+    Parameters
+    ----------
+    path : str or Path
+        Root directory of the corpus.
+    pattern : str
+        Glob pattern of the text files, matched recursively.
+    encoding : str
+        Encoding of the text files.
+    """
+
+    def __init__(self, path, pattern="*.txt", encoding="utf-8"):
+        self.path = Path(path)
+        self.encoding = encoding
+        self._files = {
+            file.relative_to(self.path).with_suffix("").as_posix(): file
+            for file in sorted(self.path.rglob(pattern))
+            if file.is_file()
+        }
+        self._ids = list(self._files)
+
+    def ids(self):
+        return self._ids
+
+    def load(self, document_id):
+        try:
+            file = self._files[document_id]
+        except KeyError:
+            raise KeyError(f"unknown document {document_id!r}") from None
+        text = file.read_text(encoding=self.encoding)
+        annotations_file = file.with_suffix(".json")
+        annotations = []
+        if annotations_file.exists():
+            annotations = json.loads(annotations_file.read_text(encoding="utf-8"))
+        return text, annotations
+
+
+class JSONLSource(DocumentSource):
+    """
+    Documents stored one per line of a JSON Lines file.
+
+    The file is scanned once for the id and byte offset of every line;
+    documents are read with a seek when loaded.
+
+    Parameters
+    ----------
+    path : str or Path
+        JSON Lines file.
+    id_field : str, optional
+        Field holding the document id. Documents without one (or every
+        document, if `id_field` is None) are numbered by their line in the
+        file, from ``"0"`` and counting blank lines, as `read_jsonl` does.
+    text_field : str
+        Field holding the text.
+    annotations_field : str
+        Field holding the list of annotations, if any.
+    """
+
+    def __init__(
+        self, path, id_field="id", text_field="text", annotations_field="annotations"
+    ):
+        self.path = Path(path)
+        self.text_field = text_field
+        self.annotations_field = annotations_field
+        self._ids = []
+        self._offsets = []
+        with open(self.path, "rb") as f:
+            offset = 0
+            for number, line in enumerate(f):
+                if line.strip():
+                    self._ids.append(
+                        str(
+                            number
+                            if id_field is None
+                            else json.loads(line).get(id_field, number)
+                        )
+                    )
+                    self._offsets.append(offset)
+                offset += len(line)
+        self._local = _ForkLocal(lambda: (open(self.path, "rb"), threading.Lock()))
+
+    def close(self):
+        """Close the file."""
+        self._local.get()[0].close()
+
+    def ids(self):
+        return self._ids
+
+    def load(self, document_id):
+        offset = self._offsets[self.index(document_id)]
+        file, lock = self._local.get()
+        with lock:
+            file.seek(offset)
+            line = file.readline()
+        record = json.loads(line)
+        return record[self.text_field], record.get(self.annotations_field)
+
+
+class SQLiteSource(DocumentSource):
+    """
+    Documents stored as rows of a SQLite table, in rowid order.
+
+    Parameters
+    ----------
+    path : str
+        Database file.
+    table : str
+        Table holding the documents.
+    id_column, text_column : str
+        Columns holding the document id and the text.
+    annotations_column : str, optional
+        Column holding the annotations as a JSON list, if any.
+    """
+
+    def __init__(
+        self,
+        path,
+        table="documents",
+        id_column="id",
+        text_column="text",
+        annotations_column=None,
+    ):
+        self.path = path
+        self._local = _ForkLocal(
+            lambda: (sqlite3.connect(path, check_same_thread=False), threading.Lock())
+        )
+        columns = [text_column] + (
+            [annotations_column] if annotations_column is not None else []
+        )
+        self._query = (
+            f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(table)}"
+            f" WHERE {_quote(id_column)} = ?"
+        )
+        connection, _ = self._local.get()
+        # Ids are listed as strings but looked up by their stored value: a
+        # column without type affinity does not compare 1 and "1" equal.
+        self._keys = {
+            str(document_id): document_id
+            for document_id, in connection.execute(
+                f"SELECT {_quote(id_column)} FROM {_quote(table)} ORDER BY rowid"
+            )
+        }
+        self._ids = list(self._keys)
+
+    def close(self):
+        """Close the database connection."""
+        connection, lock = self._local.get()
+        with lock:
+            connection.close()
+
+    def ids(self):
+        return self._ids
+
+    def load(self, document_id):
+        connection, lock = self._local.get()
+        with lock:
+            row = connection.execute(
+                self._query, (self._keys.get(document_id, document_id),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"unknown document {document_id!r}")
+        annotations = json.loads(row[1]) if len(row) > 1 and row[1] else []
+        return row[0], annotations
+
+
+def _quote(identifier):
+    """Quote a SQL identifier."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class AnnotationCorpus(AnnotationRepository):
+    """
+    Repository serving the documents of a `DocumentSource`.
+
+    Documents are loaded from the source when first read and kept in an LRU
+    cache of `cache_size` documents. The source is never written to: the
+    first edit of a document copies it to `store`, which holds every edited
+    document from then on.
+
+    Parameters
+    ----------
+    source : DocumentSource
+        Documents of the corpus, in queue order.
+    cache_size : int
+        Number of unedited documents kept in memory.
+    prefetch : int
+        Number of documents following the current one to load ahead of time,
+        in a background thread (see `prefetch`). 0 disables prefetching.
+    store : AnnotationRepository, optional
+        Repository of edited documents; a new `InMemoryAnnotationRepository`
+        by default. Pass a `SQLiteAnnotationRepository` to persist edits.
+    """
+
+    def __init__(self, source, cache_size=64, prefetch=2, store=None):
+        self.source = source
+        self.cache_size = cache_size
+        self.prefetch_count = prefetch
+        self.store = InMemoryAnnotationRepository() if store is None else store
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        # Loads in flight and the prefetch thread belong to one process.
+        self._local = _ForkLocal(
+            lambda: {"lock": threading.RLock(), "loading": {}, "executor": None}
+        )
+        self._local.get()
+
+    @property
+    def _lock(self):
+        return self._local.get()["lock"]
+
+    @property
+    def _loading(self):
+        return self._local.get()["loading"]
+
+    def close(self):
+        """Stop the prefetch thread, after the pending loads."""
+        state = self._local.get()
+        if state["executor"] is not None:
+            state["executor"].shutdown(wait=True)
+            state["executor"] = None
+
+    # Queue
+
+    def __len__(self):
+        return len(self.source)
+
+    def document_id(self, index):
+        """Return the id of the document at queue position `index`."""
+        return self.source.document_id(index)
+
+    def position(self, document_id):
+        """Return the queue position of `document_id`."""
+        return self.source.index(document_id)
+
+    def next_document(self, document_id, step=1):
+        """Return the id `step` documents after `document_id` in the queue,
+        stopping at either end."""
+        index = max(0, min(len(self) - 1, self.position(document_id) + step))
+        return self.document_id(index)
+
+    # Loading
+
+    def _fill(self, document_id, future):
+        """Load `document_id` from the source into the cache."""
+        try:
+            text, annotations = self.source.load(document_id)
+            document = AnnotationDocument(text, _source_records(text, annotations))
+        except BaseException as error:
+            with self._lock:
+                self._loading.pop(document_id, None)
+            future.set_exception(error)
+            return
+        with self._lock:
+            self._loading.pop(document_id, None)
+            self._cache[document_id] = document
+            self._cache.move_to_end(document_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        future.set_result(document)
+
+    def _document(self, document_id):
+        """Return the unedited `AnnotationDocument` of `document_id`,
+        loading it or waiting for a pending prefetch."""
+        with self._lock:
+            document = self._cache.get(document_id)
+            if document is not None:
+                self.hits += 1
+                self._cache.move_to_end(document_id)
+                return document
+            self.misses += 1
+            future = self._loading.get(document_id)
+            load = future is None
+            if load:
+                future = self._loading[document_id] = Future()
+        if load:
+            self._fill(document_id, future)
+        return future.result()
+
+    def prefetch(self, document_id):
+        """Load the `prefetch` documents following `document_id` in the
+        background, unless they are cached, loading or edited."""
+        if not self.prefetch_count or document_id not in self.source:
+            return
+        start = self.position(document_id) + 1
+        end = min(len(self), start + self.prefetch_count)
+        state = self._local.get()
+        with state["lock"]:
+            if state["executor"] is None:
+                state["executor"] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="dash-annotator-prefetch"
+                )
+            for index in range(start, end):
+                next_id = self.document_id(index)
+                if (
+                    next_id in self._cache
+                    or next_id in self._loading
+                    or self.store.exists(next_id)
+                ):
+                    continue
+                future = self._loading[next_id] = Future()
+                state["executor"].submit(self._fill, next_id, future)
+
+    def cache_info(self):
+        """Return the hit and miss counts and the size of the document
+        cache, like `functools.lru_cache`."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.cache_size, len(self._cache))
+
+    def _edited(self, document_id):
+        """Return `document_id` after copying it to the store, on first
+        edit."""
+        if self.store.exists(document_id):
+            return document_id
+        # Load outside the lock: a pending prefetch needs it to finish.
+        document = self._document(document_id)
+        with self._lock:
+            if not self.store.exists(document_id):
+                self.store.create(document_id, document.text, document.to_records())
+                self._cache.pop(document_id, None)
+        return document_id
+
+    # Repository
+
+    def exists(self, document_id):
+        return self.store.exists(document_id) or document_id in self.source
+
+    def create(self, document_id, text="", annotations=()):
+        if document_id in self.source:
+            raise KeyError(f"document {document_id!r} already exists")
+        return self.store.create(document_id, text, annotations)
+
+    def text(self, document_id):
+        if self.store.exists(document_id):
+            return self.store.text(document_id)
+        return self._document(document_id).text
+
+    def annotations(self, document_id):
+        if self.store.exists(document_id):
+            return self.store.annotations(document_id)
+        return self._document(document_id).annotations.copy()
+
+    def get(self, document_id, annotation_id, default=None):
+        if self.store.exists(document_id):
+            return self.store.get(document_id, annotation_id, default)
+        record = self._document(document_id).annotations.get(annotation_id)
+        return default if record is None else dict(record)
+
+    def contains(self, document_id, annotation_id):
+        if self.store.exists(document_id):
+            return self.store.contains(document_id, annotation_id)
+        return annotation_id in self._document(document_id).annotations
+
+    def page(self, document_id, offset, limit, sort_by=None):
+        if self.store.exists(document_id):
+            return self.store.page(document_id, offset, limit, sort_by)
+        return _page(self._document(document_id).annotations, offset, limit, sort_by)
+
+    def version(self, document_id):
+        if self.store.exists(document_id):
+            return self.store.version(document_id)
+        self.source.index(document_id)
+        return 0
+
+    def snapshot(self, document_id):
+        if self.store.exists(document_id):
+            return self.store.snapshot(document_id)
+        # Unedited documents are never written to.
+        document = self._document(document_id)
+        return document.text, 0, document.annotations.copy()
+
+    def set_text(self, document_id, text):
+        return self.store.set_text(self._edited(document_id), text)
+
+    def edit(self, document_id, offset, deleted, inserted):
+        return self.store.edit(self._edited(document_id), offset, deleted, inserted)
+
+    def add(self, document_id, annotation):
+        return self.store.add(self._edited(document_id), annotation)
+
+    def add_many(self, document_id, annotations):
+        return self.store.add_many(self._edited(document_id), annotations)
+
+    def remove(self, document_id, annotation_id):
+        return self.store.remove(self._edited(document_id), annotation_id)
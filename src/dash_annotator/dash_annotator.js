@@ -0,0 +1,277 @@
+/*
+ * Dash components of dash_annotator.
+ *
+ * Plain browser script: components are built with `React.createElement` on
+ * the React instance Dash provides, so no build step is needed. Dash looks
+ * them up as `window.dash_annotator.<type>`.
+ */
+(function (React) {
+    "use strict";
+
+    var h = React.createElement;
+
+    // Annotation offsets count code points, as Python string indices do,
+    // while JavaScript strings count UTF-16 code units: characters outside
+    // the Basic Multilingual Plane take two units (a surrogate pair). Offsets
+    // are converted where text meets the stores.
+    var HIGH_SURROGATE = /[\ud800-\udbff]/;
+    var SURROGATE_PAIRS = /[\ud800-\udbff][\udc00-\udfff]/g;
+
+    function surrogatePairs(text) {
+        var pairs = text.match(SURROGATE_PAIRS);
+        return pairs ? pairs.length : 0;
+    }
+
+    // Length of `text` in code points.
+    function codePointLength(text) {
+        return text.length - surrogatePairs(text);
+    }
+
+    // Code point offset of the UTF-16 offset `unit` of `text`.
+    function codePointOffset(text, unit) {
+        return unit - surrogatePairs(text.slice(0, unit));
+    }
+
+    // Return a function mapping code point offsets of `text` to UTF-16
+    // offsets; offsets past the end map to the end, as Python slices clamp.
+    function unitOffsets(text) {
+        if (!HIGH_SURROGATE.test(text)) {
+            return function (offset) {
+                return Math.min(offset, text.length);
+            };
+        }
+        var units = [];
+        for (var unit = 0; unit < text.length; unit++) {
+            units.push(unit);
+            if (
+                HIGH_SURROGATE.test(text[unit]) &&
+                /[\udc00-\udfff]/.test(text[unit + 1] || "")
+            ) {
+                unit++;
+            }
+        }
+        units.push(text.length);
+        return function (offset) {
+            return units[Math.min(offset, units.length - 1)];
+        };
+    }
+
+    // CRC-32 lookup table, as used by zlib.
+    var CRC_TABLE = [];
+    for (var n = 0; n < 256; n++) {
+        var c = n;
+        for (var k = 0; k < 8; k++) {
+            c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+        }
+        CRC_TABLE.push(c >>> 0);
+    }
+
+    // CRC-32 of the UTF-16 code units of `text`, little-endian, as Python's
+    // `zlib.crc32(text.encode("utf-16-le", "surrogatepass"))`.
+    function crc32(text) {
+        var crc = 0xffffffff;
+        for (var i = 0; i < text.length; i++) {
+            var unit = text.charCodeAt(i);
+            crc = CRC_TABLE[(crc ^ unit) & 0xff] ^ (crc >>> 8);
+            crc = CRC_TABLE[(crc ^ (unit >>> 8)) & 0xff] ^ (crc >>> 8);
+        }
+        return (crc ^ 0xffffffff) >>> 0;
+    }
+
+    // `[count, checksum]` of the spans in an annotations store, records or
+    // packed, as `AnnotationSet.fingerprint` computes it. Repository
+    // references are returned as they are.
+    function fingerprint(annotations) {
+        if (annotations && !Array.isArray(annotations) && !annotations.packed) {
+            return annotations;
+        }
+        var checksum = 0;
+        var count = 0;
+        var add = function (id, start, end) {
+            var span = String(id) + "\t" + start + "\t" + end;
+            checksum = (checksum + crc32(span)) % 4294967296;
+            count++;
+        };
+        if (annotations && annotations.packed) {
+            annotations.ids.forEach(function (id, i) {
+                var start = annotations.starts[i];
+                add(id, start, start + annotations.lengths[i]);
+            });
+        } else {
+            (annotations || []).forEach(function (ann) {
+                add(ann.id, ann.start, ann.end);
+            });
+        }
+        return [count, checksum];
+    }
+
+    // Highlight of a segment covered by `depth` annotations, as in
+    // `_render_segment`.
+    function highlightStyle(depth) {
+        return {
+            opacity: Math.min(0.2 + depth * 0.2, 1),
+            borderBottomWidth: "2px",
+            borderColor: "blue",
+            backgroundColor: "blue",
+        };
+    }
+
+    // Character range to render, as in `_window`.
+    function textWindow(viewport, length) {
+        if (!viewport) {
+            return [0, length];
+        }
+        if (!viewport.scrollHeight) {
+            return [0, Math.min(length, viewport.initial)];
+        }
+        var charsPerPx = length / viewport.scrollHeight;
+        var margin = viewport.overscan * viewport.height;
+        var start = Math.floor(Math.max(0, viewport.top - margin) * charsPerPx);
+        var end = Math.ceil((viewport.top + viewport.height + margin) * charsPerPx);
+        return [start, Math.min(length, end)];
+    }
+
+    // Order of `AnnotationSet.boundaries`: by position, the ends of
+    // non-empty spans before the starts, starts by (end, id), and the end of
+    // an empty span right after its start.
+    function boundaryOrder(a, b) {
+        for (var i = 0; i < a.length; i++) {
+            if (a[i] !== b[i]) {
+                return a[i] < b[i] ? -1 : 1;
+            }
+        }
+        return 0;
+    }
+
+    // Split text[start:end] at annotation boundaries, as in `_segments`, with
+    // annotations clipped to the window as in `_window_segments` unless it
+    // covers the whole text. Returns [from, to, labels, depth, key] entries;
+    // labels are the sorted ids of the `depth` annotations covering the
+    // segment, joined with "-", and key names the boundary the segment
+    // starts at ("s-<id>" or "e-<id>", or "start").
+    function segments(offsets, labels, start, end, whole) {
+        var boundaries = [];
+        for (var i = 0; i < labels.length; i++) {
+            var from = offsets[2 * i];
+            var to = offsets[2 * i + 1];
+            if (!whole) {
+                if (from >= end || to <= start) {
+                    continue;
+                }
+                from = Math.max(from, start);
+                to = Math.min(to, end);
+            }
+            // [position, order..., id, is start]
+            boundaries.push([from, 1, to, labels[i], 0, true]);
+            if (from < to) {
+                boundaries.push([to, 0, 0, labels[i], 0, false]);
+            } else {
+                boundaries.push([to, 1, to, labels[i], 1, false]);
+            }
+        }
+        boundaries.sort(boundaryOrder);
+        var parts = [];
+        var active = {};
+        var depth = 0;
+        var last = start;
+        var key = "start";
+        boundaries.forEach(function (boundary) {
+            var id = boundary[3];
+            if (boundary[0] > last) {
+                parts.push([last, boundary[0], Object.keys(active).sort().join("-"), depth, key]);
+            }
+            if (boundary[5]) {
+                active[id] = true;
+                depth += 1;
+                key = "s-" + id;
+            } else {
+                delete active[id];
+                depth -= 1;
+                key = "e-" + id;
+            }
+            last = boundary[0];
+        });
+        if (last < end) {
+            parts.push([last, end, "", 0, key]);
+        }
+        return parts;
+    }
+
+    // One run of text. Memoized on its props, so only segments whose text or
+    // covering annotations changed are re-rendered.
+    var Segment = React.memo(function Segment(props) {
+        if (!props.depth) {
+            return h("span", null, props.text);
+        }
+        return h(
+            "span",
+            {style: highlightStyle(props.depth), "data-annotations": props.labels},
+            props.text
+        );
+    });
+
+    /**
+     * Text with highlighted annotations.
+     *
+     * Takes the text and a flat [start0, end0, start1, end1, ...] offsets
+     * array, in code points, with one label (annotation id) per annotation,
+     * and renders the highlighted segments itself instead of receiving a
+     * tree of spans.
+     */
+    function AnnotatedTextView(props) {
+        var text = props.text || "";
+        var offsets = props.offsets || [];
+        var labels = props.labels || [];
+        var length = React.useMemo(
+            function () {
+                return codePointLength(text);
+            },
+            [text]
+        );
+        var unit = React.useMemo(
+            function () {
+                return unitOffsets(text);
+            },
+            [text]
+        );
+        var range = textWindow(props.viewport, length);
+        var whole = range[0] === 0 && range[1] === length;
+        var parts = React.useMemo(
+            function () {
+                return segments(offsets, labels, range[0], range[1], whole);
+            },
+            [offsets, labels, range[0], range[1], whole]
+        );
+        var children = parts.map(function (part) {
+            return h(Segment, {
+                key: part[4],
+                text: text.slice(unit(part[0]), unit(part[1])),
+                labels: part[2],
+                depth: part[3],
+            });
+        });
+        if (range[0] > 0) {
+            children.unshift(
+                h(Segment, {key: "before", text: text.slice(0, unit(range[0]))})
+            );
+        }
+        if (range[1] < length) {
+            children.push(h(Segment, {key: "after", text: text.slice(unit(range[1]))}));
+        }
+        return h(
+            "div",
+            {id: props.id, className: props.className, style: props.style},
+            children
+        );
+    }
+
+    window.dash_annotator = Object.assign(window.dash_annotator || {}, {
+        AnnotatedTextView: AnnotatedTextView,
+        // Offset conversions for the clientside callbacks.
+        codePointLength: codePointLength,
+        codePointOffset: codePointOffset,
+        unitOffsets: unitOffsets,
+        // Annotations store fingerprint for the server callbacks.
+        fingerprint: fingerprint,
+    });
+})(window.React);
@@ -0,0 +1,253 @@
+"""
+Headless annotation engine.
+
+`AnnotationDocument` owns a text and its annotations and implements what
+the annotator callbacks do with them: edits, segmentation and overlap
+queries, and conversion to and from the store formats. It builds no Dash
+components and needs no callback context, so documents can be processed in
+batch jobs and benchmarks at full speed; the callbacks wrap it.
+"""
+
+import math
+import uuid
+
+from dash_annotator.annotation_set import (
+    AnnotationColumns,
+    AnnotationSet,
+    _diff,
+    _records,
+    _store_records,
+)
+from dash_annotator.search import _unannotated, find_all
+
+__all__ = [
+    "AnnotationDocument",
+]
+
+
+def _check_edit(text, offset, deleted):
+    """Return `text` after checking an edit range lies within it."""
+    if not 0 <= offset <= offset + deleted <= len(text):
+        raise ValueError(
+            f"edit of {deleted} characters at {offset} is out of range"
+            f" for a text of length {len(text)}"
+        )
+    return text
+
+
+def _window(viewport, length):
+    """Return the ``[start, end)`` character range to render.
+
+    Without a viewport the whole text is rendered. Otherwise the scroll
+    window, widened by ``overscan`` viewport heights on each side, is mapped
+    to characters assuming they are spread evenly over the scroll height.
+    """
+    if not viewport:
+        return 0, length
+    if not viewport["scrollHeight"]:
+        return 0, min(length, viewport["initial"])
+    chars_per_px = length / viewport["scrollHeight"]
+    margin = viewport["overscan"] * viewport["height"]
+    start = math.floor(max(0, viewport["top"] - margin) * chars_per_px)
+    end = math.ceil((viewport["top"] + viewport["height"] + margin) * chars_per_px)
+    return start, min(length, end)
+
+
+def _segments(text, annotations, start=0, end=None):
+    """Split ``text[start:end]`` at annotation boundaries.
+
+    Yields ``(start, end, active_ids, key)`` for every non-empty segment,
+    where ``active_ids`` is the set of annotation ids covering the segment.
+    ``key`` names the annotation boundary the segment starts at (``s-<id>``
+    or ``e-<id>``, or ``start`` for the first segment), so it is unique
+    within the text and survives edits that move the segment.
+    `annotations` is an `AnnotationSet`, whose boundaries come pre-sorted.
+    """
+    if end is None:
+        end = len(text)
+    last_pos = start
+    last_key = "start"
+    active_annotations = set()
+
+    for pos, is_start, ann_id in annotations.boundaries():
+        if pos > last_pos:
+            yield last_pos, pos, frozenset(active_annotations), last_key
+
+        if is_start:
+            active_annotations.add(ann_id)
+            last_key = f"s-{ann_id}"
+        else:
+            active_annotations.discard(ann_id)
+            last_key = f"e-{ann_id}"
+
+        last_pos = pos
+
+    if last_pos < end:
+        yield last_pos, end, frozenset(), last_key
+
+
+def _window_segments(text, annotations, viewport):
+    """Segments for a virtualized annotator.
+
+    Only annotations intersecting the render window are split into
+    highlighted segments; text before and after the window is emitted as
+    plain runs so the overlay keeps its layout with a bounded node count.
+    """
+    start, end = _window(viewport, len(text))
+    if start == 0 and end == len(text):
+        yield from _segments(text, annotations)
+        return
+    if start > 0:
+        yield 0, start, frozenset(), "before"
+    window = AnnotationSet(
+        dict(ann, start=max(ann["start"], start), end=min(ann["end"], end))
+        for ann in annotations.overlapping(start, end)
+    )
+    yield from _segments(text, window, start, end)
+    if end < len(text):
+        yield end, len(text), frozenset(), "after"
+
+
+class AnnotationDocument:
+    """
+    A text and its annotations.
+
+    Parameters
+    ----------
+    text : str, optional
+        Text of the document.
+    annotations : AnnotationSet, AnnotationColumns, or iterable of Annotation or dict, optional
+        Annotations of the text. An `AnnotationSet` is used as is, without
+        copying.
+
+    Examples
+    --------
+    >>> document = AnnotationDocument(
+    ...     "Hello world",
+    ...     [{"id": "a", "start": 6, "end": 11, "text": "world", "note": ""}],
+    ... )
+    >>> document.edit(7, 1, "OO")
+    (['a'], [])
+    >>> [document.text[start:end] for start, end, _, _ in document.segments()]
+    ['Hello ', 'wOOrld']
+    >>> document.get("a")["text"]
+    'wOOrld'
+    """
+
+    def __init__(self, text="", annotations=()):
+        self.text = text
+        if not isinstance(annotations, AnnotationSet):
+            annotations = AnnotationSet(_records(annotations))
+        self.annotations = annotations
+
+    @classmethod
+    def from_store(cls, text, annotations_data):
+        """Build a document from the contents of an annotator's text and
+        annotations stores, in either store format."""
+        return cls(text or "", _store_records(annotations_data) or [])
+
+    def __len__(self):
+        return len(self.text)
+
+    # Edits
+
+    def edit(self, offset, deleted, inserted):
+        """Replace `deleted` characters at `offset` with the string
+        `inserted`, rebasing the annotations (see `AnnotationSet.apply_edit`).
+
+        Returns the ids of the changed and of the removed annotations.
+        """
+        text = _check_edit(self.text, offset, deleted)
+        self.text = text[:offset] + inserted + text[offset + deleted :]
+        return self.annotations.apply_edit(offset, deleted, len(inserted), self.text)
+
+    def set_text(self, text):
+        """Replace the text with `text`, as a single edit of the range that
+        differs, and return the changed and removed annotation ids."""
+        return self.edit(*_diff(self.text, text))
+
+    def add(self, annotation):
+        """Add an annotation and return its store list index."""
+        return self.annotations.insert(annotation)
+
+    def remove(self, ann_id):
+        """Remove the annotation with `ann_id` and return it."""
+        return self.annotations.remove(ann_id)
+
+    def annotate_all(self, query, note="", **options):
+        """Annotate every match of `query` (see `find`, which takes the
+        `options`) that no annotation covers exactly, and return the new
+        annotations."""
+        added = []
+        for start, end in _unannotated(self.annotations, self.find(query, **options)):
+            annotation = {
+                "id": str(uuid.uuid4()),
+                "start": start,
+                "end": end,
+                "text": self.text[start:end],
+                "note": note,
+            }
+            self.annotations.insert(annotation)
+            added.append(annotation)
+        return added
+
+    # Queries
+
+    def get(self, ann_id, default=None):
+        """Return the annotation with `ann_id`."""
+        return self.annotations.get(ann_id, default)
+
+    def overlapping(self, start, end):
+        """Return annotations intersecting ``[start, end)``, by start."""
+        return self.annotations.overlapping(start, end)
+
+    def at(self, pos):
+        """Return annotations covering the character at `pos`."""
+        return self.annotations.at(pos)
+
+    def find(self, query, regex=False, ignore_case=False, whole_words=False):
+        """Return the ``(start, end)`` spans of the matches of `query` in
+        the text (see `find_all`)."""
+        return find_all(self.text, query, regex, ignore_case, whole_words)
+
+    def segments(self, start=0, end=None):
+        """Split ``text[start:end]`` at annotation boundaries.
+
+        Yields ``(start, end, active_ids, key)`` tuples, as rendered by the
+        annotator (see `_segments`).
+        """
+        if start or end is not None:
+            end = len(self.text) if end is None else end
+            window = AnnotationSet(
+                dict(ann, start=max(ann["start"], start), end=min(ann["end"], end))
+                for ann in self.annotations.overlapping(start, end)
+            )
+            return _segments(self.text, window, start, end)
+        return _segments(self.text, self.annotations)
+
+    def window_segments(self, viewport):
+        """Segments of a virtualized annotator showing `viewport` (the
+        contents of its viewport store)."""
+        return _window_segments(self.text, self.annotations, viewport)
+
+    # Serialization
+
+    def to_records(self):
+        """Return the annotations in the records store format."""
+        return self.annotations.to_records()
+
+    def to_packed(self):
+        """Return the annotations in the packed store format."""
+        return AnnotationColumns(self.annotations).to_packed()
+
+    def to_dict(self, packed=False):
+        """Return the text and annotations as a JSON-ready dict."""
+        return {
+            "text": self.text,
+            "annotations": self.to_packed() if packed else self.to_records(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a document from the output of `to_dict`."""
+        return cls.from_store(data["text"], data["annotations"])
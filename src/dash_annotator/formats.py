@@ -0,0 +1,377 @@
+"""
+Streaming import and export of annotated documents.
+
+Readers are generators yielding one document at a time as a
+``(document_id, text, annotations)`` tuple, with a list of `Annotation`
+objects; writers consume any iterable of such tuples, with annotations
+given as `Annotation` objects, store records, an `AnnotationSet` or
+`AnnotationColumns`. Only one document is held in memory at a time, so
+corpora larger than memory convert at constant memory::
+
+    write_bio(read_jsonl("corpus.jsonl"), "corpus.bio")
+
+Supported formats:
+
+- JSON Lines: one ``{"id", "text", "annotations"}`` object per line.
+- BRAT standoff: a ``.txt`` and a ``.ann`` file per document.
+- CoNLL BIO: one token and tag per line, sentences separated by blank lines
+  and documents by ``-DOCSTART-`` lines.
+
+Files are given as paths or as open text files.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+import contextlib
+import json
+import os
+from pathlib import Path, PurePosixPath
+import re
+
+from dash_annotator.annotation_set import Annotation, _records
+
+__all__ = [
+    "read_jsonl",
+    "write_jsonl",
+    "read_brat",
+    "write_brat",
+    "read_brat_corpus",
+    "write_brat_corpus",
+    "read_bio",
+    "write_bio",
+]
+
+# Tokens of the BIO exporter: runs of non-space characters.
+TOKEN_PATTERN = r"\S+"
+
+
+def _opened(file, mode="r"):
+    """Open a path, or pass an open file through."""
+    if isinstance(file, (str, os.PathLike)):
+        # No newline translation: offsets count "\r" like the browser does.
+        return open(file, mode, encoding="utf-8", newline="")
+    return contextlib.nullcontext(file)
+
+
+def _annotation(text, record):
+    """Return an `Annotation` for a record that may leave out the covered
+    text and the note."""
+    if isinstance(record, Annotation):
+        return record
+    start, end = record["start"], record["end"]
+    return Annotation(
+        str(record["id"]),
+        start,
+        end,
+        record.get("text", text[start:end]),
+        record.get("note", ""),
+    )
+
+
+def _label(note, default):
+    """Return `note` as a whitespace-free entity type."""
+    return re.sub(r"\s+", "_", note.strip()) or default
+
+
+# JSON Lines
+
+
+def read_jsonl(file, id_field="id", text_field="text", annotations_field="annotations"):
+    """Yield the documents of a JSON Lines file.
+
+    Parameters
+    ----------
+    file : str, Path or file
+        File to read.
+    id_field, text_field, annotations_field : str
+        Fields holding the document id, its text and its annotations.
+        Documents without an id are numbered by line. Annotations may leave
+        out ``text`` and ``note``.
+    """
+    with _opened(file) as f:
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = record[text_field]
+            yield (
+                str(record.get(id_field, number)),
+                text,
+                [
+                    _annotation(text, annotation)
+                    for annotation in record.get(annotations_field) or ()
+                ],
+            )
+
+
+def write_jsonl(documents, file):
+    """Write `documents` as JSON Lines and return how many were written."""
+    count = 0
+    with _opened(file, "w") as f:
+        for document_id, text, annotations in documents:
+            record = {
+                "id": document_id,
+                "text": text,
+                "annotations": _records(annotations),
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+# BRAT standoff
+
+
+def read_brat(file, text=None):
+    """Yield the annotations of a BRAT ``.ann`` file.
+
+    Text-bound annotations (``T`` lines) become `Annotation` objects with
+    their type as the note. A discontinuous annotation yields one
+    annotation per fragment, the later ones with ``-1``, ``-2``, ...
+    appended to the id. Relations, events, attributes and notes are
+    skipped.
+
+    Parameters
+    ----------
+    file : str, Path or file
+        ``.ann`` file to read.
+    text : str, optional
+        Text of the document. The covered text is sliced from it when
+        given, and read from the ``.ann`` file otherwise.
+    """
+    with _opened(file) as f:
+        for line in f:
+            if not line.startswith("T"):
+                continue
+            ann_id, span, covered = line.rstrip("\r\n").split("\t", 2)
+            note, _, ranges = span.partition(" ")
+            fragments = [tuple(map(int, part.split())) for part in ranges.split(";")]
+            # BRAT joins the text of fragments with single spaces.
+            position = 0
+            for index, (start, end) in enumerate(fragments):
+                if text is None:
+                    fragment = covered[position : position + end - start]
+                    position += end - start + 1
+                else:
+                    fragment = text[start:end]
+                yield Annotation(
+                    ann_id if index == 0 else f"{ann_id}-{index}",
+                    start,
+                    end,
+                    fragment,
+                    note,
+                )
+
+
+def write_brat(annotations, file, text=None):
+    """Write `annotations` as a BRAT ``.ann`` file and return how many were
+    written.
+
+    Annotations are numbered ``T1``, ``T2``, ... in the given order, typed
+    by their note (with whitespace replaced by ``_``, and ``Annotation``
+    for empty notes). The covered text is sliced from `text` when given.
+    """
+    count = 0
+    with _opened(file, "w") as f:
+        for record in _records(annotations):
+            annotation = _annotation(text or "", record)
+            count += 1
+            covered = (
+                annotation.text
+                if text is None
+                else text[annotation.start : annotation.end]
+            )
+            covered = covered.replace("\r", " ").replace("\n", " ")
+            f.write(
+                f"T{count}\t{_label(annotation.note, 'Annotation')}"
+                f" {annotation.start} {annotation.end}\t{covered}\n"
+            )
+    return count
+
+
+def read_brat_corpus(directory):
+    """Yield the documents of a BRAT corpus, every ``<id>.txt`` file in
+    `directory` and its subdirectories, with its ``<id>.ann`` file."""
+    directory = Path(directory)
+    for text_file in sorted(directory.rglob("*.txt")):
+        with _opened(text_file) as f:
+            text = f.read()
+        ann_file = text_file.with_suffix(".ann")
+        annotations = list(read_brat(ann_file, text)) if ann_file.exists() else []
+        document_id = text_file.relative_to(directory).with_suffix("").as_posix()
+        yield document_id, text, annotations
+
+
+def _document_path(document_id):
+    """Return the relative path of the files of `document_id`.
+
+    Ids may name subdirectories with ``/``, as `read_brat_corpus` yields
+    them, but must stay inside the corpus: absolute paths, ``..``, ``.``
+    and empty segments, backslashes and NUL characters are rejected, so an
+    id cannot write outside the directory or archive it is exported to.
+    """
+    document_id = str(document_id)
+    parts = document_id.split("/")
+    if (
+        "\\" in document_id
+        or "\0" in document_id
+        or ":" in parts[0]
+        or any(part in ("", ".", "..") for part in parts)
+    ):
+        raise ValueError(f"document id {document_id!r} is not a safe relative path")
+    return PurePosixPath(*parts)
+
+
+def write_brat_corpus(documents, directory):
+    """Write `documents` as a BRAT corpus, a ``<id>.txt`` and a ``<id>.ann``
+    file each, and return how many were written.
+
+    Raises
+    ------
+    ValueError
+        If a document id is not a safe relative path (see
+        `_document_path`).
+    """
+    directory = Path(directory)
+    count = 0
+    for document_id, text, annotations in documents:
+        text_file = directory / f"{_document_path(document_id)}.txt"
+        text_file.parent.mkdir(parents=True, exist_ok=True)
+        with _opened(text_file, "w") as f:
+            f.write(text)
+        write_brat(annotations, text_file.with_suffix(".ann"), text)
+        count += 1
+    return count
+
+
+# CoNLL BIO
+
+
+class _TokenIndex:
+    """
+    Character offsets of the tokens of a text.
+
+    Token starts and ends are sorted, so the tokens a character span
+    overlaps are found by binary search instead of scanning every token.
+    """
+
+    def __init__(self, text, pattern=TOKEN_PATTERN):
+        self.starts = array("q")
+        self.ends = array("q")
+        for match in re.finditer(pattern, text):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+
+    def __len__(self):
+        return len(self.starts)
+
+    def tokens(self, start, end):
+        """Return the range of tokens overlapping ``[start, end)``."""
+        return range(bisect_right(self.ends, start), bisect_left(self.starts, end))
+
+
+def write_bio(documents, file, pattern=TOKEN_PATTERN):
+    """Write `documents` as CoNLL BIO and return how many were written.
+
+    Texts are split into tokens matching the regular expression `pattern`,
+    and into sentences at newlines. A token is tagged ``B-<note>`` or
+    ``I-<note>`` when an annotation overlaps it (``B`` and ``I`` alone for
+    empty notes), and ``O`` otherwise. BIO cannot represent overlapping
+    annotations: an annotation sharing a token with one that starts before
+    it (or at the same position but is longer) is left out.
+    """
+    count = 0
+    with _opened(file, "w") as f:
+        for document_id, text, annotations in documents:
+            index = _TokenIndex(text, pattern)
+            tags = [None] * len(index)
+            records = sorted(
+                _records(annotations), key=lambda ann: (ann["start"], -ann["end"])
+            )
+            for ann in records:
+                tokens = index.tokens(ann["start"], ann["end"])
+                if not tokens or any(tags[token] for token in tokens):
+                    continue
+                label = _label(ann["note"], "")
+                suffix = f"-{label}" if label else ""
+                tags[tokens[0]] = "B" + suffix
+                for token in tokens[1:]:
+                    tags[token] = "I" + suffix
+            f.write(f"-DOCSTART- {document_id}\n\n")
+            for token, tag in enumerate(tags):
+                start = index.starts[token]
+                if token and "\n" in text[index.ends[token - 1] : start]:
+                    f.write("\n")
+                f.write(f"{text[start:index.ends[token]]} {tag or 'O'}\n")
+            if tags:
+                f.write("\n")
+            count += 1
+    return count
+
+
+def read_bio(file):
+    """Yield the documents of a CoNLL BIO file.
+
+    Lines hold a token and, in the last column, its tag. Tokens are joined
+    with spaces and sentences with newlines to rebuild the text. Documents
+    start at ``-DOCSTART-`` lines, whose second column, if any, is taken as
+    the document id; otherwise documents are numbered. An ``I`` tag not
+    continuing an annotation of the same type starts a new one (IOB1).
+    """
+    document_id = None
+    number = 0
+    parts = []
+    annotations = []
+    length = 0
+    sentence_break = False
+    current = None  # [start, end, note] of the open annotation
+
+    def close():
+        nonlocal current
+        if current is not None:
+            start, end, note = current
+            annotations.append(
+                Annotation(f"T{len(annotations) + 1}", start, end, None, note)
+            )
+            current = None
+
+    def document():
+        close()
+        text = "".join(parts)
+        for annotation in annotations:
+            annotation.text = text[annotation.start : annotation.end]
+        return str(number) if document_id is None else document_id, text, annotations
+
+    with _opened(file) as f:
+        for line in f:
+            columns = line.split()
+            if columns and columns[0] == "-DOCSTART-":
+                if parts or document_id is not None:
+                    yield document()
+                    number += 1
+                document_id = columns[1] if len(columns) > 1 else None
+                parts, annotations, length = [], [], 0
+                sentence_break = False
+                continue
+            if not columns:
+                close()
+                sentence_break = bool(parts)
+                continue
+            token, tag = columns[0], columns[-1]
+            if parts:
+                separator = "\n" if sentence_break else " "
+                parts.append(separator)
+                length += 1
+            sentence_break = False
+            start = length
+            parts.append(token)
+            length += len(token)
+            kind, _, note = tag.partition("-")
+            if kind == "I" and current is not None and current[2] == note:
+                current[1] = length
+            else:
+                close()
+                if kind in ("B", "I"):
+                    current = [start, length, note]
+    if parts or document_id is not None:
+        yield document()
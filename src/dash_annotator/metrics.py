@@ -0,0 +1,184 @@
+"""
+Opt-in instrumentation of the annotator callbacks.
+
+`instrument` hooks into the Flask server of a Dash app, records the latency
+and payload sizes of every request to a callback of this package, labeled by
+callback and annotator id, and serves them in the Prometheus text format::
+
+    app = dash.Dash(__name__)
+    instrument(app)  # GET /metrics
+
+Clientside callbacks never reach the server and are not recorded.
+"""
+
+from bisect import bisect_left
+import threading
+import time
+
+import flask
+
+__all__ = [
+    "CallbackMetrics",
+    "instrument",
+]
+
+# Upper bounds of the histogram buckets; an implicit +Inf bucket follows.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(4**power for power in range(4, 13))  # 256 B to 16 MiB
+
+
+class _Histogram:
+    """Per-bucket counts, made cumulative on exposition, and a running sum."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        """Yield the exposition lines of the histogram."""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {total}"
+
+
+_METRICS = (
+    (
+        "dash_annotator_callback_duration_seconds",
+        "Server time of annotator callback requests.",
+        DURATION_BUCKETS,
+    ),
+    (
+        "dash_annotator_callback_request_bytes",
+        "Size of annotator callback request bodies.",
+        BYTES_BUCKETS,
+    ),
+    (
+        "dash_annotator_callback_response_bytes",
+        "Size of annotator callback response bodies.",
+        BYTES_BUCKETS,
+    ),
+)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class CallbackMetrics:
+    """
+    Latency and payload size histograms per (callback, annotator id).
+
+    The histogram counts double as invocation counts.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, callback, annotator_id, seconds, request_bytes, response_bytes):
+        """Record one callback request."""
+        key = (callback, annotator_id)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [
+                    _Histogram(buckets) for _, _, buckets in _METRICS
+                ]
+            for histogram, value in zip(
+                series, (seconds, request_bytes, response_bytes)
+            ):
+                histogram.observe(value)
+
+    def exposition(self):
+        """Return the metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for index, (name, help_text, _) in enumerate(_METRICS):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (callback, annotator_id), series in sorted(self._series.items()):
+                    labels = (
+                        f'callback="{_label(callback)}",'
+                        f'annotator="{_label(annotator_id)}"'
+                    )
+                    lines.extend(series[index].samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+def _annotator_id(outputs):
+    """Return the annotator id of a callback request's outputs."""
+    for output in outputs if isinstance(outputs, list) else [outputs]:
+        if isinstance(output, list):  # wildcard output
+            output = output[0] if output else {}
+        output_id = output.get("id")
+        if (
+            isinstance(output_id, dict)
+            and output_id.get("component") == "TextAnnotator"
+        ):
+            return output_id.get("id")
+    return ""
+
+
+def instrument(app, path="/metrics", metrics=None):
+    """Record the annotator callbacks of a Dash `app` and serve the metrics
+    at `path` on its Flask server.
+
+    Parameters
+    ----------
+    app : dash.Dash
+        App to instrument.
+    path : str
+        URL of the Prometheus endpoint.
+    metrics : CallbackMetrics, optional
+        Where to record; a new one by default.
+
+    Returns
+    -------
+    CallbackMetrics
+        The recorded metrics.
+    """
+    if metrics is None:
+        metrics = CallbackMetrics()
+    server = app.server
+    endpoint = f"{app.config.routes_pathname_prefix}_dash-update-component"
+
+    @server.before_request
+    def _start_timer():
+        if flask.request.path == endpoint:
+            flask.g.dash_annotator_start = time.perf_counter()
+
+    @server.after_request
+    def _record(response):
+        start = flask.g.pop("dash_annotator_start", None)
+        if start is None:
+            return response
+        body = flask.request.get_json(silent=True) or {}
+        callback = app.callback_map.get(body.get("output"), {}).get("callback")
+        if callback is None or not callback.__module__.startswith("dash_annotator"):
+            return response
+        metrics.observe(
+            callback.__name__,
+            _annotator_id(body.get("outputs", [])),
+            time.perf_counter() - start,
+            flask.request.content_length or 0,
+            response.calculate_content_length() or 0,
+        )
+        return response
+
+    def _exposition():
+        return flask.Response(
+            metrics.exposition(), mimetype="text/plain; version=0.0.4"
+        )
+
+    server.add_url_rule(path, "dash_annotator_metrics", _exposition)
+    return metrics
@@ -0,0 +1,345 @@
+"""
+Dictionary and regular expression pre-annotation.
+
+A `PreAnnotator` suggests annotations for a text from term dictionaries
+(gazetteers) and regular expression rules. Terms are compiled into an
+Aho-Corasick automaton, which finds every occurrence of every term in one
+pass over the text whatever the number of terms. Rules are compiled and run
+one by one, so each keeps its own flags, groups and backreferences::
+
+    annotator = PreAnnotator({"New York": "place", "Ada Lovelace": "person"})
+    annotator.add_patterns({r"\\b\\d{4}-\\d{2}-\\d{2}\\b": "date"})
+    TextAnnotator(id="doc", value=text, annotations=annotator.annotate(text))
+
+`annotate_documents` runs over a corpus, optionally in a process pool.
+"""
+
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+import re
+
+from dash_annotator.annotation_set import Annotation
+
+__all__ = [
+    "PreAnnotator",
+]
+
+OVERLAPS = ("longest", "all")
+
+# Characters scanned between two progress reports.
+PROGRESS_BLOCK = 1 << 16
+
+# Transitions are keyed by ``node << _CHAR_BITS | code point``.
+_CHAR_BITS = 21
+
+
+def _fold(text):
+    """Lowercase `text` character by character, keeping offsets."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters lowercase to several; keep the first of those.
+    return "".join(char.lower()[0] for char in text)
+
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
+
+
+class _Automaton:
+    """
+    Aho-Corasick automaton over a set of terms.
+
+    The trie is stored flat: one dict of transitions for all nodes and
+    arrays of per-node failure links, output links, depths and labels,
+    which keeps large dictionaries compact.
+    """
+
+    def __init__(self):
+        self.goto = {}
+        self.fail = array("l", [0])
+        self.output = array("l", [0])
+        self.depth = array("l", [0])
+        self.label = array("l", [-1])
+        self.compiled = True
+
+    def add(self, term, label):
+        """Add `term`, matched with `label`; a term added twice keeps the
+        last label."""
+        node = 0
+        for char in term:
+            key = node << _CHAR_BITS | ord(char)
+            child = self.goto.get(key)
+            if child is None:
+                child = self.goto[key] = len(self.depth)
+                self.fail.append(0)
+                self.output.append(0)
+                self.depth.append(self.depth[node] + 1)
+                self.label.append(-1)
+            node = child
+        self.label[node] = label
+        self.compiled = False
+
+    def compile(self):
+        """Compute the failure and output links, in breadth-first order."""
+        levels = {}
+        for key, child in self.goto.items():
+            levels.setdefault(self.depth[child], []).append((key, child))
+        mask = (1 << _CHAR_BITS) - 1
+        for depth in sorted(levels):
+            for key, child in levels[depth]:
+                parent, char = key >> _CHAR_BITS, key & mask
+                target = 0
+                if parent:
+                    node = self.fail[parent]
+                    while True:
+                        target = self.goto.get(node << _CHAR_BITS | char)
+                        if target is not None or not node:
+                            break
+                        node = self.fail[node]
+                    target = target or 0
+                self.fail[child] = target
+                self.output[child] = (
+                    target if self.label[target] >= 0 else self.output[target]
+                )
+        self.compiled = True
+
+    def matches(self, text, whole_words=False, progress=None):
+        """Yield ``(start, end, label)`` for every occurrence of a term; with
+        `whole_words`, only for those not starting or ending inside a word
+        of `text`. `progress` is called with the number of characters
+        scanned and the length of `text` after every block of characters."""
+        if not self.compiled:
+            self.compile()
+        goto, fail, output = self.goto, self.fail, self.output
+        depth, label = self.depth, self.label
+        length = len(text)
+        node = 0
+        for block in range(0, length, PROGRESS_BLOCK):
+            if progress is not None and block:
+                progress(block, length)
+            chars = text[block : block + PROGRESS_BLOCK]
+            for end, char in enumerate(chars, block + 1):
+                code = ord(char)
+                while True:
+                    target = goto.get(node << _CHAR_BITS | code)
+                    if target is not None:
+                        node = target
+                        break
+                    if not node:
+                        break
+                    node = fail[node]
+                match = node if label[node] >= 0 else output[node]
+                if (
+                    match
+                    and whole_words
+                    and end < length
+                    and _is_word(char)
+                    and _is_word(text[end])
+                ):
+                    continue
+                while match:
+                    start = end - depth[match]
+                    if not (
+                        whole_words
+                        and start
+                        and _is_word(text[start])
+                        and _is_word(text[start - 1])
+                    ):
+                        yield start, end, label[match]
+                    match = output[match]
+        if progress is not None:
+            progress(length, length)
+
+
+class PreAnnotator:
+    """
+    Suggest annotations from term dictionaries and regular expressions.
+
+    Parameters
+    ----------
+    terms : dict or iterable of str, optional
+        Terms to annotate, mapped to the note of their annotations, or
+        noted with `note`.
+    patterns : dict or iterable of str, optional
+        Regular expressions to annotate, mapped to the note of their
+        annotations, or noted with `note`. Each pattern is run over the text
+        on its own: its matches never overlap each other, but may overlap
+        those of other patterns and of terms (see `overlaps`).
+    note : str
+        Note of terms and patterns given without one.
+    ignore_case : bool
+        Match terms and patterns regardless of case.
+    whole_words : bool
+        Only match terms that start and end at word boundaries. Patterns
+        are matched as written.
+    overlaps : {"longest", "all"}
+        ``"longest"`` keeps non-overlapping matches, preferring the leftmost
+        and then the longest; ``"all"`` keeps every match.
+    id_prefix : str
+        Prefix of the ids of suggested annotations, which are made of the
+        prefix and the offsets of the span.
+    """
+
+    def __init__(
+        self,
+        terms=(),
+        patterns=(),
+        note="",
+        ignore_case=False,
+        whole_words=True,
+        overlaps="longest",
+        id_prefix="pre-",
+    ):
+        if overlaps not in OVERLAPS:
+            raise ValueError(f"overlaps must be one of {OVERLAPS}, got {overlaps!r}")
+        self.ignore_case = ignore_case
+        self.whole_words = whole_words
+        self.overlaps = overlaps
+        self.id_prefix = id_prefix
+        self._notes = []
+        self._note_index = {}
+        self._automaton = _Automaton()
+        self._patterns = []
+        self._regexes = None
+        self.add_terms(terms, note)
+        self.add_patterns(patterns, note)
+
+    def _label(self, note):
+        index = self._note_index.get(note)
+        if index is None:
+            index = self._note_index[note] = len(self._notes)
+            self._notes.append(note)
+        return index
+
+    @staticmethod
+    def _noted(items, note):
+        return items.items() if isinstance(items, dict) else ((i, note) for i in items)
+
+    def add_terms(self, terms, note=""):
+        """Add dictionary terms (see `terms`)."""
+        for term, term_note in self._noted(terms, note):
+            if not term:
+                raise ValueError("terms must not be empty")
+            if self.ignore_case:
+                term = _fold(term)
+            self._automaton.add(term, self._label(term_note))
+
+    def add_patterns(self, patterns, note=""):
+        """Add regular expression rules (see `patterns`)."""
+        for pattern, pattern_note in self._noted(patterns, note):
+            re.compile(pattern)  # Fail on the faulty pattern itself.
+            self._patterns.append((pattern, self._label(pattern_note)))
+            self._regexes = None
+
+    def _compiled_patterns(self):
+        """Return every pattern compiled, with its label.
+
+        Patterns are not joined into one alternation: inline global flags
+        are only allowed at the start of a pattern, group numbers and names
+        would shift or collide between patterns, and a single scan would
+        drop the matches of one pattern that overlap those of another.
+        """
+        if self._regexes is None:
+            flags = re.IGNORECASE if self.ignore_case else 0
+            self._regexes = [
+                (re.compile(pattern, flags), label) for pattern, label in self._patterns
+            ]
+        return self._regexes
+
+    def matches(self, text, progress=None):
+        """Yield ``(start, end, note)`` for every term and pattern match in
+        `text`, before overlaps are resolved (see `annotate` for
+        `progress`)."""
+        folded = _fold(text) if self.ignore_case else text
+        for start, end, label in self._automaton.matches(
+            folded, self.whole_words, progress
+        ):
+            yield start, end, self._notes[label]
+        for regex, label in self._compiled_patterns():
+            for match in regex.finditer(text):
+                if match.end() > match.start():
+                    yield match.start(), match.end(), self._notes[label]
+
+    def annotate(self, text, progress=None):
+        """Return the suggested annotations of `text`, ordered by start.
+
+        `progress`, if given, is called with the number of characters
+        scanned so far and the length of `text` as the scan proceeds.
+        """
+        spans = sorted(
+            self.matches(text, progress), key=lambda span: (span[0], -span[1])
+        )
+        if self.overlaps == "longest":
+            kept = []
+            last_end = 0
+            for span in spans:
+                if span[0] >= last_end:
+                    kept.append(span)
+                    last_end = span[1]
+            spans = kept
+        annotations = []
+        ids = {}
+        for start, end, note in spans:
+            ann_id = f"{self.id_prefix}{start}-{end}"
+            count = ids[ann_id] = ids.get(ann_id, 0) + 1
+            if count > 1:
+                ann_id += f"-{count}"
+            annotations.append(Annotation(ann_id, start, end, text[start:end], note))
+        return annotations
+
+    def annotate_documents(self, documents, processes=1, chunksize=16):
+        """Yield ``(document_id, text, annotations)`` with the suggested
+        annotations of each document, in order.
+
+        Parameters
+        ----------
+        documents : iterable of tuple
+            ``(document_id, text, ...)`` tuples, as yielded by the readers
+            of `dash_annotator.formats`.
+        processes : int, optional
+            Number of worker processes; 1 annotates in this process, None
+            uses every CPU. Each worker receives the compiled annotator
+            once, and a bounded number of documents is in flight, so any
+            number of documents can be streamed through the pool.
+        chunksize : int
+            Documents sent to a worker at a time.
+        """
+        if processes == 1:
+            for document_id, text, *_ in documents:
+                yield document_id, text, self.annotate(text)
+            return
+        self._automaton.compile()
+        self._compiled_patterns()
+        processes = processes or os.cpu_count()
+        with ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            pending = deque()
+            chunk = []
+            for document_id, text, *_ in documents:
+                chunk.append((document_id, text))
+                if len(chunk) == chunksize:
+                    pending.append(executor.submit(_annotate_chunk, chunk))
+                    chunk = []
+                    if len(pending) > 2 * processes:
+                        yield from pending.popleft().result()
+            if chunk:
+                pending.append(executor.submit(_annotate_chunk, chunk))
+            while pending:
+                yield from pending.popleft().result()
+
+
+# The `PreAnnotator` of a worker process.
+_worker = None
+
+
+def _init_worker(annotator):
+    global _worker
+    _worker = annotator
+
+
+def _annotate_chunk(chunk):
+    return [(document_id, text, _worker.annotate(text)) for document_id, text in chunk]
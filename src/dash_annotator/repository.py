@@ -0,0 +1,499 @@
+"""
+Server-side storage of annotated documents.
+
+A repository holds the text and annotations of documents keyed by document
+id. Annotators backed by a repository only exchange small references
+(document id and version) with the browser.
+"""
+
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+
+from dash_annotator.annotation_set import AnnotationSet, _as_record, _diff, _rebase
+from dash_annotator.cache import _ForkLocal
+from dash_annotator.document import AnnotationDocument, _check_edit
+
+__all__ = [
+    "AnnotationRepository",
+    "InMemoryAnnotationRepository",
+    "SQLiteAnnotationRepository",
+]
+
+
+class AnnotationRepository(ABC):
+    """
+    Base class for annotation repositories.
+
+    Every write bumps the document's version, which annotators use to signal
+    changes to their callbacks. Text edits rebase the annotations onto the
+    new text (see `AnnotationSet.apply_edit`). Implementations must be
+    thread-safe.
+    """
+
+    @abstractmethod
+    def exists(self, document_id):
+        """Return whether `document_id` is stored."""
+
+    @abstractmethod
+    def create(self, document_id, text="", annotations=()):
+        """Store a new document and return its version."""
+
+    @abstractmethod
+    def text(self, document_id):
+        """Return the text of `document_id`."""
+
+    @abstractmethod
+    def annotations(self, document_id):
+        """Return a copy of the annotations of `document_id` as an
+        `AnnotationSet`, unaffected by later writes."""
+
+    def get(self, document_id, annotation_id, default=None):
+        """Return a copy of the annotation `annotation_id` of `document_id`,
+        or `default`.
+
+        This default goes through `annotations`, which copies the whole
+        set; implementations override it to read in place.
+        """
+        record = self.annotations(document_id).get(annotation_id)
+        return default if record is None else dict(record)
+
+    def contains(self, document_id, annotation_id):
+        """Return whether `document_id` has the annotation `annotation_id`."""
+        return self.get(document_id, annotation_id) is not None
+
+    def page(self, document_id, offset, limit, sort_by=None):
+        """Return the number of annotations of `document_id` and copies of
+        `limit` of them from `offset` (see `AnnotationSet.page`).
+
+        This default goes through `annotations`, which copies the whole
+        set; implementations override it to read in place.
+        """
+        return _page(self.annotations(document_id), offset, limit, sort_by)
+
+    @abstractmethod
+    def version(self, document_id):
+        """Return the current version of `document_id`."""
+
+    def snapshot(self, document_id):
+        """Return the text, version and annotations of `document_id` as
+        one consistent ``(text, version, annotations)`` tuple.
+
+        Separate calls to `text`, `version` and `annotations` may see
+        different versions while other threads write. This default reads
+        them in turn; implementations override it to read all three under
+        one lock.
+        """
+        return (
+            self.text(document_id),
+            self.version(document_id),
+            self.annotations(document_id),
+        )
+
+    @abstractmethod
+    def set_text(self, document_id, text):
+        """Replace the text of `document_id` and return the new version.
+
+        Annotations are rebased as for the single edit between the common
+        prefix and suffix of the old and new text.
+        """
+
+    @abstractmethod
+    def edit(self, document_id, offset, deleted, inserted):
+        """Replace `deleted` characters at `offset` with the string `inserted`.
+
+        Returns the new version and the ids of the annotations the edit
+        changed or removed; annotations only shifted are not listed.
+        """
+
+    @abstractmethod
+    def add(self, document_id, annotation):
+        """Append an annotation to `document_id` and return the new version."""
+
+    def add_many(self, document_id, annotations):
+        """Append several annotations to `document_id` as one write and
+        return the new version."""
+        version = self.version(document_id)
+        for annotation in annotations:
+            version = self.add(document_id, annotation)
+        return version
+
+    @abstractmethod
+    def remove(self, document_id, annotation_id):
+        """Remove an annotation from `document_id` and return the new version."""
+
+    def ref(self, document_id):
+        """Return the store reference for the current version of a document."""
+        return {"document": document_id, "version": self.version(document_id)}
+
+
+def _page(annotations, offset, limit, sort_by):
+    """Return the size of an `AnnotationSet` and copies of one page of it."""
+    rows = annotations.page(offset, limit, sort_by)
+    return len(annotations), [dict(row) for row in rows]
+
+
+class InMemoryAnnotationRepository(AnnotationRepository):
+    """Repository keeping documents in process memory."""
+
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.RLock()
+
+    def exists(self, document_id):
+        return document_id in self._documents
+
+    def create(self, document_id, text="", annotations=()):
+        with self._lock:
+            if document_id in self._documents:
+                raise KeyError(f"document {document_id!r} already exists")
+            self._documents[document_id] = [AnnotationDocument(text, annotations), 0]
+            return 0
+
+    def _document(self, document_id):
+        try:
+            return self._documents[document_id]
+        except KeyError:
+            raise KeyError(f"unknown document {document_id!r}") from None
+
+    def text(self, document_id):
+        return self._document(document_id)[0].text
+
+    def annotations(self, document_id):
+        with self._lock:
+            return self._document(document_id)[0].annotations.copy()
+
+    def get(self, document_id, annotation_id, default=None):
+        with self._lock:
+            annotations = self._document(document_id)[0].annotations
+            record = annotations.get(annotation_id)
+            return default if record is None else dict(record)
+
+    def contains(self, document_id, annotation_id):
+        with self._lock:
+            return annotation_id in self._document(document_id)[0].annotations
+
+    def page(self, document_id, offset, limit, sort_by=None):
+        with self._lock:
+            annotations = self._document(document_id)[0].annotations
+            return _page(annotations, offset, limit, sort_by)
+
+    def version(self, document_id):
+        return self._document(document_id)[1]
+
+    def snapshot(self, document_id):
+        with self._lock:
+            document, version = self._document(document_id)
+            return document.text, version, document.annotations.copy()
+
+    def set_text(self, document_id, text):
+        with self._lock:
+            edit = _diff(self._document(document_id)[0].text, text)
+            return self.edit(document_id, *edit)[0]
+
+    def edit(self, document_id, offset, deleted, inserted):
+        with self._lock:
+            document = self._document(document_id)
+            _check_edit(document[0].text, offset, deleted)
+            if not deleted and not inserted:
+                return document[1], []
+            changed, removed = document[0].edit(offset, deleted, inserted)
+            document[1] += 1
+            return document[1], changed + removed
+
+    def add(self, document_id, annotation):
+        with self._lock:
+            document = self._document(document_id)
+            document[0].add(annotation)
+            document[1] += 1
+            return document[1]
+
+    def add_many(self, document_id, annotations):
+        with self._lock:
+            document = self._document(document_id)
+            for annotation in annotations:
+                document[0].add(annotation)
+            document[1] += 1
+            return document[1]
+
+    def remove(self, document_id, annotation_id):
+        with self._lock:
+            document = self._document(document_id)
+            document[0].remove(annotation_id)
+            document[1] += 1
+            return document[1]
+
+
+class SQLiteAnnotationRepository(AnnotationRepository):
+    """
+    Repository persisting documents to a SQLite database.
+
+    Parameters
+    ----------
+    path : str
+        Database file, or ``":memory:"``.
+    cache_size : int
+        Number of documents whose `AnnotationSet` is kept in memory between
+        calls. Cached sets are updated in place on writes.
+
+    Notes
+    -----
+    Offsets are stored as absolute positions, so `edit` rewrites the text of
+    the document and shifts the stored offsets of every later annotation in
+    one ``UPDATE``: it costs O(text length + later annotations) in the
+    database. Only the cached `AnnotationSet` is rebased in O(log n + k).
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        id TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        version INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS annotations (
+        document_id TEXT NOT NULL REFERENCES documents (id),
+        id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        start INTEGER NOT NULL,
+        "end" INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        note TEXT NOT NULL,
+        PRIMARY KEY (document_id, id)
+    );
+    CREATE INDEX IF NOT EXISTS annotations_seq ON annotations (document_id, seq);
+    CREATE INDEX IF NOT EXISTS annotations_start ON annotations (document_id, start);
+    """
+
+    def __init__(self, path, cache_size=128):
+        self.path = path
+        self.cache_size = cache_size
+        # Reconnected in forked processes, such as background callback jobs.
+        self._local = _ForkLocal(
+            lambda: (
+                sqlite3.connect(path, check_same_thread=False),
+                threading.RLock(),
+            )
+        )
+        self._connection.executescript(self._SCHEMA)
+        self._cache = {}
+
+    @property
+    def _connection(self):
+        return self._local.get()[0]
+
+    @property
+    def _lock(self):
+        return self._local.get()[1]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def _version(self, document_id):
+        row = self._connection.execute(
+            "SELECT version FROM documents WHERE id = ?", (document_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"unknown document {document_id!r}")
+        return row[0]
+
+    def _bump(self, document_id):
+        self._connection.execute(
+            "UPDATE documents SET version = version + 1 WHERE id = ?",
+            (document_id,),
+        )
+        return self._version(document_id)
+
+    def _insert(self, document_id, records):
+        self._connection.executemany(
+            'INSERT INTO annotations (document_id, id, seq, start, "end", text, note)'
+            " VALUES (?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM annotations"
+            " WHERE document_id = ?), ?, ?, ?, ?)",
+            (
+                (
+                    document_id,
+                    record["id"],
+                    document_id,
+                    record["start"],
+                    record["end"],
+                    record["text"],
+                    record["note"],
+                )
+                for record in records
+            ),
+        )
+
+    def exists(self, document_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM documents WHERE id = ?", (document_id,)
+            ).fetchone()
+            return row is not None
+
+    def create(self, document_id, text="", annotations=()):
+        with self._lock, self._connection:
+            try:
+                self._connection.execute(
+                    "INSERT INTO documents (id, text, version) VALUES (?, ?, 0)",
+                    (document_id, text),
+                )
+            except sqlite3.IntegrityError:
+                raise KeyError(f"document {document_id!r} already exists") from None
+            self._insert(document_id, map(_as_record, annotations))
+            return 0
+
+    def text(self, document_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT text FROM documents WHERE id = ?", (document_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"unknown document {document_id!r}")
+            return row[0]
+
+    def annotations(self, document_id):
+        with self._lock:
+            return self._annotations(document_id).copy()
+
+    def get(self, document_id, annotation_id, default=None):
+        with self._lock:
+            record = self._annotations(document_id).get(annotation_id)
+            return default if record is None else dict(record)
+
+    def contains(self, document_id, annotation_id):
+        with self._lock:
+            return annotation_id in self._annotations(document_id)
+
+    def page(self, document_id, offset, limit, sort_by=None):
+        with self._lock:
+            return _page(self._annotations(document_id), offset, limit, sort_by)
+
+    def _annotations(self, document_id):
+        """Return the cached `AnnotationSet` of `document_id`, which writes
+        update in place."""
+        with self._lock:
+            version = self._version(document_id)
+            cached = self._cache.get(document_id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            rows = self._connection.execute(
+                'SELECT id, start, "end", text, note FROM annotations'
+                " WHERE document_id = ? ORDER BY seq",
+                (document_id,),
+            )
+            annotations = AnnotationSet(
+                {"id": i, "start": s, "end": e, "text": t, "note": n}
+                for i, s, e, t, n in rows
+            )
+            self._cache.pop(document_id, None)
+            self._cache[document_id] = (version, annotations)
+            while len(self._cache) > self.cache_size:
+                self._cache.pop(next(iter(self._cache)))
+            return annotations
+
+    def version(self, document_id):
+        with self._lock:
+            return self._version(document_id)
+
+    def snapshot(self, document_id):
+        with self._lock:
+            return (
+                self.text(document_id),
+                self._version(document_id),
+                self._annotations(document_id).copy(),
+            )
+
+    def set_text(self, document_id, text):
+        with self._lock:
+            edit = _diff(self.text(document_id), text)
+            return self.edit(document_id, *edit)[0]
+
+    def edit(self, document_id, offset, deleted, inserted):
+        with self._lock, self._connection:
+            text = _check_edit(self.text(document_id), offset, deleted)
+            if not deleted and not inserted:
+                return self._version(document_id), []
+            text = text[:offset] + inserted + text[offset + deleted :]
+            self._connection.execute(
+                "UPDATE documents SET text = ? WHERE id = ?", (text, document_id)
+            )
+            edit_end = offset + deleted
+            # Spans starting inside the deleted range or reaching into it.
+            touched = self._connection.execute(
+                'SELECT id, start, "end" FROM annotations WHERE document_id = ?'
+                ' AND start < ? AND ("end" > ? OR start >= ?)',
+                (document_id, edit_end, offset, offset),
+            ).fetchall()
+            shift = len(inserted) - deleted
+            if shift:
+                self._connection.execute(
+                    'UPDATE annotations SET start = start + ?, "end" = "end" + ?'
+                    " WHERE document_id = ? AND start >= ?",
+                    (shift, shift, document_id, edit_end),
+                )
+            for ann_id, start, end in touched:
+                span = _rebase(start, end, offset, deleted, len(inserted))
+                if span is None:
+                    self._connection.execute(
+                        "DELETE FROM annotations WHERE document_id = ? AND id = ?",
+                        (document_id, ann_id),
+                    )
+                else:
+                    self._connection.execute(
+                        'UPDATE annotations SET start = ?, "end" = ?, text = ?'
+                        " WHERE document_id = ? AND id = ?",
+                        (*span, text[span[0] : span[1]], document_id, ann_id),
+                    )
+            version = self._bump(document_id)
+            self._touch(
+                document_id,
+                version,
+                lambda s: s.apply_edit(offset, deleted, len(inserted), text),
+            )
+            return version, [ann_id for ann_id, _, _ in touched]
+
+    def add(self, document_id, annotation):
+        record = _as_record(annotation)
+        with self._lock, self._connection:
+            self._version(document_id)
+            self._insert(document_id, [record])
+            version = self._bump(document_id)
+            self._touch(document_id, version, lambda s: s.insert(record))
+            return version
+
+    def add_many(self, document_id, annotations):
+        records = [_as_record(annotation) for annotation in annotations]
+
+        def insert(annotation_set):
+            for record in records:
+                annotation_set.insert(record)
+
+        with self._lock, self._connection:
+            self._version(document_id)
+            self._insert(document_id, records)
+            version = self._bump(document_id)
+            self._touch(document_id, version, insert)
+            return version
+
+    def remove(self, document_id, annotation_id):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM annotations WHERE document_id = ? AND id = ?",
+                (document_id, annotation_id),
+            )
+            if not cursor.rowcount:
+                raise KeyError(annotation_id)
+            version = self._bump(document_id)
+            self._touch(document_id, version, lambda s: s.remove(annotation_id))
+            return version
+
+    def _touch(self, document_id, version, update=None):
+        """Carry a cached `AnnotationSet` over to `version`."""
+        cached = self._cache.get(document_id)
+        if cached is None or cached[0] != version - 1:
+            self._cache.pop(document_id, None)
+            return
+        if update is not None:
+            update(cached[1])
+        self._cache[document_id] = (version, cached[1])
@@ -0,0 +1,219 @@
+"""
+Indexed search of document texts.
+
+`find_all` finds the occurrences of a literal string or a regular
+expression in a text, for annotating every occurrence at once. Literal
+searches scan the text with `str.find`. A long text that is searched again
+without changes gets a `TextIndex` of its n-grams, cached by content, so
+later searches only verify the positions of the query's rarest n-gram
+instead of scanning the whole text::
+
+    spans = find_all(text, "Ada Lovelace", whole_words=True)
+"""
+
+from array import array
+from collections import defaultdict
+import re
+
+from dash_annotator.cache import _LRUCache, _digest
+from dash_annotator.preannotation import _fold, _is_word
+
+__all__ = [
+    "TextIndex",
+    "find_all",
+]
+
+# Length of the indexed n-grams.
+NGRAM = 3
+
+# Texts shorter than this are always scanned. Building an index costs as much
+# as hundreds of scans, and every edit makes a new text.
+INDEX_MIN_LENGTH = 1_000_000
+
+
+class TextIndex:
+    """
+    N-gram index of a text.
+
+    Maps every substring of `n` characters to the sorted array of its
+    start positions. A literal query is looked up through its n-gram with
+    the fewest positions, and only those positions are checked against the
+    text.
+
+    Parameters
+    ----------
+    text : str
+        Text to index.
+    ignore_case : bool
+        Index the lowercased text, for case-insensitive searches.
+    n : int
+        Length of the indexed n-grams.
+    """
+
+    def __init__(self, text, ignore_case=False, n=NGRAM):
+        self.text = _fold(text) if ignore_case else text
+        self.ignore_case = ignore_case
+        self.n = n
+        self.positions = defaultdict(lambda: array("i"))
+        text = self.text
+        for start in range(len(text) - n + 1):
+            self.positions[text[start : start + n]].append(start)
+        self.positions.default_factory = None
+
+    def _candidates(self, query):
+        """Return the possible start positions of `query`, in order."""
+        n = self.n
+        if len(query) < n:
+            return None
+        best, offset = None, 0
+        for index in range(len(query) - n + 1):
+            positions = self.positions.get(query[index : index + n])
+            if positions is None:
+                return ()
+            if best is None or len(positions) < len(best):
+                best, offset = positions, index
+        return (position - offset for position in best)
+
+    def find(self, query, whole_words=False):
+        """Return the ``(start, end)`` spans of the non-overlapping
+        occurrences of `query`, leftmost first, as `str.find` would find
+        them. With `whole_words`, occurrences starting or ending inside a
+        word are skipped."""
+        if not query:
+            return []
+        text = self.text
+        if self.ignore_case:
+            query = _fold(query)
+        candidates = self._candidates(query)
+        if candidates is None:
+            # Shorter than an n-gram: scan the text.
+            candidates = _occurrences(text, query)
+        return _matches(text, query, candidates, whole_words)
+
+
+def _matches(text, query, candidates, whole_words):
+    """Return the spans of the non-overlapping occurrences of `query` in
+    `text` among the start positions `candidates`, leftmost first."""
+    spans = []
+    last_end = 0
+    length = len(query)
+    for start in candidates:
+        end = start + length
+        if (
+            start < last_end
+            or not text.startswith(query, start)
+            or (whole_words and not _on_word_boundaries(text, start, end))
+        ):
+            continue
+        spans.append((start, end))
+        last_end = end
+    return spans
+
+
+def _occurrences(text, query):
+    """Yield every start position of `query` in `text`, overlapping ones
+    included."""
+    start = text.find(query)
+    while start >= 0:
+        yield start
+        start = text.find(query, start + 1)
+
+
+def _on_word_boundaries(text, start, end):
+    """Return whether ``text[start:end]`` neither starts nor ends inside a
+    word."""
+    return not (
+        start
+        and _is_word(text[start])
+        and _is_word(text[start - 1])
+        or end < len(text)
+        and _is_word(text[end - 1])
+        and _is_word(text[end])
+    )
+
+
+# Indexes of recently searched texts, by digest and case folding, or
+# `_SEARCHED` for texts searched once.
+_indexes = _LRUCache(maxsize=16)
+
+_SEARCHED = object()
+
+
+def _index_for(text, ignore_case):
+    """Return the cached `TextIndex` of `text`, or None if it is to be
+    scanned.
+
+    Only texts of at least `INDEX_MIN_LENGTH` characters are indexed, on
+    their second search: a text that changes between searches is never
+    indexed.
+    """
+    if len(text) < INDEX_MIN_LENGTH:
+        return None
+    key = (_digest(text), ignore_case)
+    index = _indexes.get(key)
+    if index is None:
+        _indexes.put(key, _SEARCHED)
+        return None
+    if index is _SEARCHED:
+        index = TextIndex(text, ignore_case)
+        _indexes.put(key, index)
+    return index
+
+
+def _scan(text, query, ignore_case, whole_words):
+    """`TextIndex.find` without an index."""
+    if not query:
+        return []
+    if ignore_case:
+        text, query = _fold(text), _fold(query)
+    return _matches(text, query, _occurrences(text, query), whole_words)
+
+
+def find_all(text, query, regex=False, ignore_case=False, whole_words=False):
+    """Return the ``(start, end)`` spans of the non-overlapping matches of
+    `query` in `text`, by start.
+
+    Parameters
+    ----------
+    text : str
+        Text to search.
+    query : str
+        String to find, or a regular expression with `regex`.
+    regex : bool
+        Take `query` as a regular expression. Expressions are matched by
+        scanning the text; empty matches are skipped.
+    ignore_case : bool
+        Match regardless of case.
+    whole_words : bool
+        Skip matches starting or ending inside a word.
+
+    Raises
+    ------
+    re.error
+        If `regex` is set and `query` is not a valid expression.
+    """
+    if not regex:
+        index = _index_for(text, ignore_case)
+        if index is None:
+            return _scan(text, query, ignore_case, whole_words)
+        return index.find(query, whole_words)
+    flags = re.IGNORECASE if ignore_case else 0
+    return [
+        match.span()
+        for match in re.finditer(query, text, flags)
+        if match.end() > match.start()
+        and not (whole_words and not _on_word_boundaries(text, *match.span()))
+    ]
+
+
+def _unannotated(annotations, spans):
+    """Return the spans that no annotation of the `AnnotationSet`
+    `annotations` covers exactly."""
+    return [
+        (start, end)
+        for start, end in spans
+        if not any(
+            ann["start"] == start and ann["end"] == end
+            for ann in annotations.overlapping(start, end)
+        )
+    ]
@@ -0,0 +1,147 @@
+"""
+Treap of annotation spans.
+
+Nodes are keyed by ``(start, end, id)`` and augmented with the largest end
+in their subtree, which makes the treap an interval tree. Whole subtrees are
+shifted lazily, so moving every span after a text edit costs O(log n).
+"""
+
+import random
+
+
+class _Node:
+    """Treap node keyed by ``(start, end, id)`` and augmented with the
+    largest end in its subtree.
+
+    `shift` is an offset still to be added to both subtrees; it is pushed
+    down before a node's children are looked at.
+    """
+
+    __slots__ = ("key", "priority", "left", "right", "max_end", "shift")
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = key[1]
+        self.shift = 0
+
+    def update(self):
+        max_end = self.key[1]
+        if self.left is not None and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+    def push(self):
+        if self.shift:
+            _shift(self.left, self.shift)
+            _shift(self.right, self.shift)
+            self.shift = 0
+
+
+def _shift(node, delta):
+    """Move every interval of a treap by `delta` in O(1)."""
+    if node is not None:
+        node.key = (node.key[0] + delta, node.key[1] + delta, node.key[2])
+        node.max_end += delta
+        node.shift += delta
+
+
+def _split(node, key):
+    """Split a treap into keys ``< key`` and keys ``>= key``."""
+    if node is None:
+        return None, None
+    node.push()
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        node.update()
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    node.update()
+    return left, node
+
+
+def _merge(left, right):
+    """Merge two treaps where every key in `left` precedes `right`."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.push()
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.push()
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _build(keys):
+    """Build a treap from sorted keys in linear time."""
+    stack = []
+    for key in keys:
+        node = _Node(key)
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+            last.update()
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    root = stack[0] if stack else None
+    while stack:
+        stack.pop().update()
+    return root
+
+
+def _delete(node, key):
+    """Remove `key` from a treap and return the new root."""
+    node.push()
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    else:
+        node.right = _delete(node.right, key)
+    node.update()
+    return node
+
+
+def _walk(node):
+    """Yield the keys of a treap in order."""
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            node.push()
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node.key
+        node = node.right
+
+
+def _overlapping(node, start, end):
+    """Yield the keys of a treap intersecting ``[start, end)``, in order."""
+    stack = []
+    while stack or node is not None:
+        # Descend left while the subtree can still reach past `start`.
+        while node is not None and node.max_end > start:
+            node.push()
+            stack.append(node)
+            node = node.left
+        if not stack:
+            return
+        node = stack.pop()
+        if node.key[0] >= end:
+            return
+        if node.key[1] > start:
+            yield node.key
+        node = node.right
@@ -0,0 +1,122 @@
+"""Call an app's server callbacks by output, as the browser would."""
+
+import json
+
+
+class DashClient:
+    """
+    Build and send ``/_dash-update-component`` requests for the callbacks of
+    one annotator, through the Flask test client of `app`.
+    """
+
+    def __init__(self, app, annotator_id):
+        self.annotator_id = annotator_id
+        self.client = app.server.test_client()
+        assert self.client.get("/").status_code == 200
+        self.dependencies = json.loads(
+            self.client.get("/_dash-dependencies").get_data()
+        )
+
+    def _id(self, spec, **wildcards):
+        values = {"id": self.annotator_id, **wildcards}
+        return {
+            key: values[key] if value in (["MATCH"], ["ALL"]) else value
+            for key, value in json.loads(spec).items()
+        }
+
+    def _find(self, subcomponent, prop, renderer=None, trigger=None):
+        for dependency in self.dependencies:
+            if dependency.get("clientside_function"):
+                continue
+            if trigger is not None and not any(
+                json.loads(spec["id"])["subcomponent"] == trigger[0]["subcomponent"]
+                and spec["property"] == trigger[1]
+                for spec in dependency["inputs"]
+            ):
+                continue
+            for output in dependency["output"].strip(".").split("..."):
+                output_id, output_prop = output.split("@")[0].rsplit(".", 1)
+                output_id = json.loads(output_id)
+                if (
+                    output_id.get("subcomponent") == subcomponent
+                    and output_prop == prop
+                    and output_id.get("renderer", renderer) == renderer
+                ):
+                    return dependency
+        raise KeyError(f"no server callback outputs {subcomponent}.{prop}")
+
+    def request(self, subcomponent, prop, values, trigger=None, renderer=None):
+        """Return the request body of the callback writing
+        ``subcomponent.prop``, triggered by `trigger` if given. `values`
+        maps ``(subcomponent, prop)`` to input and state values; wildcard
+        inputs take a list of ``(wildcards, value)`` pairs. `trigger` is
+        ``(id fields, prop)``."""
+        dependency = self._find(subcomponent, prop, renderer, trigger)
+
+        def fill(spec):
+            key = (json.loads(spec["id"])["subcomponent"], spec["property"])
+            if ["ALL"] in json.loads(spec["id"]).values():
+                return [
+                    {
+                        "id": self._id(spec["id"], **wildcards),
+                        "property": spec["property"],
+                        "value": value,
+                    }
+                    for wildcards, value in values.get(key, [])
+                ]
+            return {
+                "id": self._id(spec["id"]),
+                "property": spec["property"],
+                "value": values.get(key),
+            }
+
+        outputs = [
+            dict(zip(("id", "property"), output.split("@")[0].rsplit(".", 1)))
+            for output in dependency["output"].strip(".").split("...")
+        ]
+        outputs = [
+            {"id": self._id(output["id"]), "property": output["property"]}
+            for output in outputs
+        ]
+        changed = []
+        if trigger is not None:
+            trigger_id, trigger_prop = trigger
+            changed.append(
+                json.dumps(
+                    {
+                        "component": "TextAnnotator",
+                        "id": self.annotator_id,
+                        **trigger_id,
+                    },
+                    separators=(",", ":"),
+                    sort_keys=True,
+                )
+                + "."
+                + trigger_prop
+            )
+        return {
+            "output": dependency["output"],
+            "outputs": (
+                outputs if dependency["output"].startswith("..") else outputs[0]
+            ),
+            "inputs": [fill(spec) for spec in dependency["inputs"]],
+            "state": [fill(spec) for spec in dependency["state"]],
+            "changedPropIds": changed,
+        }
+
+    def post(self, body):
+        """Send a request body; return the response, or None when the
+        callback sent no update."""
+        response = self.client.post("/_dash-update-component", json=body)
+        if response.status_code == 204:
+            return None
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()
+
+    def call(self, subcomponent, prop, values, trigger=None, renderer=None):
+        """Call the callback writing ``subcomponent.prop``; return its
+        response, keyed by output, or None when it sent no update."""
+        response = self.post(
+            self.request(subcomponent, prop, values, trigger, renderer)
+        )
+        return None if response is None else response["response"]
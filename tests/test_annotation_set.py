@@ -0,0 +1,204 @@
+"""AnnotationSet, its store index and the edit helpers."""
+
+import random
+
+import pytest
+
+from dash_annotator.annotation_set import (
+    AnnotationColumns,
+    AnnotationSet,
+    _AnnotationIndex,
+    _diff,
+    _rebase,
+)
+
+
+def _random_records(rng, count, length=50):
+    records = []
+    for i in range(count):
+        start = rng.randint(0, length)
+        end = rng.randint(start, min(length, start + 10))
+        records.append(
+            {"id": f"a{i}", "start": start, "end": end, "text": "", "note": ""}
+        )
+    return records
+
+
+def test_index_matches_list():
+    rng = random.Random(0)
+    ids = [f"a{i}" for i in range(20)]
+    index = _AnnotationIndex(ids)
+    model = list(ids)
+    for step in range(500):
+        if model and rng.random() < 0.5:
+            ann_id = rng.choice(model)
+            assert index.pop(ann_id) == model.index(ann_id)
+            model.remove(ann_id)
+        else:
+            ann_id = f"b{step}"
+            assert index.append(ann_id) == len(model)
+            model.append(ann_id)
+        assert len(index) == len(model)
+        for ann_id in rng.sample(model, min(3, len(model))):
+            assert index.index(ann_id) == model.index(ann_id)
+    assert index.index("missing") is None
+    assert index.pop("missing") is None
+
+
+@pytest.mark.parametrize(
+    "span, edit, expected",
+    [
+        ((5, 10), (0, 0, 3), (8, 13)),  # insert before
+        ((5, 10), (12, 0, 3), (5, 10)),  # insert after
+        ((5, 10), (5, 0, 3), (8, 13)),  # insert at the start edge
+        ((5, 10), (10, 0, 3), (5, 10)),  # insert at the end edge
+        ((5, 10), (7, 0, 3), (5, 13)),  # insert inside
+        ((5, 10), (3, 4, 0), (3, 6)),  # delete across the start
+        ((5, 10), (8, 4, 0), (5, 8)),  # delete across the end
+        ((5, 10), (6, 2, 5), (5, 13)),  # replace inside
+        ((5, 10), (4, 8, 1), None),  # delete the whole span
+        ((5, 5), (0, 0, 2), (7, 7)),  # empty spans move but survive
+    ],
+)
+def test_rebase(span, edit, expected):
+    assert _rebase(*span, *edit) == expected
+
+
+def test_diff():
+    rng = random.Random(1)
+    for _ in range(300):
+        old = "".join(rng.choice("ab") for _ in range(rng.randint(0, 12)))
+        new = "".join(rng.choice("ab") for _ in range(rng.randint(0, 12)))
+        offset, deleted, inserted = _diff(old, new)
+        assert old[:offset] + inserted + old[offset + deleted :] == new
+        # The edit lies between the longest common prefix and suffix.
+        assert old[:offset] == new[:offset]
+        assert offset == len(old) or offset == len(new) or old[offset] != new[offset]
+
+
+def test_queries_match_brute_force():
+    rng = random.Random(2)
+    records = _random_records(rng, 80)
+    annotations = AnnotationSet(records)
+    by_key = sorted(records, key=lambda r: (r["start"], r["end"], r["id"]))
+    assert list(annotations.by_position()) == by_key
+    for _ in range(50):
+        start = rng.randint(0, 50)
+        end = start + rng.randint(1, 10)
+        assert annotations.overlapping(start, end) == [
+            r for r in by_key if r["start"] < end and r["end"] > start
+        ]
+    assert annotations.at(7) == [r for r in by_key if r["start"] <= 7 < r["end"]]
+
+
+def test_boundaries_are_sorted():
+    rng = random.Random(3)
+    annotations = AnnotationSet(_random_records(rng, 60))
+    boundaries = list(annotations.boundaries())
+    assert len(boundaries) == 2 * len(annotations)
+    positions = [pos for pos, _, _ in boundaries]
+    assert positions == sorted(positions)
+    # Ends come before starts at the same position, except the end of an
+    # empty span, which comes right after its start.
+    for (pos, is_start, ann_id), (next_pos, next_start, next_id) in zip(
+        boundaries, boundaries[1:]
+    ):
+        empty = annotations.get(ann_id)["start"] == annotations.get(ann_id)["end"]
+        if is_start and empty:
+            assert (next_pos, next_start, next_id) == (pos, False, ann_id)
+        elif is_start and next_pos == pos:
+            assert next_start
+    open_ids = set()
+    for _, is_start, ann_id in boundaries:
+        if is_start:
+            open_ids.add(ann_id)
+        else:
+            open_ids.remove(ann_id)
+    assert not open_ids
+
+
+def test_insert_and_remove_keep_store_order():
+    annotations = AnnotationSet(_random_records(random.Random(4), 5))
+    assert annotations.insert({"id": "x", "start": 0, "end": 1}) == 5
+    assert annotations.remove("a1")["id"] == "a1"
+    assert annotations.ids() == ["a0", "a2", "a3", "a4", "x"]
+    assert annotations.index("x") == 4
+    with pytest.raises(KeyError):
+        annotations.insert({"id": "a0", "start": 0, "end": 1})
+
+
+def test_apply_edit_matches_rebase():
+    rng = random.Random(5)
+    for _ in range(100):
+        text = "".join(rng.choice("abc ") for _ in range(50))
+        records = _random_records(rng, 20)
+        annotations = AnnotationSet(records)
+        offset = rng.randint(0, 50)
+        deleted = rng.randint(0, min(8, 50 - offset))
+        inserted = "".join(rng.choice("xyz") for _ in range(rng.randint(0, 8)))
+        edited = text[:offset] + inserted + text[offset + deleted :]
+        changed, removed = annotations.apply_edit(
+            offset, deleted, len(inserted), edited
+        )
+        expected = {}
+        for record in records:
+            span = _rebase(
+                record["start"], record["end"], offset, deleted, len(inserted)
+            )
+            if span is None:
+                assert record["id"] in removed
+            else:
+                expected[record["id"]] = span
+        assert {
+            r["id"]: (r["start"], r["end"]) for r in annotations.to_records()
+        } == expected
+        assert annotations.ids() == list(expected)
+        for ann_id in changed:
+            record = annotations.get(ann_id)
+            assert record["text"] == edited[record["start"] : record["end"]]
+        assert [(r["start"], r["end"]) for r in annotations.by_position()] == sorted(
+            expected.values()
+        )
+
+
+def test_fingerprint_follows_writes():
+    annotations = AnnotationSet(_random_records(random.Random(6), 20))
+    fingerprint = annotations.fingerprint()
+    annotations.insert({"id": "x", "start": 3, "end": 7})
+    assert annotations.fingerprint() != fingerprint
+    annotations.remove("x")
+    assert annotations.fingerprint() == fingerprint
+    annotations.remove("a3")
+    annotations.apply_edit(10, 2, 5)
+    assert annotations.fingerprint() == AnnotationSet(list(annotations)).fingerprint()
+    assert annotations.fingerprint()[0] == 19
+
+
+def test_page():
+    records = _random_records(random.Random(7), 30)
+    annotations = AnnotationSet(records)
+    assert annotations.page(10, 5) == records[10:15]
+    by_start = sorted(records, key=lambda r: (r["start"], r["end"], r["id"]))
+    assert annotations.page(25, 10, "start") == by_start[25:]
+    by_end = sorted(records, key=lambda r: r["end"])
+    assert annotations.page(0, 3, "end") == by_end[:3]
+
+
+def test_copy_is_independent():
+    annotations = AnnotationSet([{"id": "a", "start": 2, "end": 4}])
+    copy = annotations.copy()
+    annotations.apply_edit(0, 0, 3)
+    annotations.insert({"id": "b", "start": 0, "end": 1})
+    assert copy.to_records() == [{"id": "a", "start": 2, "end": 4}]
+
+
+def test_columns_packed_round_trip():
+    text = "Ada met Grace in London"
+    records = [
+        {"id": "p1", "start": 0, "end": 3, "text": "Ada", "note": "person"},
+        {"id": "p2", "start": 8, "end": 13, "text": "Grace", "note": "person"},
+        {"id": "l1", "start": 17, "end": 23, "text": "London", "note": ""},
+    ]
+    columns = AnnotationColumns(records, text=text)
+    assert AnnotationColumns.from_packed(columns.to_packed()).to_records() == records
+    assert AnnotationColumns.from_records(records).to_records() == records
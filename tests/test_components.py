@@ -0,0 +1,324 @@
+"""Server callbacks of the components, called through a Dash app."""
+
+from collections import Counter
+import io
+import json
+import os
+import time
+import zipfile
+
+import dash
+from dash import html
+import pytest
+
+from dash_annotator import (
+    AnnotateButton,
+    AnnotationCorpus,
+    AnnotationList,
+    AnnotationSet,
+    CorpusNavigator,
+    DocumentSource,
+    ExportButton,
+    FindAndAnnotate,
+    InMemoryAnnotationRepository,
+    PreAnnotateButton,
+    PreAnnotator,
+    TextAnnotator,
+)
+from dash_annotator.cache import _digest
+from dash_annotator.components import jobs
+from dash_annotator.components.state import _registry
+from dash_annotator.metrics import instrument
+
+from .dash_client import DashClient
+
+
+def _record(ann_id, start):
+    return {"id": ann_id, "start": start, "end": start + 1, "text": "x", "note": ""}
+
+
+A, B, C = _record("A", 0), _record("B", 2), _record("C", 4)
+
+
+class _Source(DocumentSource):
+    def ids(self):
+        return ["d0", "d1"]
+
+    def load(self, document_id):
+        return f"text {document_id}", []
+
+
+@pytest.fixture(scope="module")
+def app():
+    # Component callbacks are registered globally and handed to the first
+    # app that serves a request, so the tests share one app.
+    app = dash.Dash(__name__)
+    app.layout = html.Div(
+        [
+            TextAnnotator(id="a", value="x x x", annotations=[A, B, C]),
+            AnnotateButton("a"),
+            AnnotationList("a", page_size=1),
+            FindAndAnnotate("a"),
+            PreAnnotateButton("a", PreAnnotator(["x"])),
+            ExportButton("a"),
+            TextAnnotator(id="c", repository=AnnotationCorpus(_Source(), prefetch=0)),
+            CorpusNavigator("c"),
+        ]
+    )
+    app.metrics = instrument(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return DashClient(app, "a")
+
+
+def test_no_output_is_written_by_two_callbacks(app):
+    client = app.server.test_client()
+    assert client.get("/").status_code == 200
+    outputs = Counter()
+    for dependency in json.loads(client.get("/_dash-dependencies").get_data()):
+        for output in dependency["output"].strip(".").split("..."):
+            # Outputs marked "@<hash>" are declared with allow_duplicate;
+            # callbacks without outputs have a bare hash instead.
+            if "." in output and "@" not in output.rsplit(".", 1)[1]:
+                outputs[output] += 1
+    assert [output for output, count in outputs.items() if count > 1] == []
+
+
+def test_callbacks_form_no_cycle(app):
+    client = app.server.test_client()
+    graph = {}
+    for dependency in json.loads(client.get("/_dash-dependencies").get_data()):
+        outputs = [
+            output.split("@")[0]
+            for output in dependency["output"].strip(".").split("...")
+        ]
+        for spec in dependency["inputs"]:
+            graph.setdefault(f"{spec['id']}.{spec['property']}", set()).update(outputs)
+
+    def reaches(start, target, seen):
+        for node in graph.get(start, ()):
+            if node == target:
+                return True
+            if node not in seen:
+                seen.add(node)
+                if reaches(node, target, seen):
+                    return True
+        return False
+
+    assert [prop for prop in graph if reaches(prop, prop, set())] == []
+
+
+def _values(store):
+    return {
+        ("text-store", "data"): "x x x",
+        ("session-store", "data"): "s",
+        ("document-store", "data"): None,
+        ("annotations-store", "data"): store,
+        ("annotations-fingerprint", "data"): AnnotationSet(store).fingerprint(),
+        ("selection-store", "data"): None,
+    }
+
+
+def test_add_appends_to_the_store(client):
+    _registry._sets.pop(("a", "s"), None)
+    values = _values([A, B, C])
+    values[("selection-store", "data")] = {"start": 2, "end": 3}
+    trigger = ({"subcomponent": "add-button"}, "n_clicks")
+    response = client.call("annotations-store", "data", values, trigger=trigger)
+    patch = next(iter(response.values()))["data"]
+    assert [op["operation"] for op in patch["operations"]] == ["Append"]
+    assert len(_registry.get("a", "s")) == 4
+
+
+def _resync(client, subcomponent, values, trigger):
+    """Call the callback writing ``subcomponent.data`` or ``.children``,
+    which finds the session out of date, run the resync it asks for and
+    return the response of its replay."""
+    prop = "children" if subcomponent == "annotations-page" else "data"
+    response = client.post(client.request(subcomponent, prop, values, trigger))
+    (action,) = response["sideUpdate"].values()
+    values = dict(values)
+    values[("annotations-resync", "data")] = action["data"]
+    trigger = ({"subcomponent": "annotations-resync"}, "data")
+    response = client.call("annotations-synced", "data", values, trigger=trigger)
+    values[("annotations-synced", "data")] = next(iter(response.values()))["data"]
+    trigger = ({"subcomponent": "annotations-synced"}, "data")
+    return client.call(subcomponent, prop, values, trigger=trigger)
+
+
+def test_remove_resyncs_a_stale_session(client):
+    # The server copy of the session still holds A, which the browser
+    # already removed: it asks for the store, then deletes C at index 1 of
+    # the browser's list, not 2.
+    _registry._sets.pop(("a", "s"), None)
+    _registry.get("a", "s")
+    values = _values([B, C])
+    values[("remove-annotation", "n_clicks")] = [({"ann_id": "C"}, 1)]
+    trigger = ({"subcomponent": "remove-annotation", "ann_id": "C"}, "n_clicks")
+    response = _resync(client, "annotations-store", values, trigger)
+    patch = next(iter(response.values()))["data"]
+    assert patch["__dash_patch_update"] == "__dash_patch_update"
+    assert patch["operations"] == [
+        {"operation": "Delete", "location": [1], "params": {}}
+    ]
+    assert _registry.get("a", "s").ids() == ["B"]
+
+
+def test_list_shows_the_store_after_eviction(client):
+    _registry._sets.clear()
+    values = _values([B])
+    values[("list-cursor", "data")] = {"offset": 0, "page_size": 1, "sort_by": None}
+    trigger = ({"subcomponent": "list-cursor"}, "data")
+    page = json.dumps(_resync(client, "annotations-page", values, trigger))
+    assert "1-1 of 1" in page
+    assert page.count('"ann_id"') == 1
+    # The session is in step now: the next page is read without a resync.
+    values[("list-cursor", "data")]["offset"] = 5
+    page = json.dumps(client.call("annotations-page", "children", values, trigger))
+    assert "1-1 of 1" in page
+
+
+def test_cursor_counts_the_store(client):
+    values = _values([A, B, C])
+    values[("list-next", "n_clicks")] = 1
+    values[("list-cursor", "data")] = {"offset": 1, "page_size": 1, "sort_by": None}
+    trigger = ({"subcomponent": "list-next"}, "n_clicks")
+    response = client.call("list-cursor", "data", values, trigger)
+    assert next(iter(response.values()))["data"]["offset"] == 2
+    values[("list-cursor", "data")]["offset"] = 2
+    assert not client.call("list-cursor", "data", values, trigger)
+
+
+def test_find_annotates_unannotated_matches(client):
+    _registry.put("a", "s", AnnotationSet([A, C]))
+    values = _values([A, C])
+    values[("find-query", "value")] = "x"
+    values[("find-button", "n_clicks")] = 1
+    trigger = ({"subcomponent": "find-button"}, "n_clicks")
+    response = client.call("find-status", "children", values, trigger)
+    store, status = (next(iter(output.values())) for output in response.values())
+    assert [op["operation"] for op in store["operations"]] == ["Extend"]
+    assert status == "1 annotation added"
+    assert sorted(ann["start"] for ann in _registry.get("a", "s")) == [0, 2, 4]
+    values[("find-query", "value")] = "("
+    values[("find-options", "value")] = ["regex"]
+    response = client.call("find-status", "children", values, trigger)
+    assert "Invalid pattern" in json.dumps(response)
+
+
+def test_metrics_record_component_callbacks(app, client):
+    values = _values([A, B, C])
+    values[("list-cursor", "data")] = {"offset": 0, "page_size": 1, "sort_by": None}
+    before = app.metrics.exposition()
+    client.call("annotations-page", "children", values)
+    exposition = client.client.get("/metrics").get_data(as_text=True)
+    assert exposition == app.metrics.exposition() != before
+    count = (
+        "dash_annotator_callback_duration_seconds_count"
+        '{callback="update_annotations_page",annotator="a"}'
+    )
+    assert count in exposition
+
+
+def test_navigator_needs_a_corpus():
+    with pytest.raises(ValueError, match="AnnotationCorpus"):
+        CorpusNavigator("a")
+    TextAnnotator(id="r", repository=InMemoryAnnotationRepository())
+    with pytest.raises(ValueError, match="AnnotationCorpus"):
+        CorpusNavigator("r")
+
+
+def test_navigator_moves_through_the_corpus(app):
+    client = DashClient(app, "c")
+    values = {
+        ("document-store", "data"): "d0",
+        ("text-shadow-store", "data"): {"text": "text d0"},
+        ("corpus-next", "n_clicks"): 1,
+    }
+    trigger = ({"subcomponent": "corpus-next"}, "n_clicks")
+    response = client.call("document-store", "data", values, trigger)
+    outputs = {
+        json.loads(key)["subcomponent"]: value for key, value in response.items()
+    }
+    assert outputs["document-store"]["data"] == "d1"
+    assert outputs["textarea"]["value"] == "text d1"
+    assert outputs["text-shadow-store"]["data"] == {"text": "text d1"}
+    values[("document-store", "data")] = "d1"
+    assert not client.call("document-store", "data", values, trigger)
+    values = {("document-store", "data"): "d1"}
+    response = client.call("corpus-position", "children", values)
+    assert next(iter(response.values()))["children"] == "2 of 2"
+
+
+def test_pre_annotations_skip_annotated_ids(client):
+    _registry.put("a", "s", AnnotationSet([A, B, C]))
+    values = _values([A, B, C])
+    values[("job-result", "data")] = {
+        "document": None,
+        "digest": _digest("x x x").hex(),
+        "annotations": [A, _record("P", 0)],
+    }
+    trigger = ({"subcomponent": "job-result", "job": "pre-annotate"}, "data")
+    response = client.call("annotations-store", "data", values, trigger)
+    patch = next(iter(response.values()))["data"]
+    (operation,) = patch["operations"]
+    assert operation["operation"] == "Extend"
+    assert _registry.get("a", "s").ids() == ["A", "B", "C", "P"]
+    # Suggestions for another text are dropped.
+    values[("job-result", "data")]["digest"] = _digest("y").hex()
+    assert not client.call("annotations-store", "data", values, trigger)
+
+
+def test_export_options_hold_the_format():
+    button = ExportButton("e", "bio")
+    options = [
+        child for child in button.children if child.id["subcomponent"] == "job-options"
+    ]
+    assert [store.data for store in options] == [{"format": "bio"}]
+    with pytest.raises(ValueError, match="format"):
+        ExportButton("e", "csv")
+
+
+@pytest.fixture
+def exports(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "_EXPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _download(app, result):
+    client = app.server.test_client()
+    return client.get(f"/_dash-annotator-export/{result['token']}/{result['filename']}")
+
+
+def test_exports_are_streamed_once(app, exports):
+    documents = [("d", "x x x", [A, C])]
+    result = jobs._export("a", "jsonl", documents)
+    response = _download(app, result)
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == "attachment; filename=a.jsonl"
+    assert json.loads(response.get_data())["annotations"][1]["id"] == "C"
+    response.close()
+    assert not os.listdir(exports)
+    assert _download(app, result).status_code == 404
+    assert _download(app, dict(result, token="..")).status_code == 404
+
+
+def test_brat_exports_are_zipped(app, exports):
+    done = []
+    documents = [("d", "x x x", [A]), ("sub/e", "x", [])]
+    result = jobs._export("a", "brat", documents, done.append)
+    assert done == [1, 2] and result["filename"] == "a.zip"
+    with _download(app, result) as response:
+        archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert sorted(archive.namelist()) == ["d.ann", "d.txt", "sub/e.ann", "sub/e.txt"]
+
+
+def test_stale_exports_are_swept(exports):
+    jobs._export("a", "bio", [("d", "x x x", [A])])
+    jobs._sweep_exports()
+    assert len(os.listdir(exports)) == 1
+    jobs._sweep_exports(time.time() + jobs._EXPORT_TTL + 1)
+    assert not os.listdir(exports)
@@ -0,0 +1,91 @@
+"""Round trips through the import and export formats."""
+
+import io
+
+import pytest
+
+from dash_annotator import Annotation
+from dash_annotator.formats import (
+    _document_path,
+    read_bio,
+    read_brat,
+    read_brat_corpus,
+    read_jsonl,
+    write_bio,
+    write_brat,
+    write_brat_corpus,
+    write_jsonl,
+)
+
+TEXT = "Ada Lovelace met Charles Babbage\nin London 😀 ."
+ANNOTATIONS = [
+    Annotation("T1", 0, 12, "Ada Lovelace", "person"),
+    Annotation("T2", 17, 32, "Charles Babbage", "person"),
+    Annotation("T3", 36, 42, "London", "place"),
+]
+
+
+def test_jsonl_round_trip(tmp_path):
+    documents = [("d1", TEXT, ANNOTATIONS), ("d2", "", [])]
+    assert write_jsonl(documents, tmp_path / "corpus.jsonl") == 2
+    assert list(read_jsonl(tmp_path / "corpus.jsonl")) == documents
+
+
+def test_jsonl_fills_in_missing_fields():
+    line = '{"text": "abc", "annotations": [{"id": 1, "start": 1, "end": 3}]}\n'
+    assert list(read_jsonl(io.StringIO(line))) == [
+        ("0", "abc", [Annotation("1", 1, 3, "bc", "")])
+    ]
+
+
+def test_brat_round_trip():
+    file = io.StringIO()
+    assert write_brat(ANNOTATIONS, file, TEXT) == 3
+    assert list(read_brat(io.StringIO(file.getvalue()), TEXT)) == ANNOTATIONS
+    assert list(read_brat(io.StringIO(file.getvalue()))) == ANNOTATIONS
+
+
+def test_brat_discontinuous_annotations():
+    ann = "T1\tplace 0 3;8 14\tNew London\nR1\tnear Arg1:T1 Arg2:T1\n"
+    assert list(read_brat(io.StringIO(ann))) == [
+        Annotation("T1", 0, 3, "New", "place"),
+        Annotation("T1-1", 8, 14, "London", "place"),
+    ]
+
+
+def test_brat_corpus_round_trip(tmp_path):
+    documents = [("a", TEXT, ANNOTATIONS), ("sub/b", "no annotations", [])]
+    assert write_brat_corpus(documents, tmp_path) == 2
+    assert (tmp_path / "sub" / "b.txt").exists()
+    assert list(read_brat_corpus(tmp_path)) == documents
+
+
+@pytest.mark.parametrize(
+    "document_id",
+    ["../escape", "/absolute", "a//b", "a/./b", "a\\b", "C:name", "nul\0", ""],
+)
+def test_unsafe_document_ids_are_rejected(tmp_path, document_id):
+    with pytest.raises(ValueError):
+        _document_path(document_id)
+    with pytest.raises(ValueError):
+        write_brat_corpus([(document_id, "text", [])], tmp_path / "corpus")
+    assert not any(tmp_path.rglob("*.txt"))
+
+
+def test_bio_round_trip():
+    file = io.StringIO()
+    assert write_bio([("d1", TEXT, ANNOTATIONS), ("d2", "", [])], file) == 2
+    assert file.getvalue().startswith(
+        "-DOCSTART- d1\n\nAda B-person\nLovelace I-person\nmet O\n"
+    )
+    assert list(read_bio(io.StringIO(file.getvalue()))) == [
+        ("d1", TEXT, ANNOTATIONS),
+        ("d2", "", []),
+    ]
+
+
+def test_bio_leaves_out_overlapping_annotations():
+    annotations = ANNOTATIONS + [Annotation("X", 4, 16, "Lovelace met", "name")]
+    file = io.StringIO()
+    write_bio([("d1", TEXT, annotations)], file)
+    assert list(read_bio(io.StringIO(file.getvalue())))[0][2] == ANNOTATIONS
@@ -0,0 +1,50 @@
+"""Callback metrics and their Prometheus exposition."""
+
+import pytest
+
+from dash_annotator.metrics import CallbackMetrics, _annotator_id
+
+
+def _samples(exposition):
+    return dict(
+        line.rsplit(" ", 1)
+        for line in exposition.splitlines()
+        if not line.startswith("#")
+    )
+
+
+def test_histograms_are_cumulative():
+    metrics = CallbackMetrics()
+    metrics.observe("render", "doc", 0.004, 100, 300)
+    metrics.observe("render", "doc", 0.02, 1000, 5000)
+    samples = _samples(metrics.exposition())
+    name = "dash_annotator_callback_duration_seconds"
+    labels = 'callback="render",annotator="doc"'
+    assert samples[f'{name}_bucket{{{labels},le="0.005"}}'] == "1"
+    assert samples[f'{name}_bucket{{{labels},le="0.01"}}'] == "1"
+    assert samples[f'{name}_bucket{{{labels},le="0.025"}}'] == "2"
+    assert samples[f'{name}_bucket{{{labels},le="+Inf"}}'] == "2"
+    assert samples[f"{name}_count{{{labels}}}"] == "2"
+    assert float(samples[f"{name}_sum{{{labels}}}"]) == pytest.approx(0.024)
+    name = "dash_annotator_callback_request_bytes"
+    assert samples[f'{name}_bucket{{{labels},le="256"}}'] == "1"
+    assert samples[f"{name}_sum{{{labels}}}"] == "1100"
+
+
+def test_series_are_labeled_and_escaped():
+    metrics = CallbackMetrics()
+    metrics.observe("add", 'say "hi"\n', 0.1, 1, 1)
+    metrics.observe("add", "b", 0.1, 1, 1)
+    exposition = metrics.exposition()
+    assert exposition.count("# TYPE") == 3
+    assert 'annotator="say \\"hi\\"\\n"' in exposition
+    assert 'callback="add",annotator="b"' in exposition
+
+
+def test_annotator_id_of_outputs():
+    annotator = {"component": "TextAnnotator", "subcomponent": "x", "id": "doc"}
+    other = {"component": "Other", "id": "doc"}
+    assert _annotator_id({"id": annotator, "property": "data"}) == "doc"
+    assert _annotator_id([{"id": "plain"}, {"id": annotator}]) == "doc"
+    assert _annotator_id([[{"id": annotator}], {"id": other}]) == "doc"
+    assert _annotator_id([[], {"id": other}]) == ""
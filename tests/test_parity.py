@@ -0,0 +1,213 @@
+"""Parity of the browser-side renderers and rebase with their Python
+counterparts, run in Node.js."""
+
+import json
+from pathlib import Path
+import random
+import shutil
+import subprocess
+
+import dash._callback
+import pytest
+
+import dash_annotator
+from dash_annotator import AnnotationColumns, AnnotationSet
+from dash_annotator.document import _window_segments
+
+# Clientside callbacks are registered globally on import and handed to the
+# first app that serves a request, so take them before any test does.
+_CALLBACKS = list(dash._callback.GLOBAL_CALLBACK_LIST)
+_SCRIPTS = list(dash._callback.GLOBAL_INLINE_SCRIPTS)
+
+_BUNDLE = Path(dash_annotator.__file__).with_name("dash_annotator.js")
+
+# Stand-ins for the browser globals the scripts use.
+_PRELUDE = """
+globalThis.window = globalThis;
+window.dash_clientside = {
+    no_update: "no_update",
+    callback_context: {outputs_list: {id: {id: "a"}}},
+};
+window.React = {
+    createElement: (type, props, ...children) => ({type, props: props || {}, children}),
+    memo: component => component,
+    useMemo: compute => compute(),
+};
+"""
+
+# Mixes characters inside and outside the Basic Multilingual Plane.
+ALPHABET = "ab é😀"
+
+node = pytest.mark.skipif(shutil.which("node") is None, reason="needs Node.js")
+
+
+def _function(output):
+    """Return the JavaScript expression of the clientside callback writing
+    `output`."""
+    for callback in _CALLBACKS:
+        if callback.get("clientside_function") and output in callback["output"]:
+            function = callback["clientside_function"]
+            namespace = json.dumps(function["namespace"])
+            name = json.dumps(function["function_name"])
+            return f"window.dash_clientside[{namespace}][{name}]"
+    raise LookupError(output)
+
+
+def _run(script):
+    """Run `script` after the bundle and the clientside callbacks, and
+    return what it printed, parsed as JSON."""
+    source = "\n".join([_PRELUDE, _BUNDLE.read_text(), *_SCRIPTS, script])
+    result = subprocess.run(
+        ["node"], input=source, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def _cases(count, seed=0):
+    """Return random ``(text, annotations, viewport)`` cases, with empty
+    spans and characters outside the BMP."""
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        length = rng.randint(0, 30)
+        text = "".join(rng.choice(ALPHABET) for _ in range(length))
+        annotations = []
+        for i in range(rng.randint(0, 6)):
+            start = rng.randint(0, length)
+            end = rng.randint(start, length)
+            annotations.append(
+                {
+                    "id": f"{rng.choice('pqr')}{i}",
+                    "start": start,
+                    "end": end,
+                    "text": text[start:end],
+                    "note": "",
+                }
+            )
+        viewport = None
+        if rng.random() < 0.5:
+            viewport = {
+                "top": rng.randint(0, 40),
+                "height": 10,
+                "scrollHeight": 50,
+                "overscan": 0,
+                "initial": 10,
+            }
+        cases.append((text, annotations, viewport))
+    return cases
+
+
+def _expected(text, annotations, viewport):
+    """Return ``[key, text, depth]`` for the segments `_segments` yields."""
+    return [
+        [key, text[start:end], len(active)]
+        for start, end, active, key in _window_segments(
+            text, AnnotationSet(annotations), viewport
+        )
+    ]
+
+
+@node
+def test_client_renderer_matches_segments():
+    cases = _cases(300)
+    render = _function('"renderer":"client","subcomponent":"visual-text"}.children')
+    spans = _run(
+        f"const render = {render};"
+        f"const cases = {json.dumps(cases)};"
+        "console.log(JSON.stringify(cases.map(([text, anns, viewport]) =>"
+        "  (render(text, anns, viewport, null) || []).map(span => ["
+        "    span.props.id.slice(2), span.props.children,"
+        "    span.props.style"
+        "      ? Math.round((span.props.style.opacity - 0.2) / 0.2)"
+        "      : 0]))));"
+    )
+    for case, got in zip(cases, spans):
+        expected = _expected(*case)
+        # Opacity saturates at four annotations.
+        expected = [[key, text, min(depth, 4)] for key, text, depth in expected]
+        got = [[key, text, min(depth, 4)] for key, text, depth in got]
+        assert got == expected, case
+
+
+@node
+def test_native_renderer_matches_segments():
+    cases = _cases(300, seed=1)
+    segments = _run(
+        f"const cases = {json.dumps(cases)};"
+        "console.log(JSON.stringify(cases.map(([text, anns, viewport]) =>"
+        "  window.dash_annotator.AnnotatedTextView({"
+        "    text, viewport,"
+        "    offsets: anns.flatMap(ann => [ann.start, ann.end]),"
+        "    labels: anns.map(ann => ann.id),"
+        "  }).children[0].map(segment => ["
+        "    segment.props.key, segment.props.text, segment.props.depth || 0]))));"
+    )
+    for case, got in zip(cases, segments):
+        assert got == _expected(*case), case
+
+
+@node
+def test_client_rebase_matches_apply_edit():
+    rng = random.Random(2)
+    cases = []
+    for text, annotations, _ in _cases(300, seed=2):
+        offset = rng.randint(0, len(text))
+        deleted = rng.randint(0, len(text) - offset)
+        inserted = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 3)))
+        edited = text[:offset] + inserted + text[offset + deleted :]
+        cases.append((text, edited, annotations))
+    forward = _function('"subcomponent":"text-input-store"}.data')
+    results = _run(
+        f"const forward = {forward};"
+        f"const cases = {json.dumps(cases)};"
+        "console.log(JSON.stringify(cases.map(([text, edited, anns]) =>"
+        "  forward(edited, null, null, {text}, anns)[2])));"
+    )
+    for (text, edited, annotations), got in zip(cases, results):
+        expected = AnnotationSet(annotations)
+        # The edit the forwarder sees: between the common prefix and suffix.
+        start = 0
+        while start < min(len(text), len(edited)) and text[start] == edited[start]:
+            start += 1
+        end = 0
+        while (
+            end < min(len(text), len(edited)) - start
+            and text[len(text) - 1 - end] == edited[len(edited) - 1 - end]
+        ):
+            end += 1
+        changed, removed = expected.apply_edit(
+            start, len(text) - start - end, len(edited) - start - end, edited
+        )
+        if got == "no_update":
+            assert not changed and not removed
+        else:
+            assert got == list(expected)
+
+
+@node
+def test_fingerprint_matches_annotation_set():
+    cases = [annotations for _, annotations, _ in _cases(100, seed=3)]
+    cases.append([{"id": "é😀", "start": 0, "end": 1, "text": "", "note": ""}])
+    stores = cases + [AnnotationColumns(case).to_packed() for case in cases]
+    got = _run(
+        f"const stores = {json.dumps(stores)};"
+        "console.log(JSON.stringify(stores.map(window.dash_annotator.fingerprint)));"
+    )
+    expected = [AnnotationSet(case).fingerprint() for case in cases]
+    assert got == expected + expected
+
+
+@node
+def test_code_point_offsets():
+    text = "a😀b😀"
+    got = _run(
+        f"const text = {json.dumps(text)};"
+        "const unit = window.dash_annotator.unitOffsets(text);"
+        "console.log(JSON.stringify({"
+        "  length: window.dash_annotator.codePointLength(text),"
+        "  units: [0, 1, 2, 3, 4, 5].map(unit),"
+        "  points: [0, 1, 3, 4, 6].map("
+        "    u => window.dash_annotator.codePointOffset(text, u)),"
+        "}));"
+    )
+    assert got == {"length": 4, "units": [0, 1, 3, 4, 6, 6], "points": [0, 1, 2, 3, 4]}
@@ -0,0 +1,112 @@
+"""Dictionary and pattern pre-annotation."""
+
+import random
+import re
+
+import pytest
+
+from dash_annotator.preannotation import PreAnnotator, _Automaton
+
+
+def test_automaton_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(200):
+        terms = {
+            "".join(rng.choice("ab") for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 6))
+        }
+        terms = dict(zip(sorted(terms), range(len(terms))))
+        automaton = _Automaton()
+        for term, label in terms.items():
+            automaton.add(term, label)
+        text = "".join(rng.choice("ab ") for _ in range(rng.randint(0, 40)))
+        expected = {
+            (start, start + len(term), label)
+            for term, label in terms.items()
+            for start in range(len(text) - len(term) + 1)
+            if text.startswith(term, start)
+        }
+        assert set(automaton.matches(text)) == expected
+        assert len(list(automaton.matches(text))) == len(expected)
+
+
+def test_automaton_whole_words():
+    automaton = _Automaton()
+    automaton.add("cat", 0)
+    automaton.add("at", 1)
+    assert list(automaton.matches("cat cats scat", whole_words=True)) == [(0, 3, 0)]
+
+
+def test_automaton_reports_progress(monkeypatch):
+    monkeypatch.setattr("dash_annotator.preannotation.PROGRESS_BLOCK", 4)
+    automaton = _Automaton()
+    automaton.add("ab", 0)
+    calls = []
+    matches = automaton.matches("abcabcab", progress=lambda *args: calls.append(args))
+    assert list(matches) == [(0, 2, 0), (3, 5, 0), (6, 8, 0)]
+    assert calls == [(4, 8), (8, 8)]
+
+
+def test_annotate_prefers_leftmost_longest():
+    annotator = PreAnnotator(
+        {"New York": "place", "York": "place", "New York Times": "org"},
+        {r"\b\d{4}\b": "year"},
+    )
+    text = "The New York Times, 1851; York."
+    annotations = annotator.annotate(text)
+    assert [(a.id, a.text, a.note) for a in annotations] == [
+        ("pre-4-18", "New York Times", "org"),
+        ("pre-20-24", "1851", "year"),
+        ("pre-26-30", "York", "place"),
+    ]
+
+
+def test_annotate_all_overlaps_and_ignore_case():
+    annotator = PreAnnotator(
+        ["ada", "ada lovelace"], note="person", ignore_case=True, overlaps="all"
+    )
+    assert [(a.start, a.end) for a in annotator.annotate("ADA Lovelace")] == [
+        (0, 12),
+        (0, 3),
+    ]
+
+
+def test_annotate_documents_in_processes():
+    annotator = PreAnnotator({"cat": "animal"})
+    documents = [(str(i), "a cat " * i) for i in range(40)]
+    serial = list(annotator.annotate_documents(documents))
+    assert list(annotator.annotate_documents(documents, processes=2, chunksize=4)) == (
+        serial
+    )
+    assert len(serial[3][2]) == 3
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        PreAnnotator(overlaps="first")
+    with pytest.raises(ValueError):
+        PreAnnotator([""])
+    with pytest.raises(re.error):
+        PreAnnotator(patterns=["("])
+
+
+def test_patterns_are_matched_separately():
+    annotator = PreAnnotator(
+        patterns={
+            r"(\w)\1": "double",
+            r"(?i)ab+": "ab",
+            r"(?P<year>\d{4})": "year",
+            r"(\d)(\d)\2": "repeat",
+            r"(?P<year>19)\d\d": "century",
+        },
+        overlaps="all",
+    )
+    spans = [(a.start, a.end, a.note) for a in annotator.annotate("ABB 1988")]
+    assert spans == [
+        (0, 3, "ab"),
+        (1, 3, "double"),
+        (4, 8, "year"),
+        (4, 8, "century"),
+        (5, 8, "repeat"),
+        (6, 8, "double"),
+    ]
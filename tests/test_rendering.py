@@ -0,0 +1,107 @@
+"""Server renderings of an annotator's stores."""
+
+import pytest
+
+from dash_annotator import InMemoryAnnotationRepository
+from dash_annotator.cache import _LRUCache
+from dash_annotator.components.annotator import _diff_segments, _rendering_for
+from dash_annotator.components.state import _repositories
+
+
+class _CountingRepository(InMemoryAnnotationRepository):
+    def __init__(self):
+        super().__init__()
+        self.snapshots = 0
+
+    def snapshot(self, document_id):
+        self.snapshots += 1
+        return super().snapshot(document_id)
+
+
+def test_cache_hits_do_not_copy_repository_annotations():
+    repository = _CountingRepository()
+    repository.create("d", "hello world", [{"id": "w", "start": 6, "end": 11}])
+    _repositories["render-test"] = repository
+    cache = _LRUCache(8)
+    ref = repository.ref("d")
+    first = _rendering_for("render-test", ref, ref, None, cache=cache)
+    assert _rendering_for("render-test", ref, ref, None, cache=cache) is first
+    assert repository.snapshots == 1
+    repository.remove("d", "w")
+    ref = repository.ref("d")
+    assert _rendering_for("render-test", ref, ref, None, cache=cache) is not first
+    assert repository.snapshots == 2
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = _LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.cache_info() == (1, 1, 2, 2)
+    cache.resize(1)
+    assert cache.get("a") is None and cache.get("c") == 3
+    cache.clear()
+    assert cache.cache_info() == (0, 0, 1, 0)
+    cache.resize(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_sessions_share_renderings_of_the_same_stores():
+    cache = _LRUCache(8)
+    text, annotations = "hello world", [{"id": "w", "start": 6, "end": 11}]
+
+    def render(text, annotations):
+        return _rendering_for("render-test", text, annotations, None, cache=cache)
+
+    first = render(text, annotations)
+    assert render(text, [dict(annotations[0])]) is first
+    assert render(text, []) is not first
+    assert render("", annotations) is None
+    assert cache.cache_info().hits == 1
+    assert [span.children for span in first.spans()] == ["hello ", "world"]
+
+
+def _apply(patch, children):
+    """Apply the operations of a `Patch` to a list, as the renderer does."""
+    children = list(children)
+    for operation in patch.to_plotly_json()["operations"]:
+        params = operation["params"]
+        if operation["operation"] == "Assign":
+            children[operation["location"][0]] = params["value"]
+        elif operation["operation"] == "Delete":
+            del children[operation["location"][0]]
+        else:
+            assert operation["operation"] == "Insert"
+            children.insert(params["index"], params["value"])
+    return children
+
+
+@pytest.mark.parametrize(
+    "previous, current, patched",
+    [
+        ("abcdefgh", "abcXefgh", 1),
+        ("abcdefgh", "abcXYdefgh", 2),
+        ("abcdefgh", "abcfgh", 0),
+        ("abcdefgh", "abXYZfgh", 3),
+        ("abcdefgh", "aXYZWVUh", None),
+        ("abcdefgh", "abcdefgh", 0),
+    ],
+)
+def test_diff_segments_patches_the_changed_run(previous, current, patched):
+    previous, current = list(previous), list(current)
+    rendered = []
+
+    def render(index):
+        rendered.append(index)
+        return current[index]
+
+    patch = _diff_segments(previous, current, render)
+    if patched is None:
+        assert patch is None
+    else:
+        assert _apply(patch, previous) == current
+        assert len(rendered) == patched
@@ -0,0 +1,212 @@
+"""Annotation repositories and the corpus built on them."""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from dash_annotator import (
+    AnnotationCorpus,
+    AnnotationSet,
+    DirectorySource,
+    DocumentSource,
+    InMemoryAnnotationRepository,
+    JSONLSource,
+    SQLiteAnnotationRepository,
+    SQLiteSource,
+)
+from dash_annotator.formats import read_jsonl
+
+
+def _record(ann_id, start, end, text):
+    return {
+        "id": ann_id,
+        "start": start,
+        "end": end,
+        "text": text[start:end],
+        "note": "",
+    }
+
+
+class _Source(DocumentSource):
+    """Three documents, loaded after `delay` seconds."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def ids(self):
+        return ["a", "b", "c"]
+
+    def load(self, document_id):
+        time.sleep(self.delay)
+        return f"text {document_id}", []
+
+
+@pytest.fixture(params=["memory", "sqlite", "corpus"])
+def repository(request):
+    if request.param == "memory":
+        yield InMemoryAnnotationRepository()
+    elif request.param == "sqlite":
+        repository = SQLiteAnnotationRepository(":memory:")
+        yield repository
+        repository.close()
+    else:
+        corpus = AnnotationCorpus(_Source(), prefetch=0)
+        yield corpus
+        corpus.close()
+
+
+def test_edits_rebase_annotations(repository):
+    rng = random.Random(0)
+    text = "".join(rng.choice("ab ") for _ in range(60))
+    records = []
+    for i in range(20):
+        start = rng.randint(0, 55)
+        records.append(_record(f"a{i}", start, start + rng.randint(1, 5), text))
+    repository.create("d", text, records[:10])
+    repository.add_many("d", records[10:])
+    expected = AnnotationSet(records)
+    for _ in range(30):
+        offset = rng.randint(0, len(text))
+        deleted = rng.randint(0, min(4, len(text) - offset))
+        inserted = rng.choice(["", "x", "yz"])
+        text = text[:offset] + inserted + text[offset + deleted :]
+        repository.edit("d", offset, deleted, inserted)
+        expected.apply_edit(offset, deleted, len(inserted), text)
+        assert repository.text("d") == text
+    got = sorted(repository.annotations("d").to_records(), key=lambda r: r["id"])
+    assert [(r["id"], r["start"], r["end"], r["text"]) for r in got] == [
+        (r["id"], r["start"], r["end"], text[r["start"] : r["end"]])
+        for r in sorted(expected.to_records(), key=lambda r: r["id"])
+    ]
+
+
+def test_versions_and_snapshot(repository):
+    version = repository.create("d", "hello world")
+    version_added = repository.add("d", _record("w", 6, 11, "hello world"))
+    assert version_added > version
+    annotations = repository.annotations("d")
+    # Reads return copies: writes do not reach them.
+    repository.remove("d", "w")
+    assert annotations.ids() == ["w"]
+    text, version, annotations = repository.snapshot("d")
+    assert (text, version, len(annotations)) == (
+        "hello world",
+        repository.version("d"),
+        0,
+    )
+    assert repository.ref("d") == {"document": "d", "version": version}
+
+
+def test_get_and_contains(repository):
+    if not repository.exists("a"):
+        repository.create("a", "text a")
+    assert not repository.contains("a", "w")
+    repository.add("a", _record("w", 0, 4, "text a"))
+    assert repository.contains("a", "w")
+    record = repository.get("a", "w")
+    assert record["text"] == "text"
+    # Records are copies.
+    record["text"] = "changed"
+    assert repository.get("a", "w")["text"] == "text"
+    assert repository.get("a", "x", "default") == "default"
+
+
+def test_page(repository):
+    if not repository.exists("b"):
+        repository.create("b", "text b")
+    repository.add_many("b", [_record(f"w{i}", 5 - i, 6, "text b") for i in range(4)])
+    total, rows = repository.page("b", 1, 2)
+    assert (total, [row["id"] for row in rows]) == (4, ["w1", "w2"])
+    total, rows = repository.page("b", 0, 2, "start")
+    assert [row["id"] for row in rows] == ["w3", "w2"]
+    rows[0]["text"] = "changed"
+    assert repository.get("b", "w3")["text"] == "xt b"
+
+
+def test_corpus_reads_source_until_edited():
+    corpus = AnnotationCorpus(_Source(), prefetch=0)
+    text, version, annotations = corpus.snapshot("b")
+    assert (text, version, len(annotations)) == ("text b", 0, 0)
+    assert not corpus.store.exists("b")
+    corpus.edit("b", 0, 0, "new ")
+    assert corpus.store.text("b") == "new text b"
+    assert corpus.source.load("b")[0] == "text b"
+
+
+def test_corpus_writes_do_not_wait_for_prefetch():
+    # A write used to wait on the corpus lock while a slow prefetch held it.
+    corpus = AnnotationCorpus(_Source(delay=0.3), prefetch=2)
+    corpus.prefetch("a")
+    record = _record("x", 0, 4, "text b")
+    thread = threading.Thread(target=corpus.add, args=("b", record), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert corpus.annotations("b").ids() == ["x"]
+    corpus.close()
+
+
+def test_directory_source(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "b.txt").write_text("text b")
+    (tmp_path / "sub" / "a.txt").write_text("text a")
+    (tmp_path / "sub" / "a.json").write_text(json.dumps([{"start": 0, "end": 4}]))
+    source = DirectorySource(tmp_path)
+    assert list(source.ids()) == ["b", "sub/a"]
+    assert source.load("b") == ("text b", [])
+    assert source.load("sub/a") == ("text a", [{"start": 0, "end": 4}])
+    with pytest.raises(KeyError):
+        source.load("c")
+
+
+def test_jsonl_source_numbers_lines_like_read_jsonl(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    lines = [
+        {"text": "first"},
+        None,
+        {
+            "id": "x",
+            "text": "second",
+            "annotations": [{"id": "s", "start": 0, "end": 3}],
+        },
+        {"text": "third"},
+    ]
+    path.write_text(
+        "".join("\n" if line is None else json.dumps(line) + "\n" for line in lines)
+    )
+    source = JSONLSource(path)
+    assert list(source.ids()) == [document_id for document_id, *_ in read_jsonl(path)]
+    assert list(source.ids()) == ["0", "x", "3"]
+    assert source.load("3") == ("third", None)
+    assert source.load("x") == ("second", [{"id": "s", "start": 0, "end": 3}])
+    assert list(JSONLSource(path, id_field=None).ids()) == ["0", "2", "3"]
+    source.close()
+
+
+def test_sqlite_source(tmp_path):
+    path = str(tmp_path / "corpus.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE documents (id, text, annotations)")
+    connection.executemany(
+        "INSERT INTO documents VALUES (?, ?, ?)",
+        [
+            (2, "text b", None),
+            (1, "text a", json.dumps([{"id": "w", "start": 0, "end": 4}])),
+        ],
+    )
+    connection.commit()
+    connection.close()
+    source = SQLiteSource(path, annotations_column="annotations")
+    assert list(source.ids()) == ["2", "1"]
+    assert source.load("1") == ("text a", [{"id": "w", "start": 0, "end": 4}])
+    assert source.load("2") == ("text b", [])
+    with pytest.raises(KeyError):
+        source.load("3")
+    corpus = AnnotationCorpus(source, prefetch=0)
+    assert corpus.get("1", "w")["text"] == "text"
+    assert corpus.text("2") == "text b"
+    corpus.close()
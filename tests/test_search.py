@@ -0,0 +1,87 @@
+"""Literal and regular expression search, with and without the n-gram
+index."""
+
+import random
+import re
+
+import pytest
+
+from dash_annotator import AnnotationSet, search
+from dash_annotator.cache import _LRUCache, _digest
+from dash_annotator.search import TextIndex, _scan, _unannotated, find_all
+
+
+def _inside_word(text, position):
+    return 0 < position < len(text) and all(
+        char.isalnum() or char == "_" for char in text[position - 1 : position + 1]
+    )
+
+
+def _expected(text, query, ignore_case=False, whole_words=False):
+    """Non-overlapping occurrences of `query`, found with `re`."""
+    flags = re.IGNORECASE if ignore_case else 0
+    spans = []
+    position = 0
+    pattern = re.compile(re.escape(query), flags)
+    while True:
+        match = pattern.search(text, position)
+        if match is None:
+            return spans
+        start, end = match.span()
+        if whole_words and (_inside_word(text, start) or _inside_word(text, end)):
+            position = start + 1
+            continue
+        spans.append((start, end))
+        position = end
+
+
+def _cases(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        text = "".join(rng.choice("abAB _") for _ in range(rng.randint(0, 80)))
+        query = "".join(rng.choice("abAB ") for _ in range(rng.randint(1, 5)))
+        yield text, query, rng.random() < 0.5, rng.random() < 0.5
+
+
+def test_index_matches_re():
+    for text, query, ignore_case, whole_words in _cases(500):
+        index = TextIndex(text, ignore_case)
+        assert index.find(query, whole_words) == _expected(
+            text, query, ignore_case, whole_words
+        )
+
+
+def test_scan_matches_re():
+    for text, query, ignore_case, whole_words in _cases(500, seed=1):
+        assert _scan(text, query, ignore_case, whole_words) == _expected(
+            text, query, ignore_case, whole_words
+        )
+
+
+def test_find_all_indexes_texts_searched_twice(monkeypatch):
+    monkeypatch.setattr(search, "INDEX_MIN_LENGTH", 10)
+    monkeypatch.setattr(search, "_indexes", _LRUCache())
+    text = "the cat sat on the mat"
+    assert find_all(text, "at") == [(5, 7), (9, 11), (20, 22)]
+    assert search._indexes.get((_digest(text), False)) is search._SEARCHED
+    assert find_all(text, "the") == [(0, 3), (15, 18)]
+    assert isinstance(search._indexes.get((_digest(text), False)), TextIndex)
+    assert find_all(text, "at") == [(5, 7), (9, 11), (20, 22)]
+    # Short texts are always scanned.
+    assert find_all("cat", "at") == [(1, 3)]
+    assert search._indexes.get((_digest("cat"), False)) is None
+
+
+def test_find_all_regex():
+    text = "on 2024-01-02 and 2024-03-04x"
+    assert find_all(text, r"\d{4}-\d\d-\d\d") == []
+    assert find_all(text, r"\d{4}-\d\d-\d\d", regex=True) == [(3, 13), (18, 28)]
+    assert find_all(text, r"\d{4}-\d\d-\d\d", regex=True, whole_words=True) == [(3, 13)]
+    assert find_all(text, "x*", regex=True) == [(28, 29)]
+    with pytest.raises(re.error):
+        find_all(text, "(", regex=True)
+
+
+def test_unannotated():
+    annotations = AnnotationSet([{"id": "a", "start": 0, "end": 3}])
+    assert _unannotated(annotations, [(0, 3), (0, 2), (4, 7)]) == [(0, 2), (4, 7)]
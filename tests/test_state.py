@@ -0,0 +1,90 @@
+"""Per-session server state: text delta ordering and annotation sets."""
+
+import pytest
+
+from dash_annotator.components.state import _AnnotationRegistry, _TextSync
+
+
+def _delta(seq, insert="x", delete=0):
+    return {"seq": seq, "offset": 0, "delete": delete, "insert": insert}
+
+
+def _seqs(ready):
+    return [delta["seq"] for delta in ready]
+
+
+def test_text_sync_orders_deltas():
+    sync = _TextSync()
+    assert sync.push("a", "s", _delta(2)) == ([], True)
+    assert sync.push("a", "s", _delta(4)) == ([], True)
+    ready, gap = sync.push("a", "s", _delta(1))
+    assert _seqs(ready) == [1, 2] and gap
+    ready, gap = sync.push("a", "s", _delta(3))
+    assert _seqs(ready) == [3, 4] and not gap
+    # Sessions are ordered independently.
+    assert _seqs(sync.push("a", "t", _delta(1))[0]) == [1]
+
+
+def test_text_sync_drops_replayed_deltas():
+    sync = _TextSync()
+    sync.push("a", "s", _delta(1))
+    assert sync.push("a", "s", _delta(1)) == ([], False)
+
+
+def test_full_text_delta_closes_the_gap():
+    sync = _TextSync()
+    sync.push("a", "s", _delta(1))
+    sync.push("a", "s", _delta(3))
+    sync.push("a", "s", _delta(6))
+    # Delta 2 was lost; the client resends the whole text as delta 4.
+    ready, gap = sync.push("a", "s", _delta(4, "full", None))
+    assert _seqs(ready) == [4] and gap
+    ready, gap = sync.push("a", "s", _delta(5))
+    assert _seqs(ready) == [5, 6] and not gap
+
+
+def test_text_sync_requires_a_session():
+    with pytest.raises(ValueError):
+        _TextSync().push("a", None, _delta(1))
+
+
+def test_text_sync_evicts_old_sessions():
+    sync = _TextSync(maxsize=2)
+    for session in "stu":
+        sync.push("a", session, _delta(1))
+    # "s" was forgotten, so its next delta waits for a new delta 1.
+    assert sync.push("a", "s", _delta(2)) == ([], True)
+
+
+def _record(ann_id, start):
+    return {"id": ann_id, "start": start, "end": start + 1, "text": "x", "note": ""}
+
+
+def test_registry_seeds_new_sessions():
+    registry = _AnnotationRegistry()
+    registry.seed("a", [_record("A", 0)])
+    annotations = registry.get("a", "s")
+    assert annotations.ids() == ["A"]
+    annotations.insert(_record("B", 2))
+    assert registry.get("a", "s").ids() == ["A", "B"]
+    assert registry.get("a", "t").ids() == ["A"]
+
+
+def test_registry_syncs_with_the_store():
+    registry = _AnnotationRegistry()
+    registry.seed("a", [_record("A", 0), _record("B", 2), _record("C", 4)])
+    registry.get("a", "s")
+    # The browser removed A and rebased C without the server seeing it.
+    store = [_record("B", 2), _record("C", 5)]
+    annotations = registry.sync("a", "s", store)
+    assert annotations.to_records() == store
+    assert annotations.index("C") == 1
+    assert registry.sync("a", "s", store) is annotations
+
+
+def test_registry_evicts_old_sessions():
+    registry = _AnnotationRegistry(maxsize=1)
+    registry.seed("a", [_record("A", 0)])
+    registry.get("a", "s").remove("A")
+    registry.get("a", "t")
+    assert registry.get("a", "s").ids() == ["A"]
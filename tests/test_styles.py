@@ -0,0 +1,65 @@
+"""Stylesheets of annotators in class styling mode."""
+
+import pytest
+
+from dash_annotator.annotation_set import AnnotationSet
+from dash_annotator.components.annotator import TextAnnotator
+from dash_annotator.components.state import _themes
+from dash_annotator.components.styles import _highlight_style, _rule, _Theme
+
+
+def test_rules_use_css_property_names():
+    assert _rule(".x", {"borderBottomWidth": "2px", "color": "red"}) == (
+        ".x{border-bottom-width:2px;color:red}"
+    )
+
+
+def test_themes_are_named_by_label_colors():
+    theme = _Theme({"PER": "red", "LOC": "green"})
+    assert theme.name == _Theme({"PER": "red", "LOC": "green"}).name
+    assert theme.name != _Theme({"LOC": "green", "PER": "red"}).name
+    assert theme.name != _Theme().name
+    assert f".{theme.name} .da-l0{{border-color:red;background-color:red}}" in (
+        theme.css
+    )
+    assert theme.to_store() == {
+        "name": theme.name,
+        "css": theme.css,
+        "labels": ["PER", "LOC"],
+    }
+
+
+def test_depth_classes_match_inline_opacity():
+    css = _Theme().css
+    for depth in range(1, 5):
+        opacity = round(_highlight_style(depth)["opacity"], 2)
+        assert f".da-d{depth}{{opacity:{opacity}}}" in css
+
+
+def test_segment_class_takes_the_first_listed_label():
+    theme = _Theme({"PER": "red", "LOC": "green"})
+    annotations = AnnotationSet(
+        [
+            {"id": "a", "start": 0, "end": 5, "note": "LOC"},
+            {"id": "b", "start": 0, "end": 5, "note": "PER"},
+            {"id": "c", "start": 0, "end": 5, "note": "other"},
+        ]
+    )
+    assert theme.segment_class(annotations, []) is None
+    assert theme.segment_class(annotations, ["c"]) == "da-hl da-d1"
+    assert theme.segment_class(annotations, ["a", "c"]) == "da-hl da-d2 da-l1"
+    assert theme.segment_class(annotations, ["a", "b", "c"]) == ("da-hl da-d3 da-l0")
+    assert theme.segment_class(annotations, ["a", "b", "c"] * 2).startswith(
+        "da-hl da-d4 "
+    )
+
+
+def test_annotator_registers_its_theme():
+    TextAnnotator("styled", styling="classes", label_colors={"PER": "red"})
+    assert _themes["styled"].labels == ["PER"]
+    TextAnnotator("styled")
+    assert "styled" not in _themes
+    with pytest.raises(ValueError, match="styling"):
+        TextAnnotator("styled", styling="css")
+    with pytest.raises(ValueError, match="native"):
+        TextAnnotator("styled", styling="classes", renderer="native")
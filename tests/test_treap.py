@@ -0,0 +1,89 @@
+"""Treap split, merge and lazy shift against a sorted list."""
+
+import random
+
+from dash_annotator.treap import (
+    _build,
+    _delete,
+    _merge,
+    _overlapping,
+    _shift,
+    _split,
+    _walk,
+)
+
+
+def _keys(rng, count):
+    keys = set()
+    while len(keys) < count:
+        start = rng.randint(0, 100)
+        keys.add((start, start + rng.randint(0, 20), f"k{len(keys)}"))
+    return sorted(keys)
+
+
+def _max_ends(node):
+    """Check the `max_end` augmentation of every node below `node`."""
+    if node is None:
+        return -1
+    node.push()
+    expected = max(node.key[1], _max_ends(node.left), _max_ends(node.right))
+    assert node.max_end == expected
+    return expected
+
+
+def test_build_and_walk():
+    keys = _keys(random.Random(0), 200)
+    root = _build(keys)
+    assert list(_walk(root)) == keys
+    _max_ends(root)
+
+
+def test_split_and_merge():
+    rng = random.Random(1)
+    for _ in range(50):
+        keys = _keys(rng, rng.randint(0, 40))
+        pivot = (rng.randint(0, 110),)
+        left, right = _split(_build(keys), pivot)
+        assert list(_walk(left)) == [key for key in keys if key < pivot]
+        assert list(_walk(right)) == [key for key in keys if key >= pivot]
+        root = _merge(left, right)
+        assert list(_walk(root)) == keys
+        _max_ends(root)
+
+
+def test_shift_is_applied_lazily():
+    rng = random.Random(2)
+    keys = _keys(rng, 100)
+    left, right = _split(_build(keys), (50,))
+    _shift(right, 7)
+    root = _merge(left, right)
+    expected = [
+        key if key < (50,) else (key[0] + 7, key[1] + 7, key[2]) for key in keys
+    ]
+    assert list(_walk(root)) == expected
+    _max_ends(root)
+
+
+def test_delete():
+    rng = random.Random(3)
+    keys = _keys(rng, 60)
+    root = _build(keys)
+    for key in rng.sample(keys, 30):
+        root = _delete(root, key)
+        keys.remove(key)
+        assert list(_walk(root)) == keys
+    _max_ends(root)
+
+
+def test_overlapping():
+    rng = random.Random(4)
+    keys = _keys(rng, 150)
+    root = _build(keys)
+    _shift(root, 3)
+    keys = [(start + 3, end + 3, key) for start, end, key in keys]
+    for _ in range(100):
+        start = rng.randint(0, 130)
+        end = start + rng.randint(1, 15)
+        assert list(_overlapping(root, start, end)) == [
+            key for key in keys if key[0] < end and key[1] > start
+        ]